@@ -0,0 +1,106 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from midi_sidecar import load_midi_columns
+
+
+class BatchParser:
+    """
+    Parse many MIDI files at once in a pool of worker processes.
+
+    Files already in the parse cache are answered straight away; the rest
+    are loaded (sidecar first, otherwise a full parse) in the pool and put
+    in the cache as they finish. Each batch keeps at most max_in_flight
+    files in the pool, so one large batch cannot queue ahead of every other
+    request's work.
+
+    The pool is started on the first batch, not when the parser is
+    created, so importing the app starts no processes. Workers are spawned
+    as fresh interpreters rather than forked: by then the server runs
+    background threads, possibly monkey-patched by gevent, and a forked
+    child would inherit locks those threads held.
+    """
+
+    def __init__(self, cache, workers=2, max_in_flight=2):
+        """
+        Args:
+            cache: MidiCache holding parsed columns
+            workers: Number of worker processes
+            max_in_flight: Files of one batch being parsed at the same time
+        """
+        self.cache = cache
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _discard_pool(self, pool):
+        # A worker died; the next file gets a fresh pool
+        with self._pool_lock:
+            if pool is self._pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def parse(self, paths):
+        """
+        Load parsed columns for each path, yielding results as they are ready.
+
+        Args:
+            paths: Paths of MIDI files
+
+        Yields:
+            tuple: (path, columns, error) where exactly one of columns and
+            error is None; cached files come first, the rest in the order
+            they finish
+        """
+        pending = deque()
+        for path in paths:
+            try:
+                identity, columns = self.cache.peek(path)
+            except OSError as e:
+                yield path, None, e
+                continue
+            if columns is not None:
+                yield path, columns, None
+            else:
+                pending.append((path, identity))
+
+        in_flight = {}
+        while pending or in_flight:
+            while pending and len(in_flight) < self.max_in_flight:
+                path, identity = pending.popleft()
+                pool = self._get_pool()
+                in_flight[pool.submit(load_midi_columns, path)] = (path, identity, pool)
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, identity, pool = in_flight.pop(future)
+                try:
+                    columns = future.result()
+                except BrokenProcessPool as e:
+                    self._discard_pool(pool)
+                    yield path, None, e
+                    continue
+                except Exception as e:
+                    yield path, None, e
+                    continue
+                self.cache.put(path, columns, identity)
+                yield path, columns, None
+
+    def close(self):
+        """Shut down the worker processes, if any were started."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,72 @@
+"""
+Regression benchmark for midi_to_json.
+
+Generates synthetic piano tracks of increasing size, times how long
+midi_to_json takes on each one and checks that parse time grows linearly
+with the number of notes. benchmark_suite.py runs this check alongside
+its other measurements.
+
+Usage:
+    python benchmark_midi_parser.py [--sizes 2000 4000 8000 16000] [--max-slope 1.3]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+from create_sample_midi import generate_midi
+from midi_parser import midi_to_json
+
+
+def time_parse(path, repeat):
+    """Return the best wall time of `repeat` midi_to_json calls on `path`."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        midi_to_json(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling_slope(sizes, timings):
+    """Least-squares slope of log(time) against log(size)."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(timing) for timing in timings]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return num / den
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 4000, 8000, 16000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-slope', type=float, default=1.3,
+                        help='Fail if log-log scaling slope exceeds this (1.0 is linear)')
+    args = parser.parse_args()
+
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            path = os.path.join(tmp_dir, f"bench_{size}.mid")
+            generate_midi(path, notes=size)
+            elapsed = time_parse(path, args.repeat)
+            timings.append(elapsed)
+            print(f"{size:>8} notes  {elapsed * 1000:9.1f} ms  {elapsed / size * 1e6:7.2f} us/note")
+
+    slope = scaling_slope(args.sizes, timings)
+    print(f"Scaling slope: {slope:.2f} (1.0 = linear, 2.0 = quadratic)")
+
+    if slope > args.max_slope:
+        print(f"FAIL: parse time grows faster than linear (max slope {args.max_slope})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Benchmark suite for MIDI parsing and the MIDI endpoints.
+
+Generates the synthetic corpus from create_sample_midi.py in a scratch
+directory and measures, for each corpus file:
+  - parse time of midi_to_columns (fast decoder and mido) and midi_to_json
+    (best of --repeat)
+  - peak Python memory allocated while parsing (tracemalloc)
+  - /api/midi/<filename> cold (caches cleared) and warm latency
+
+plus /api/midis throughput and the parse-time scaling check from
+benchmark_midi_parser.py. Requests go through the Flask test client with
+the app running in the scratch directory, so the real midi_files folder
+and job database are never touched.
+
+Results are written as JSON. Pass --compare with an earlier results file
+to flag metrics that got slower by more than --tolerance.
+
+Usage:
+    python benchmark_suite.py [--output benchmark_results.json] [--max-notes 100000]
+    python benchmark_suite.py --compare old_results.json [--tolerance 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmark_midi_parser import scaling_slope, time_parse
+from create_sample_midi import generate_midi, write_corpus
+from midi_parser import midi_to_columns, midi_to_json
+from midi_sidecar import sidecar_path
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Metrics checked by --compare; lower is better except for HIGHER_IS_BETTER
+COMPARED_METRICS = (
+    "columns_seconds",
+    "json_seconds",
+    "peak_bytes",
+    "endpoint_cold_seconds",
+    "endpoint_warm_seconds",
+    "requests_per_second",
+)
+HIGHER_IS_BETTER = {"requests_per_second"}
+
+
+def best_time(function, repeat):
+    """Return the best wall time of `repeat` calls to function."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(function):
+    """Return the peak bytes allocated by Python while function runs."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_parsing(paths, repeat):
+    """
+    Time and measure the memory of parsing each corpus file.
+
+    Returns:
+        Dictionary of corpus name -> metrics
+    """
+    results = {}
+    for name, path in paths.items():
+        columns = midi_to_columns(path)
+        results[name] = {
+            "notes": sum(len(track) for track in columns["tracks"]),
+            "tracks": len(columns["tracks"]),
+            "file_bytes": os.path.getsize(path),
+            "columns_seconds": best_time(lambda: midi_to_columns(path), repeat),
+            "columns_mido_seconds": best_time(
+                lambda: midi_to_columns(path, fast=False), repeat
+            ),
+            "json_seconds": best_time(lambda: midi_to_json(path), repeat),
+            "peak_bytes": peak_memory(lambda: midi_to_json(path)),
+        }
+        print(
+            f"{name:>20}  {results[name]['notes']:>8} notes  "
+            f"columns {results[name]['columns_seconds'] * 1000:8.1f} ms  "
+            f"mido {results[name]['columns_mido_seconds'] * 1000:8.1f} ms  "
+            f"json {results[name]['json_seconds'] * 1000:8.1f} ms  "
+            f"peak {results[name]['peak_bytes'] / 1e6:7.1f} MB"
+        )
+    return results
+
+
+def benchmark_endpoints(app_module, names, repeat, list_requests):
+    """
+    Measure the MIDI endpoints through the Flask test client.
+
+    Args:
+        app_module: Imported main module, running in the scratch directory
+        names: Corpus names present in its MIDI folder
+        repeat: Requests timed per measurement
+        list_requests: Requests sent to /api/midis for the throughput figure
+
+    Returns:
+        Dictionary with per-file endpoint latencies and /api/midis throughput
+    """
+    client = app_module.app.test_client()
+    results = {"midi": {}}
+
+    for name in names:
+        url = f"/api/midi/{name}.mid"
+
+        def cold():
+            app_module.midi_cache.clear()
+            app_module.response_cache.clear()
+            sidecar = sidecar_path(f"midi_files/{name}.mid")
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+            assert client.get(url).status_code == 200
+
+        def warm():
+            assert client.get(url).status_code == 200
+
+        warm()
+        results["midi"][name] = {
+            "endpoint_cold_seconds": best_time(cold, repeat),
+            "endpoint_warm_seconds": best_time(warm, repeat),
+        }
+        print(
+            f"{name:>20}  GET /api/midi cold "
+            f"{results['midi'][name]['endpoint_cold_seconds'] * 1000:8.1f} ms  warm "
+            f"{results['midi'][name]['endpoint_warm_seconds'] * 1000:8.1f} ms"
+        )
+
+    client.get("/api/midis")
+    start = time.perf_counter()
+    for _ in range(list_requests):
+        assert client.get("/api/midis").status_code == 200
+    elapsed = time.perf_counter() - start
+    results["midis"] = {
+        "requests": list_requests,
+        "requests_per_second": list_requests / elapsed,
+    }
+    print(f"{'':>20}  GET /api/midis {results['midis']['requests_per_second']:8.0f} req/s")
+    return results
+
+
+def benchmark_scaling(scratch_dir, sizes, repeat):
+    """Return the log-log slope of parse time against note count."""
+    timings = []
+    for size in sizes:
+        path = os.path.join(scratch_dir, f"scaling_{size}.mid")
+        generate_midi(path, notes=size)
+        timings.append(time_parse(path, repeat))
+    slope = scaling_slope(sizes, timings)
+    print(f"{'':>20}  scaling slope {slope:.2f} (1.0 = linear)")
+    return {"sizes": sizes, "seconds": timings, "slope": slope}
+
+
+def environment():
+    """Describe the machine and revision the benchmark ran on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=BACKEND_DIR,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit or None,
+    }
+
+
+def flatten(results):
+    """Map "section/name/metric" -> value for every compared metric."""
+    flat = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(f"{prefix}/{key}" if prefix else key, child)
+        elif prefix.rsplit("/", 1)[-1] in COMPARED_METRICS:
+            flat[prefix] = value
+
+    walk("", {key: results[key] for key in ("parse", "endpoints") if key in results})
+    return flat
+
+
+def compare(current, previous, tolerance):
+    """
+    List metrics that regressed by more than tolerance.
+
+    Returns:
+        List of (metric, previous value, current value) tuples
+    """
+    old = flatten(previous)
+    regressions = []
+    for metric, value in flatten(current).items():
+        if metric not in old or not old[metric]:
+            continue
+        change = value / old[metric] - 1
+        if metric.rsplit("/", 1)[-1] in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append((metric, old[metric], value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--max-notes", type=int, default=100000,
+                        help="Largest corpus file to include (1000000 adds notes_1m)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--list-requests", type=int, default=200)
+    parser.add_argument("--scaling-sizes", type=int, nargs="+", default=[2000, 4000, 8000, 16000])
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    scratch_dir = tempfile.mkdtemp(prefix="midi-benchmark-")
+    cwd = os.getcwd()
+    try:
+        print("Generating corpus...")
+        midi_folder = os.path.join(scratch_dir, "midi_files")
+        paths = write_corpus(midi_folder, args.max_notes)
+
+        results = {"environment": environment(), "parse": benchmark_parsing(paths, args.repeat)}
+        results["scaling"] = benchmark_scaling(scratch_dir, args.scaling_sizes, args.repeat)
+
+        # main.py uses paths relative to the working directory
+        os.chdir(scratch_dir)
+        sys.path.insert(0, BACKEND_DIR)
+        import main as app_module
+
+        results["endpoints"] = benchmark_endpoints(
+            app_module, list(paths), args.repeat, args.list_requests
+        )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, args.tolerance)
+        for metric, old, new in regressions:
+            print(f"REGRESSION {metric}: {old:.6g} -> {new:.6g}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
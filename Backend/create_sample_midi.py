@@ -1,31 +1,190 @@
+"""
+Create MIDI fixtures.
+
+With no arguments, writes the 8-note C major scale to midi_files/sample.mid.
+With --output, writes one synthetic file shaped by the options; with
+--corpus, writes the standard benchmark corpus to a directory.
+
+Usage:
+    python create_sample_midi.py
+    python create_sample_midi.py --output big.mid --notes 100000 --tracks 8 --chord-size 4
+    python create_sample_midi.py --corpus corpus/ [--max-notes 100000]
+"""
+
+import argparse
+import os
+import random
+
 import mido
 from mido import MidiFile, MidiTrack, Message
 
-# Create a new MIDI file
-mid = MidiFile()
-track = MidiTrack()
-mid.tracks.append(track)
+# Standard benchmark corpus: file name -> generate_midi options
+CORPUS = {
+    'notes_1k': dict(notes=1000),
+    'notes_10k': dict(notes=10000),
+    'notes_100k': dict(notes=100000),
+    'notes_1m': dict(notes=1000000),
+    'dense_chords': dict(notes=20000, chord_size=8),
+    'many_tracks': dict(notes=20000, tracks=64),
+    'tempo_changes': dict(notes=20000, tempo_changes=2000),
+    'sustained_overlaps': dict(notes=20000, sustain=True),
+}
+
+
+def create_sample(path='midi_files/sample.mid'):
+    """Write the 8-note C major scale used as the default fixture."""
+    # Create a new MIDI file
+    mid = MidiFile()
+    track = MidiTrack()
+    mid.tracks.append(track)
+
+    # Set tempo (500000 microseconds per beat = 120 BPM)
+    track.append(mido.MetaMessage('set_tempo', tempo=500000))
+
+    # Set time signature (4/4)
+    track.append(mido.MetaMessage('time_signature', numerator=4, denominator=4))
+
+    # Add track name
+    track.append(mido.MetaMessage('track_name', name='Piano'))
+
+    # Add some notes (C major scale)
+    notes = [60, 62, 64, 65, 67, 69, 71, 72]  # C, D, E, F, G, A, B, C
+    velocity = 80
+
+    for note in notes:
+        track.append(Message('note_on', note=note, velocity=velocity, time=0))
+        track.append(Message('note_off', note=note, velocity=velocity, time=480))  # 480 ticks = quarter note
+
+    # Add end of track
+    track.append(mido.MetaMessage('end_of_track', time=0))
+
+    # Save the MIDI file
+    mid.save(path)
+
+
+def generate_midi(path, notes=1000, tracks=1, chord_size=1, tempo_changes=0, sustain=False, seed=0):
+    """
+    Write a synthetic type 1 MIDI file.
+
+    Notes are spread round-robin over the tracks, one chord at a time.
+    Repeated pitches and overlapping notes occur naturally; with sustain,
+    notes are held for several beats so many keys sound at once and the
+    same key is often struck again before it is released.
+
+    Args:
+        path: Destination path for the MIDI file
+        notes: Total number of notes
+        tracks: Number of tracks holding notes
+        chord_size: Notes struck together at each onset
+        tempo_changes: Number of set_tempo events spread over the piece
+        sustain: Hold notes for 2-16 beats instead of up to one beat
+        seed: Random seed so files are repeatable
+    """
+    rng = random.Random(seed)
+    ticks_per_beat = 480
+    track_events = [[] for _ in range(tracks)]
+
+    tick = 0
+    written = 0
+    chord_index = 0
+    while written < notes:
+        tick += rng.randint(0, 240)
+        events = track_events[chord_index % tracks]
+        for _ in range(min(chord_size, notes - written)):
+            note = rng.randint(21, 108)
+            velocity = rng.randint(30, 120)
+            if sustain:
+                length = rng.randint(2 * ticks_per_beat, 16 * ticks_per_beat)
+            else:
+                length = rng.randint(30, ticks_per_beat)
+            channel = chord_index % tracks % 16
+            events.append((tick, 1, note, velocity, channel))
+            events.append((tick + length, 0, note, 0, channel))
+            written += 1
+        chord_index += 1
+
+    mid = MidiFile(type=1, ticks_per_beat=ticks_per_beat)
+    for i, events in enumerate(track_events):
+        if i == 0:
+            # Tempo changes live in the first track and apply to all of them
+            events.append((0, -1, 500000, 0, 0))
+            for j in range(tempo_changes):
+                change_tick = tick * (j + 1) // (tempo_changes + 1)
+                events.append((change_tick, -1, rng.randint(300000, 1000000), 0, 0))
+        # Tempo first, then note_off before note_on at the same tick
+        events.sort()
+
+        track = MidiTrack()
+        mid.tracks.append(track)
+        track.append(mido.MetaMessage('track_name', name=f'Track {i + 1}'))
+        last_tick = 0
+        for event_tick, kind, value, velocity, channel in events:
+            delta = event_tick - last_tick
+            if kind == -1:
+                track.append(mido.MetaMessage('set_tempo', tempo=value, time=delta))
+            else:
+                msg_type = 'note_on' if kind else 'note_off'
+                track.append(Message(msg_type, channel=channel, note=value, velocity=velocity, time=delta))
+            last_tick = event_tick
+        track.append(mido.MetaMessage('end_of_track', time=0))
+
+    mid.save(path)
+
+
+def write_corpus(folder, max_notes=None, seed=0):
+    """
+    Write the standard benchmark corpus.
 
-# Set tempo (500000 microseconds per beat = 120 BPM)
-track.append(mido.MetaMessage('set_tempo', tempo=500000))
+    Args:
+        folder: Directory to write the files to
+        max_notes: Skip corpus files with more notes than this
+        seed: Random seed passed to generate_midi
 
-# Set time signature (4/4)
-track.append(mido.MetaMessage('time_signature', numerator=4, denominator=4))
+    Returns:
+        Dictionary of corpus name -> path of the written file
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = {}
+    for name, options in CORPUS.items():
+        if max_notes is not None and options['notes'] > max_notes:
+            continue
+        path = os.path.join(folder, f'{name}.mid')
+        generate_midi(path, seed=seed, **options)
+        paths[name] = path
+    return paths
 
-# Add track name
-track.append(mido.MetaMessage('track_name', name='Piano'))
 
-# Add some notes (C major scale)
-notes = [60, 62, 64, 65, 67, 69, 71, 72]  # C, D, E, F, G, A, B, C
-velocity = 80
+def main():
+    parser = argparse.ArgumentParser(description='Create MIDI fixtures')
+    parser.add_argument('--output', help='Write one synthetic file to this path')
+    parser.add_argument('--corpus', help='Write the benchmark corpus to this directory')
+    parser.add_argument('--max-notes', type=int, help='Largest corpus file to write')
+    parser.add_argument('--notes', type=int, default=1000)
+    parser.add_argument('--tracks', type=int, default=1)
+    parser.add_argument('--chord-size', type=int, default=1)
+    parser.add_argument('--tempo-changes', type=int, default=0)
+    parser.add_argument('--sustain', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
 
-for note in notes:
-    track.append(Message('note_on', note=note, velocity=velocity, time=0))
-    track.append(Message('note_off', note=note, velocity=velocity, time=480))  # 480 ticks = quarter note
+    if args.corpus:
+        for name, path in write_corpus(args.corpus, args.max_notes, args.seed).items():
+            print(f"Corpus MIDI file created: {path}")
+    elif args.output:
+        generate_midi(
+            args.output,
+            notes=args.notes,
+            tracks=args.tracks,
+            chord_size=args.chord_size,
+            tempo_changes=args.tempo_changes,
+            sustain=args.sustain,
+            seed=args.seed,
+        )
+        print(f"Synthetic MIDI file created: {args.output}")
+    else:
+        create_sample()
+        print("Sample MIDI file created: midi_files/sample.mid")
 
-# Add end of track
-track.append(mido.MetaMessage('end_of_track', time=0))
 
-# Save the MIDI file
-mid.save('midi_files/sample.mid')
-print("Sample MIDI file created: midi_files/sample.mid")
+if __name__ == '__main__':
+    main()
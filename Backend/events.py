@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+# Milliseconds browsers wait before reconnecting a dropped event stream
+RECONNECT_MS = 3000
+
+
+class EventBus:
+    """
+    In-process publish/subscribe channel for job and library events.
+
+    Events get increasing IDs of the form "<epoch>-<n>", where the epoch is
+    unique to this bus. A recent history is kept so a client reconnecting
+    with its last event ID receives what it missed. If the ID comes from an
+    earlier server process or has fallen out of the history, the client is
+    told to resynchronise instead.
+
+    Waiting uses a threading.Condition, so under a gevent or eventlet server
+    with monkey patching each open stream costs a greenlet, not a thread.
+    """
+
+    def __init__(self, history=1000, epoch=None, start=0):
+        """
+        Args:
+            history: Number of recent events kept for replay
+            epoch: Epoch shared by buses that number events the same way,
+                such as the buses of processes relaying one event log;
+                a fresh one is made up by default
+            start: Number of the last event published before this bus existed
+        """
+        self.epoch = epoch or uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=history)
+        self._last = start
+        self._condition = threading.Condition()
+        self.subscribers = 0
+
+    def publish(self, event_type, data, number=None):
+        """
+        Publish an event to every waiting client.
+
+        Args:
+            event_type: SSE event name, such as "job" or "library"
+            data: JSON-serialisable payload
+            number: Event number assigned elsewhere; must be higher than
+                any published so far. The next number is used by default.
+
+        Returns:
+            ID of the new event
+        """
+        with self._condition:
+            self._last = self._last + 1 if number is None else number
+            self._events.append((self._last, event_type, data))
+            self._condition.notify_all()
+            return self._format_id(self._last)
+
+    def _format_id(self, number):
+        return f"{self.epoch}-{number}"
+
+    @property
+    def last_event_id(self):
+        """ID of the most recent event, or the ID before the first one."""
+        return self._format_id(self._last)
+
+    def resolve(self, last_event_id):
+        """
+        Turn a client's last event ID into a replay cursor.
+
+        Args:
+            last_event_id: Last-Event-ID sent by the client, or None
+
+        Returns:
+            tuple: (cursor, resync) where resync is True if the client may
+            have missed events that can no longer be replayed
+        """
+        with self._condition:
+            if not last_event_id:
+                return self._last, False
+            epoch, _, number = last_event_id.rpartition("-")
+            if epoch != self.epoch or not number.isdigit() or int(number) > self._last:
+                return self._last, True
+            oldest = self._events[0][0] if self._events else self._last + 1
+            if int(number) < oldest - 1:
+                return self._last, True
+            return int(number), False
+
+    def wait(self, cursor, timeout):
+        """
+        Wait for events published after a cursor.
+
+        Args:
+            cursor: Number of the last event the client has seen
+            timeout: Seconds to wait if there is nothing new
+
+        Returns:
+            List of (id, event type, data) tuples, empty on timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._last <= cursor:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+            return [
+                (self._format_id(number), event_type, data)
+                for number, event_type, data in self._events
+                if number > cursor
+            ]
+
+    def stream(self, last_event_id=None, heartbeat=15):
+        """
+        Yield a Server-Sent Events stream, starting after last_event_id.
+
+        Args:
+            last_event_id: Last-Event-ID sent by a reconnecting client
+            heartbeat: Seconds between keep-alive comments when idle
+
+        Yields:
+            str: SSE-formatted chunks
+        """
+        cursor, resync = self.resolve(last_event_id)
+        with self._condition:
+            self.subscribers += 1
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            if resync:
+                yield format_sse(self._format_id(cursor), "resync", {})
+            while True:
+                events = self.wait(cursor, heartbeat)
+                if not events:
+                    yield ": heartbeat\n\n"
+                    continue
+                for event_id, event_type, data in events:
+                    yield format_sse(event_id, event_type, data)
+                cursor = int(events[-1][0].rpartition("-")[2])
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+
+class SharedEventRelay:
+    """
+    Carries events between server processes through the job store's event log.
+
+    Events are appended to the log instead of being published directly. A
+    background thread in every process reads new log entries and publishes
+    them on the local bus numbered by their log ID, so every process hands
+    out the same event IDs and a client can reconnect to any of them.
+    """
+
+    def __init__(self, store, bus, interval=0.25, history=1000, on_event=None):
+        """
+        Args:
+            store: JobStore shared by every process
+            bus: Local EventBus, created with the log's epoch and last ID
+            interval: Seconds between checks for new log entries
+            history: Number of log entries kept for processes that fall behind
+            on_event: Function called with (event type, data) for every
+                event read from the log, before it is published locally
+        """
+        self.store = store
+        self.bus = bus
+        self.interval = interval
+        self.history = history
+        self.on_event = on_event
+        self._cursor = store.last_event_id()
+
+    def start(self):
+        """Start following the event log."""
+        threading.Thread(target=self._follow, name="event-relay", daemon=True).start()
+
+    def publish(self, event_type, data):
+        """
+        Append an event to the shared log.
+
+        Returns:
+            ID of the logged event
+        """
+        return self.store.append_event(event_type, data)
+
+    def _follow(self):
+        polls = 0
+        while True:
+            time.sleep(self.interval)
+            try:
+                for number, event_type, data in self.store.events_since(self._cursor):
+                    self._cursor = number
+                    if self.on_event is not None:
+                        try:
+                            self.on_event(event_type, data)
+                        except Exception as e:
+                            print(f"Event listener failed for {event_type} event: {e}")
+                    self.bus.publish(event_type, data, number=number)
+                polls += 1
+                if polls % 1000 == 0:
+                    self.store.trim_events(self.history)
+            except Exception as e:
+                print(f"Failed to read the shared event log: {e}")
+
+
+def format_sse(event_id, event_type, data):
+    """Format one event in the text/event-stream wire format."""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
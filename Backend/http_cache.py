@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag value from the parts identifying a representation.
+
+    Args:
+        *parts: Values that together identify the exact response body
+
+    Returns:
+        Unquoted ETag string
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def negotiate_encoding():
+    """
+    Pick the content coding for the current request.
+
+    Returns:
+        "br", "gzip" or None for an uncompressed body
+    """
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    """Compress a body with the given content coding."""
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+class BodyCache:
+    """
+    Thread-safe LRU cache of encoded response bodies keyed by ETag.
+
+    Keeping the already compressed bytes means a popular song is only
+    serialized and compressed once per encoding.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes: Memory budget for all cached bodies
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # etag -> (content coding, body)
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        """Return the cached (content coding, body) pair for an ETag, or None."""
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag, encoding, body):
+        """Store a body, evicting least-recently-used bodies if over budget."""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self.current_bytes -= len(old[1])
+            self._entries[etag] = (encoding, body)
+            self.current_bytes += len(body)
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        """Drop every cached body."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def cached_response(body_cache, etag_parts, mimetype, build_body, vary=()):
+    """
+    Serve a cacheable representation with ETag, 304 and compression support.
+
+    The ETag covers the negotiated content coding, so every encoded body is
+    its own strong validator. A matching If-None-Match gets a 304 without
+    building the body, and an encoded body already in the cache is served
+    without serializing or compressing again.
+
+    Args:
+        body_cache: BodyCache holding encoded bodies
+        etag_parts: Values identifying the unencoded representation
+        mimetype: Mimetype of the body
+        build_body: Function returning the unencoded body as bytes
+        vary: Extra request headers the representation depends on
+
+    Returns:
+        Flask response
+    """
+    encoding = negotiate_encoding()
+    etag = make_etag(*etag_parts, encoding)
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        entry = body_cache.get(etag)
+        if entry is None:
+            body = build_body()
+            if encoding is not None and len(body) >= MIN_COMPRESS_BYTES:
+                body = compress(body, encoding)
+            else:
+                encoding = None
+            body_cache.put(etag, encoding, body)
+        else:
+            encoding, body = entry
+        response = Response(body, mimetype=mimetype)
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    for header in vary:
+        response.vary.add(header)
+    return response
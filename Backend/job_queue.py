@@ -0,0 +1,470 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+# Assumed job duration before any job has finished, in seconds
+DEFAULT_JOB_SECONDS = 120
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a queue that is at its maximum depth."""
+
+    def __init__(self, depth):
+        super().__init__(f"Job queue is full ({depth} jobs waiting)")
+        self.depth = depth
+
+
+class JobQueue:
+    """
+    Bounded FIFO queue of transcription jobs served by a pool of worker threads.
+
+    Each job is a dictionary with at least "job_id" and "status" ("queued",
+    "running", "completed" or "failed"). The processing function fills in
+    the rest of the record as it runs. Queued and running jobs are held in
+    memory; every status change is saved to the job store, which is also
+    where finished jobs are looked up.
+    """
+
+    def __init__(
+        self, process_job, store, workers=1, max_depth=20, on_update=None, on_cancel=None
+    ):
+        """
+        Args:
+            process_job: Function called with a job dictionary on a worker thread
+            store: JobStore that records every job
+            workers: Number of jobs processed at the same time
+            max_depth: Maximum number of jobs waiting to start
+            on_update: Function called with a copy of a job whenever it is saved
+            on_cancel: Function called with the ID of a running job that was
+                asked to stop; it should make process_job return early
+        """
+        self.process_job = process_job
+        self.store = store
+        self.on_update = on_update
+        self.on_cancel = on_cancel
+        self.workers = workers
+        self.max_depth = max_depth
+        self._pending = deque()  # job ids waiting to start, oldest first
+        self._running = []  # job ids currently being processed
+        self._jobs = {}  # job id -> job dictionary for queued and running jobs
+        self._by_content = {}  # content hash -> job id for queued and running jobs
+        self._durations = deque(maxlen=20)  # wall times of recent jobs
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"transcription-worker-{i + 1}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def depth(self):
+        """Number of jobs waiting to start."""
+        return len(self._pending)
+
+    def submit(self, job):
+        """
+        Queue a job, or join an unfinished job for the same content.
+
+        If the job has a "content_hash" and a queued or running job has the
+        same one, nothing is queued and that job's ID is returned instead.
+
+        Args:
+            job: Job dictionary; "job_id", "status" and "queued_time" are set here
+
+        Returns:
+            ID of the job that will produce the result
+
+        Raises:
+            QueueFull: If max_depth jobs are already waiting
+        """
+        with self._condition:
+            existing = self._by_content.get(job.get("content_hash"))
+            if existing is not None:
+                return existing
+            if len(self._pending) >= self.max_depth:
+                raise QueueFull(len(self._pending))
+            job["job_id"] = uuid.uuid4().hex
+            job["status"] = "queued"
+            job["queued_time"] = datetime.now().isoformat()
+            self._save(job)
+            self._enqueue(job)
+        return job["job_id"]
+
+    def resubmit(self, job):
+        """
+        Queue a job recovered from the store, keeping its ID and place in line.
+
+        Recovered jobs are not subject to max_depth since they were already
+        accepted once.
+
+        Args:
+            job: Queued job dictionary loaded from the store
+        """
+        with self._condition:
+            self._enqueue(job)
+
+    def _save(self, job):
+        self.store.save(job)
+        self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(dict(job))
+            except Exception as e:
+                print(f"Job update listener failed for {job['job_id']}: {e}")
+
+    def _enqueue(self, job):
+        self._jobs[job["job_id"]] = job
+        if job.get("content_hash"):
+            self._by_content[job["content_hash"]] = job["job_id"]
+        self._pending.append(job["job_id"])
+        self._condition.notify()
+
+    def get(self, job_id):
+        """
+        Look up a job with its current queue position and estimated wait.
+
+        Args:
+            job_id: ID returned by submit
+
+        Returns:
+            Copy of the job dictionary, or None if the job is unknown
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job = dict(job)
+                if job["status"] == "queued":
+                    position = self._pending.index(job_id)
+                    job["queue_position"] = position + 1
+                    job["estimated_wait_seconds"] = self._estimate_wait(position)
+                return job
+        return self.store.get(job_id)
+
+    def update_queued(self, job_id, **fields):
+        """
+        Set fields on a job that has not started yet.
+
+        Args:
+            job_id: ID returned by submit
+            **fields: Job fields to set
+
+        Returns:
+            Copy of the updated job, or None if the job is not queued
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                return None
+            job.update(fields)
+            self._save(job)
+            return dict(job)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job, or ask a running one to stop.
+
+        A queued job is marked failed right away. A running job gets
+        "cancel_requested" and on_cancel is called; it is marked failed by
+        process_job once it stops.
+
+        Args:
+            job_id: ID returned by submit
+
+        Returns:
+            Copy of the job, or None if it is not queued or running
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                self._pending.remove(job_id)
+                del self._jobs[job_id]
+                if self._by_content.get(job.get("content_hash")) == job_id:
+                    del self._by_content[job["content_hash"]]
+                job["status"] = "failed"
+                job["error"] = "Cancelled before processing started"
+                job["cancelled"] = True
+                job["completion_time"] = datetime.now().isoformat()
+                self._save(job)
+                return dict(job)
+            job["cancel_requested"] = True
+            job = dict(job)
+        self._request_stop(job_id)
+        return job
+
+    def _request_stop(self, job_id):
+        if self.on_cancel is not None:
+            try:
+                self.on_cancel(job_id)
+            except Exception as e:
+                print(f"Failed to stop job {job_id}: {e}")
+
+    def running_jobs(self):
+        """Return copies of the jobs currently being processed, oldest first."""
+        with self._condition:
+            return [dict(self._jobs[job_id]) for job_id in self._running]
+
+    def stats(self):
+        """Return queue depth, running count and worker configuration."""
+        with self._condition:
+            return {
+                "queue_depth": len(self._pending),
+                "max_depth": self.max_depth,
+                "running": len(self._running),
+                "workers": self.workers,
+                "average_job_seconds": round(self._average_duration(), 1),
+            }
+
+    def _average_duration(self):
+        if not self._durations:
+            return DEFAULT_JOB_SECONDS
+        return sum(self._durations) / len(self._durations)
+
+    def _estimate_wait(self, position):
+        # Jobs ahead of this one first take any idle workers, then start in
+        # rounds of `workers` as running jobs finish
+        idle = self.workers - len(self._running)
+        if position < idle:
+            return 0
+        rounds = (position - idle) // self.workers + 1
+        return round(rounds * self._average_duration())
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                job_id = self._pending.popleft()
+                self._running.append(job_id)
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["start_time"] = datetime.now().isoformat()
+
+            started = time.monotonic()
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self._running.remove(job_id)
+                    self._jobs.pop(job_id, None)
+                    if self._by_content.get(job.get("content_hash")) == job_id:
+                        del self._by_content[job["content_hash"]]
+                    self._durations.append(time.monotonic() - started)
+
+    def _run(self, job):
+        # Process a job that is already marked running and record how it ended
+        try:
+            self._save(job)
+            self.process_job(job)
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"Job {job['job_id']} failed: {e}")
+        finally:
+            if job["status"] not in ("completed", "failed"):
+                job["status"] = "failed"
+                job.setdefault("error", "Processing ended without a result")
+            job.setdefault("completion_time", datetime.now().isoformat())
+            try:
+                self._save(job)
+                self.store.compact()
+            except Exception as e:
+                print(f"Failed to record job {job['job_id']}: {e}")
+
+
+class SharedJobQueue(JobQueue):
+    """
+    Job queue kept in the job store, for several server processes at once.
+
+    Queued jobs live only in the database. Any process can submit or look
+    up jobs; processes that call start() run workers that claim the oldest
+    queued job in a write transaction, so each job runs exactly once no
+    matter how many processes share the database. Running jobs hold a lease
+    renewed by their process; when a process dies its jobs are failed once
+    the lease runs out.
+    """
+
+    def __init__(
+        self,
+        process_job,
+        store,
+        workers=1,
+        max_depth=20,
+        on_update=None,
+        on_cancel=None,
+        poll_interval=1.0,
+        lease_seconds=60,
+    ):
+        """
+        Args:
+            process_job: Function called with a job dictionary on a worker thread
+            store: JobStore shared by every process
+            workers: Number of jobs this process runs at the same time
+            max_depth: Maximum number of jobs waiting to start, across processes
+            on_update: Function called with a copy of a job whenever it is saved
+            on_cancel: Function called with the ID of a job running in this
+                process that was asked to stop, from any process
+            poll_interval: Seconds between checks for queued jobs and
+                cancellations
+            lease_seconds: Seconds a running job survives without a heartbeat
+                from its process
+        """
+        super().__init__(process_job, store, workers, max_depth, on_update, on_cancel)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+
+    def start(self):
+        """Start the worker threads and the lease keeper."""
+        super().start()
+        thread = threading.Thread(target=self._keep_leases, name="job-leases", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    @property
+    def depth(self):
+        """Number of jobs waiting to start, across processes."""
+        return self.store.count_by_status("queued")
+
+    def submit(self, job):
+        """
+        Queue a job, or join an unfinished job for the same content.
+
+        Args:
+            job: Job dictionary; "job_id", "status" and "queued_time" are set here
+
+        Returns:
+            ID of the job that will produce the result
+
+        Raises:
+            QueueFull: If max_depth jobs are already waiting
+        """
+        job["job_id"] = uuid.uuid4().hex
+        job["status"] = "queued"
+        job["queued_time"] = datetime.now().isoformat()
+        job_id, depth = self.store.enqueue(job, self.max_depth)
+        if job_id is None:
+            raise QueueFull(depth)
+        if job_id == job["job_id"]:
+            self._notify(job)
+            self._wake.set()
+        return job_id
+
+    def resubmit(self, job):
+        """Queued jobs stay in the store across restarts, so there is nothing to do."""
+
+    def get(self, job_id):
+        """
+        Look up a job with its current queue position and estimated wait.
+
+        Args:
+            job_id: ID returned by submit
+
+        Returns:
+            Job dictionary, or None if the job is unknown
+        """
+        job = self.store.get(job_id)
+        if job is not None and job["status"] == "queued":
+            position = self.store.queue_position(job)
+            job["queue_position"] = position + 1
+            job["estimated_wait_seconds"] = self._estimate_wait(position)
+        return job
+
+    def update_queued(self, job_id, **fields):
+        """
+        Set fields on a job that has not started yet.
+
+        Returns:
+            Copy of the updated job, or None if the job is not queued
+        """
+        job = self.store.update_queued(job_id, fields)
+        if job is not None:
+            self._notify(job)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job, or ask a running one to stop.
+
+        The process running the job notices within poll_interval.
+
+        Returns:
+            The job, or None if it is not queued or running
+        """
+        job = self.store.cancel(job_id)
+        if job is not None:
+            self._notify(job)
+        return job
+
+    def running_jobs(self):
+        """Return the jobs being processed by any process, oldest first."""
+        return self.store.by_status("running")
+
+    def stats(self):
+        """Return queue depth, running count and worker configuration."""
+        return {
+            "queue_depth": self.depth,
+            "max_depth": self.max_depth,
+            "running": self.store.count_by_status("running"),
+            "workers": self.workers,
+            "average_job_seconds": round(self._average_duration(), 1),
+        }
+
+    def _average_duration(self):
+        durations = self.store.recent_durations()
+        if not durations:
+            return DEFAULT_JOB_SECONDS
+        return sum(durations) / len(durations)
+
+    def _estimate_wait(self, position):
+        # Other processes' workers are not known here, so assume this
+        # process's worker count serves the whole queue
+        running = self.store.count_by_status("running")
+        idle = max(self.workers - running, 0)
+        if position < idle:
+            return 0
+        rounds = (position - idle) // self.workers + 1
+        return round(rounds * self._average_duration())
+
+    def _work(self):
+        while True:
+            try:
+                job = self.store.claim(self.worker_id)
+            except Exception as e:
+                print(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _keep_leases(self):
+        renewed = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                for job_id in self.store.cancel_requests(self.worker_id):
+                    self._request_stop(job_id)
+                if time.monotonic() - renewed < self.lease_seconds / 4:
+                    continue
+                renewed = time.monotonic()
+                self.store.touch_claims(self.worker_id)
+                for job in self.store.expire_claims(self.lease_seconds):
+                    print(f"Job {job['job_id']} lost its worker")
+                    self._notify(job)
+            except Exception as e:
+                print(f"Failed to renew job leases: {e}")
@@ -0,0 +1,516 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Job fields stored in their own columns; anything else goes in the data column
+JOB_COLUMNS = (
+    "job_id",
+    "status",
+    "original_filename",
+    "audio_file",
+    "midi_filename",
+    "error",
+    "queued_time",
+    "start_time",
+    "completion_time",
+    "content_hash",
+    "claimed_by",
+)
+FINISHED_STATUSES = ("completed", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    original_filename TEXT,
+    audio_file TEXT,
+    midi_filename TEXT,
+    error TEXT,
+    queued_time TEXT,
+    start_time TEXT,
+    completion_time TEXT,
+    content_hash TEXT,
+    claimed_by TEXT,
+    heartbeat REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, queued_time);
+CREATE INDEX IF NOT EXISTS jobs_completion ON jobs (completion_time);
+CREATE INDEX IF NOT EXISTS jobs_content ON jobs (content_hash);
+CREATE INDEX IF NOT EXISTS jobs_claims ON jobs (claimed_by, status);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS transcriptions (
+    content_hash TEXT PRIMARY KEY,
+    midi_filename TEXT NOT NULL,
+    job_id TEXT,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS event_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+class JobStore:
+    """
+    Durable record of processing jobs backed by SQLite in WAL mode.
+
+    Stores job records, their status changes, the MIDI transcribed from
+    each distinct audio file and small pieces of shared state such as the
+    last MIDI library update. Each thread gets its own connection; WAL lets
+    readers run while a job is being written.
+
+    Several server processes can share one database: enqueue and claim run
+    in write transactions, so each job is accepted against one queue depth
+    and started by exactly one worker, and the event log carries job and
+    library events between processes.
+    """
+
+    def __init__(self, path, retention_days=30, max_finished=1000):
+        """
+        Args:
+            path: Path to the SQLite database file
+            retention_days: Finished jobs older than this are compacted away
+            max_finished: Maximum number of finished jobs kept
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.max_finished = max_finished
+        self._local = threading.local()
+        with self._connection() as db:
+            db.executescript(_SCHEMA)
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        job = json.loads(row["data"])
+        for column in JOB_COLUMNS:
+            if row[column] is not None:
+                job[column] = row[column]
+        return job
+
+    def save(self, job):
+        """
+        Insert or update a job record, logging a status change if there is one.
+
+        Args:
+            job: Job dictionary with at least "job_id" and "status"
+        """
+        with self._connection() as db:
+            self._write(db, job)
+
+    def _write(self, db, job):
+        columns = {column: job.get(column) for column in JOB_COLUMNS}
+        data = json.dumps(
+            {key: value for key, value in job.items() if key not in JOB_COLUMNS},
+            default=str,
+        )
+        previous = db.execute(
+            "SELECT status FROM jobs WHERE job_id = ?", (job["job_id"],)
+        ).fetchone()
+        db.execute(
+            f"""
+            INSERT INTO jobs ({", ".join(JOB_COLUMNS)}, data)
+            VALUES ({", ".join("?" * len(JOB_COLUMNS))}, ?)
+            ON CONFLICT (job_id) DO UPDATE SET
+            {", ".join(f"{column} = excluded.{column}" for column in JOB_COLUMNS[1:])},
+            data = excluded.data
+            """,
+            (*columns.values(), data),
+        )
+        if previous is None or previous["status"] != job["status"]:
+            db.execute(
+                "INSERT INTO job_events (job_id, status, at) VALUES (?, ?, ?)",
+                (job["job_id"], job["status"], datetime.now().isoformat()),
+            )
+
+    def get(self, job_id):
+        """Return a job record by ID, or None."""
+        row = self._connection().execute(
+            "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(row)
+
+    def events(self, job_id):
+        """Return the status changes of a job, oldest first."""
+        rows = self._connection().execute(
+            "SELECT status, at FROM job_events WHERE job_id = ? ORDER BY id", (job_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def by_status(self, status, limit=None):
+        """Return jobs with the given status, oldest queued first."""
+        query = "SELECT * FROM jobs WHERE status = ? ORDER BY queued_time"
+        params = (status,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        rows = self._connection().execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def count_by_status(self, status):
+        """Return how many jobs have the given status."""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)
+        ).fetchone()[0]
+
+    def latest_finished(self):
+        """Return the most recently completed or failed job, or None."""
+        row = self._connection().execute(
+            """
+            SELECT * FROM jobs
+            WHERE completion_time IS NOT NULL AND status IN (?, ?)
+            ORDER BY completion_time DESC
+            LIMIT 1
+            """,
+            FINISHED_STATUSES,
+        ).fetchone()
+        return self._row_to_job(row)
+
+    def get_meta(self, key, default=None):
+        """Return a stored shared-state value."""
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return default if row is None else row["value"]
+
+    def set_meta(self, key, value):
+        """Store a shared-state value."""
+        with self._connection() as db:
+            db.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def setdefault_meta(self, key, value):
+        """Store a shared-state value unless one exists, and return the stored value."""
+        with self._connection() as db:
+            db.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO NOTHING",
+                (key, value),
+            )
+        return self.get_meta(key)
+
+    def enqueue(self, job, max_depth):
+        """
+        Insert a queued job unless the queue is full or the content is already queued.
+
+        The checks and the insert run in one write transaction, so processes
+        sharing the database cannot overfill the queue or queue the same
+        content twice.
+
+        Args:
+            job: Job dictionary with "job_id", "status" and "queued_time"
+            max_depth: Maximum number of queued jobs
+
+        Returns:
+            tuple: (ID of the job that will produce the result, or None if
+            the queue is full; number of queued jobs before this one)
+        """
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            if job.get("content_hash"):
+                row = db.execute(
+                    "SELECT job_id FROM jobs WHERE content_hash = ? "
+                    "AND status IN ('queued', 'running') LIMIT 1",
+                    (job["content_hash"],),
+                ).fetchone()
+                if row is not None:
+                    return row["job_id"], None
+            depth = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            if depth >= max_depth:
+                return None, depth
+            self._write(db, job)
+            return job["job_id"], depth
+
+    def claim(self, worker_id):
+        """
+        Mark the oldest queued job as running on a worker and return it.
+
+        Args:
+            worker_id: Identifies the claiming process in "claimed_by"
+
+        Returns:
+            The claimed job, or None if nothing is queued
+        """
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            job = self._row_to_job(
+                db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' "
+                    "ORDER BY queued_time, job_id LIMIT 1"
+                ).fetchone()
+            )
+            if job is None:
+                return None
+            job["status"] = "running"
+            job["start_time"] = datetime.now().isoformat()
+            job["claimed_by"] = worker_id
+            self._write(db, job)
+            db.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE job_id = ?", (time.time(), job["job_id"])
+            )
+            return job
+
+    def touch_claims(self, worker_id):
+        """Renew the lease on every job a worker is running."""
+        with self._connection() as db:
+            db.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE claimed_by = ? AND status = 'running'",
+                (time.time(), worker_id),
+            )
+
+    def expire_claims(self, lease_seconds):
+        """
+        Fail running jobs whose worker has not renewed its lease.
+
+        Args:
+            lease_seconds: Seconds without a heartbeat before a job is failed
+
+        Returns:
+            List of the jobs marked failed
+        """
+        db = self._connection()
+        expired = []
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status = 'running' "
+                "AND (heartbeat IS NULL OR heartbeat < ?)",
+                (time.time() - lease_seconds,),
+            ).fetchall()
+            for row in rows:
+                job = self._row_to_job(row)
+                job["status"] = "failed"
+                job["error"] = "The worker processing this job stopped responding"
+                job["completion_time"] = datetime.now().isoformat()
+                self._write(db, job)
+                expired.append(job)
+        return expired
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job, or flag a running one for its worker to stop.
+
+        The flag is kept outside the job record, so the worker's own saves
+        of a running job do not clear it.
+
+        Returns:
+            The job as it now stands, or None if it is not queued or running
+        """
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            job = self._row_to_job(
+                db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            )
+            if job is None or job["status"] not in ("queued", "running"):
+                return None
+            if job["status"] == "queued":
+                job["status"] = "failed"
+                job["error"] = "Cancelled before processing started"
+                job["cancelled"] = True
+                job["completion_time"] = datetime.now().isoformat()
+                self._write(db, job)
+            else:
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+                job["cancel_requested"] = True
+            return job
+
+    def cancel_requests(self, worker_id):
+        """Return the IDs of running jobs of a worker that were asked to stop."""
+        rows = self._connection().execute(
+            "SELECT job_id FROM jobs "
+            "WHERE claimed_by = ? AND status = 'running' AND cancel_requested = 1",
+            (worker_id,),
+        ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def queue_position(self, job):
+        """Return how many queued jobs are ahead of a queued job."""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+            "AND (queued_time < ? OR (queued_time = ? AND job_id < ?))",
+            (job["queued_time"], job["queued_time"], job["job_id"]),
+        ).fetchone()[0]
+
+    def recent_durations(self, limit=20):
+        """Return the wall times in seconds of the most recently finished jobs."""
+        rows = self._connection().execute(
+            """
+            SELECT (julianday(completion_time) - julianday(start_time)) * 86400
+            FROM jobs
+            WHERE status IN (?, ?) AND start_time IS NOT NULL AND completion_time IS NOT NULL
+            ORDER BY completion_time DESC
+            LIMIT ?
+            """,
+            (*FINISHED_STATUSES, limit),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def update_queued(self, job_id, fields):
+        """
+        Set fields on a job that has not started yet.
+
+        Returns:
+            The updated job, or None if the job is not queued
+        """
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            job = self._row_to_job(
+                db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            )
+            if job is None or job["status"] != "queued":
+                return None
+            job.update(fields)
+            self._write(db, job)
+            return job
+
+    def append_event(self, event_type, data):
+        """
+        Add an event to the shared event log.
+
+        Args:
+            event_type: Event name, such as "job" or "library"
+            data: JSON-serialisable payload
+
+        Returns:
+            ID of the logged event
+        """
+        with self._connection() as db:
+            cursor = db.execute(
+                "INSERT INTO event_log (type, data) VALUES (?, ?)",
+                (event_type, json.dumps(data, default=str)),
+            )
+            return cursor.lastrowid
+
+    def events_since(self, last_id, limit=500):
+        """Return (id, type, data) for logged events after last_id, oldest first."""
+        rows = self._connection().execute(
+            "SELECT id, type, data FROM event_log WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, limit),
+        ).fetchall()
+        return [(row["id"], row["type"], json.loads(row["data"])) for row in rows]
+
+    def last_event_id(self):
+        """Return the ID of the newest logged event, or 0."""
+        row = self._connection().execute("SELECT MAX(id) FROM event_log").fetchone()
+        return row[0] or 0
+
+    def trim_events(self, keep):
+        """Delete all but the newest `keep` logged events."""
+        with self._connection() as db:
+            db.execute(
+                "DELETE FROM event_log WHERE id <= (SELECT MAX(id) FROM event_log) - ?", (keep,)
+            )
+
+    def record_transcription(self, content_hash, midi_filename, job_id=None):
+        """
+        Remember the MIDI transcribed from an audio file's content.
+
+        Args:
+            content_hash: SHA-256 hex digest of the audio bytes
+            midi_filename: Name of the MIDI file in the MIDI folder
+            job_id: Job that produced the MIDI
+        """
+        with self._connection() as db:
+            db.execute(
+                "INSERT INTO transcriptions (content_hash, midi_filename, job_id, created) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (content_hash) DO UPDATE SET "
+                "midi_filename = excluded.midi_filename, job_id = excluded.job_id, "
+                "created = excluded.created",
+                (content_hash, midi_filename, job_id, datetime.now().isoformat()),
+            )
+
+    def find_transcription(self, content_hash):
+        """Return the transcription record for an audio content hash, or None."""
+        row = self._connection().execute(
+            "SELECT * FROM transcriptions WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        return None if row is None else dict(row)
+
+    def forget_transcription(self, content_hash):
+        """Drop a transcription record whose MIDI no longer exists."""
+        with self._connection() as db:
+            db.execute("DELETE FROM transcriptions WHERE content_hash = ?", (content_hash,))
+
+    def compact(self):
+        """
+        Delete finished jobs past the retention period or beyond max_finished.
+
+        Returns:
+            Number of jobs deleted
+        """
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        with self._connection() as db:
+            doomed = [
+                row[0]
+                for row in db.execute(
+                    """
+                    SELECT job_id FROM jobs
+                    WHERE completion_time IS NOT NULL AND status IN (?, ?)
+                    AND (
+                        completion_time < ?
+                        OR job_id NOT IN (
+                            SELECT job_id FROM jobs
+                            WHERE completion_time IS NOT NULL
+                            ORDER BY completion_time DESC
+                            LIMIT ?
+                        )
+                    )
+                    """,
+                    (*FINISHED_STATUSES, cutoff, self.max_finished),
+                )
+            ]
+            db.executemany("DELETE FROM job_events WHERE job_id = ?", ((job_id,) for job_id in doomed))
+            db.executemany("DELETE FROM jobs WHERE job_id = ?", ((job_id,) for job_id in doomed))
+        return len(doomed)
+
+    def recover(self):
+        """
+        Reconcile jobs left unfinished by a previous server process.
+
+        Running jobs lost their worker and are marked failed. Queued jobs are
+        returned so they can be queued again.
+
+        Returns:
+            List of queued jobs, oldest first
+        """
+        for job in self.by_status("running"):
+            job["status"] = "failed"
+            job["error"] = "Interrupted by a server restart"
+            job["completion_time"] = datetime.now().isoformat()
+            self.save(job)
+        return self.by_status("queued")
@@ -1,15 +1,40 @@
+import hmac
+import multiprocessing
 import os
-import shutil
-import subprocess
 import threading
 import time
+import uuid
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from functools import partial
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, send_file
 from flask_cors import CORS, cross_origin
 from werkzeug.utils import secure_filename
 
-from midi_parser import midi_to_json
+from batch_parse import BatchParser
+from events import EventBus, SharedEventRelay
+from http_cache import BodyCache, cached_response
+from job_queue import JobQueue, QueueFull, SharedJobQueue
+from job_store import JobStore
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import Registry
+from midi_cache import MidiCache, estimate_size, file_identity
+from midi_catalogue import SORT_KEYS, MidiCatalogue
+from midi_parser import (
+    COLUMNS_MIMETYPE,
+    LOD_LEVELS,
+    columns_to_json,
+    level_of_detail_variants,
+    pack_columns,
+)
+from midi_sidecar import load_midi_columns, load_overview, write_sidecar
+from note_index import build_note_index, index_size
+from process_runner import ProcessCancelled, Task
+from profiling import ProfileStore
+from storage import StorageFull, StorageManager, unique_filename
+from transcription import create_transcriber, parse_progress
+from uploads import ChunkedUploads, UploadError, save_and_hash
 
 app = Flask(__name__)
 CORS(app)
@@ -18,7 +43,55 @@ app.config["CORS_HEADERS"] = "Content-Type"
 # Configuration
 app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50MB max file size
 app.config["UPLOAD_FOLDER"] = "user_audio_files"
+# Chunked uploads in progress; kept outside UPLOAD_FOLDER, on the same filesystem
+app.config["PARTIAL_UPLOAD_FOLDER"] = "partial_uploads"
+app.config["CHUNKED_UPLOAD_MAX_BYTES"] = 500 * 1024 * 1024  # 500MB max chunked upload
+app.config["CHUNKED_UPLOAD_EXPIRE_SECONDS"] = 24 * 60 * 60  # Idle chunked uploads are discarded
 app.config["MIDI_FOLDER"] = "midi_files"
+app.config["MIDI_CACHE_MAX_BYTES"] = 256 * 1024 * 1024  # 256MB of parsed MIDI data
+app.config["NOTE_INDEX_CACHE_MAX_BYTES"] = 64 * 1024 * 1024  # 64MB of note range indexes
+app.config["LOD_CACHE_MAX_BYTES"] = 128 * 1024 * 1024  # 128MB of reduced level-of-detail data
+app.config["RESPONSE_CACHE_MAX_BYTES"] = 64 * 1024 * 1024  # 64MB of encoded bodies
+app.config["BATCH_PARSE_WORKERS"] = 2  # Processes parsing files for /api/midi/batch
+app.config["BATCH_MAX_IN_FLIGHT"] = 2  # Files of one batch parsed at the same time
+app.config["BATCH_MAX_FILES"] = 200  # Largest batch accepted
+app.config["MIDI_SCAN_INTERVAL"] = 30  # Seconds between checks for out-of-band MIDI files
+app.config["TRANSCRIPTION_WORKERS"] = 1  # Audio files transcribed at the same time
+app.config["JOB_QUEUE_MAX_DEPTH"] = 20  # Uploads waiting for a worker before returning 429
+app.config["JOB_DB_PATH"] = "jobs.db"  # SQLite store for job records and shared state
+app.config["JOB_RETENTION_DAYS"] = 30  # Finished jobs older than this are compacted away
+app.config["JOB_HISTORY_MAX"] = 1000  # Finished jobs kept at most
+# Several server processes share the job store (see wsgi.py and worker.py)
+app.config["SHARED_STATE"] = os.environ.get("BACKEND_SHARED_STATE") == "1"
+# Run transcription workers in this process; off in web processes of a shared deployment
+app.config["RUN_JOB_WORKERS"] = os.environ.get("BACKEND_RUN_JOB_WORKERS", "1") == "1"
+app.config["JOB_LEASE_SECONDS"] = 60  # Shared mode: running jobs of a silent process then fail
+app.config["JOB_POLL_SECONDS"] = 1  # Shared mode: idle workers check for queued jobs this often
+app.config["EVENT_RELAY_SECONDS"] = 0.25  # Shared mode: delay before other processes see events
+app.config["SCRATCH_FOLDER"] = "scratch"  # Per-job work directories; same filesystem as MIDI_FOLDER
+app.config["UPLOAD_RETENTION_DAYS"] = 7  # Uploaded audio older than this is deleted; 0 keeps it
+app.config["UPLOAD_QUOTA_BYTES"] = 5 * 1024 * 1024 * 1024  # 5GB of uploaded audio; 0 for no quota
+app.config["STORAGE_SWEEP_INTERVAL"] = 15 * 60  # Seconds between storage sweeps
+app.config["STORAGE_GRACE_SECONDS"] = 2 * 60 * 60  # Age before untracked scratch data is swept
+app.config["PICOGEN_DIR"] = "PiCoGen"
+app.config["TRANSCRIPTION_BACKEND"] = "conda"  # "conda" per job, "warm" worker pool or "dummy"
+app.config["TRANSCRIPTION_ENGINE"] = "picogen"  # Engine loaded by warm workers: "picogen" or "dummy"
+app.config["WARM_WORKER_MAX_JOBS"] = 50  # Jobs a warm worker handles before it is recycled
+app.config["WARM_WORKER_HEALTH_INTERVAL"] = 30  # Seconds between warm worker health checks
+app.config["SEGMENT_SECONDS"] = 120  # Longer recordings are transcribed in segments; 0 disables
+app.config["SEGMENT_OVERLAP_SECONDS"] = 4  # Audio shared by neighbouring segments
+app.config["SEGMENT_PARALLELISM"] = 2  # Segments of one recording transcribed at the same time
+app.config["TRANSCRIPTION_TIMEOUT_SECONDS"] = 60 * 60  # Jobs transcribing longer are killed; 0 disables
+app.config["JOB_LOG_LINES"] = 200  # Lines of engine output kept in memory per running job
+app.config["JOB_LOG_TAIL_LINES"] = 20  # Most recent of those lines shown in the job record
+app.config["EVENT_HISTORY"] = 1000  # Recent events replayed to reconnecting clients
+app.config["EVENT_HEARTBEAT_SECONDS"] = 15  # Keep-alive interval on idle event streams
+app.config["EVENT_STREAM_MAX_CLIENTS"] = 100  # Open event streams before clients must long-poll
+app.config["EVENT_POLL_MAX_SECONDS"] = 30  # Longest a long-poll request is held open
+app.config["PROFILING_ENABLED"] = False  # Allow ?profile=1 on MIDI requests and uploads
+app.config["PROFILING_TOKEN"] = os.environ.get("PROFILING_TOKEN")  # Required when set
+app.config["PROFILE_FOLDER"] = "profiles"  # Captured profiles kept for download
+app.config["PROFILE_MAX_KEPT"] = 50  # Oldest profiles are deleted beyond this
 ALLOWED_EXTENSIONS = {
     "mp3",
     "wav",
@@ -32,16 +105,329 @@ ALLOWED_EXTENSIONS = {
     "midi",
 }
 
+# Batch parse workers are spawned processes that import the main script again,
+# under their own process name; when that is this module, they must not
+# recover jobs or start background work
+SERVER_PROCESS = multiprocessing.current_process().name == "MainProcess"
+
 # Create upload directories if they don't exist
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 os.makedirs(app.config["MIDI_FOLDER"], exist_ok=True)
 
-# Global state for background processing
-processing_jobs = {
-    "current_job": None,  # Will store job info when processing
-    "job_history": [],  # Store completed/failed jobs
-    "last_midi_update": None,  # Track when MIDI list was last updated
-}
+# Durable state for background processing: job records and when the MIDI
+# list was last updated
+job_store = JobStore(
+    app.config["JOB_DB_PATH"],
+    retention_days=app.config["JOB_RETENTION_DAYS"],
+    max_finished=app.config["JOB_HISTORY_MAX"],
+)
+job_store.compact()
+
+
+def job_unfinished(job_id):
+    """Check whether a job is queued or running, in any server process."""
+    job = job_store.get(job_id)
+    return job is not None and job["status"] in ("queued", "running")
+
+
+def uploads_in_use():
+    """Return the audio files still needed by queued or running jobs."""
+    return {
+        job["audio_file"]
+        for status in ("queued", "running")
+        for job in job_store.by_status(status)
+        if job.get("audio_file")
+    }
+
+
+# Chunked uploads in progress; the room they will take counts against the upload quota
+chunked_uploads = ChunkedUploads(
+    app.config["PARTIAL_UPLOAD_FOLDER"],
+    app.config["CHUNKED_UPLOAD_MAX_BYTES"],
+    app.config["CHUNKED_UPLOAD_EXPIRE_SECONDS"],
+)
+
+
+def pending_audio_bytes():
+    """Return the bytes promised to chunked audio uploads still arriving."""
+    # Chunked MIDI uploads land in the MIDI folder, outside the upload quota
+    return chunked_uploads.reserved_bytes(
+        lambda filename: not filename.lower().endswith((".mid", ".midi"))
+    )
+
+
+# Uploads, per-job scratch directories and publishing of finished MIDI files
+storage = StorageManager(
+    app.config["UPLOAD_FOLDER"],
+    app.config["SCRATCH_FOLDER"],
+    retention_days=app.config["UPLOAD_RETENTION_DAYS"],
+    quota_bytes=app.config["UPLOAD_QUOTA_BYTES"],
+    grace_seconds=app.config["STORAGE_GRACE_SECONDS"],
+    job_active=job_unfinished,
+    uploads_in_use=uploads_in_use,
+    pending_uploads=pending_audio_bytes,
+    # Output directories made inside PiCoGen by earlier versions
+    legacy_scratch=[os.path.join(app.config["PICOGEN_DIR"], "output_*")],
+)
+
+# Parsed MIDI data keyed on file identity, shared by all requests
+midi_cache = MidiCache(app.config["MIDI_CACHE_MAX_BYTES"])
+note_index_cache = MidiCache(app.config["NOTE_INDEX_CACHE_MAX_BYTES"], sizeof=index_size)
+lod_cache = MidiCache(
+    app.config["LOD_CACHE_MAX_BYTES"],
+    sizeof=lambda variants: sum(estimate_size(variant) for variant in variants),
+)
+response_cache = BodyCache(app.config["RESPONSE_CACHE_MAX_BYTES"])
+
+# Worker processes for batch parsing, spawned on the first batch request
+batch_parser = BatchParser(
+    midi_cache,
+    workers=app.config["BATCH_PARSE_WORKERS"],
+    max_in_flight=app.config["BATCH_MAX_IN_FLIGHT"],
+)
+
+# Job and library events pushed to clients over /api/events. With shared
+# state every process numbers events by their ID in the shared event log,
+# so a client can reconnect to any process without missing events.
+if app.config["SHARED_STATE"]:
+    event_bus = EventBus(
+        app.config["EVENT_HISTORY"],
+        epoch=job_store.setdefault_meta("event_epoch", uuid.uuid4().hex[:8]),
+        start=job_store.last_event_id(),
+    )
+else:
+    event_bus = EventBus(app.config["EVENT_HISTORY"])
+
+# On-demand cProfile captures of single requests and jobs
+profiles = ProfileStore(app.config["PROFILE_FOLDER"], app.config["PROFILE_MAX_KEPT"])
+
+# Prometheus metrics served at /metrics
+metrics = Registry()
+request_seconds = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, by route",
+    ("method", "route", "status"),
+)
+midi_load_seconds = metrics.histogram(
+    "midi_load_duration_seconds",
+    "Time to load parsed MIDI data on a cache miss (sidecar read or full parse)",
+)
+midi_load_notes = metrics.histogram(
+    "midi_load_notes",
+    "Notes in MIDI files loaded on a cache miss",
+    buckets=(100, 1000, 10000, 100000, 1000000),
+)
+upload_bytes = metrics.counter("upload_bytes_total", "Bytes received in uploads", ("kind",))
+uploads = metrics.counter("uploads_total", "Uploads received", ("kind",))
+upload_receive_seconds = metrics.histogram(
+    "upload_receive_duration_seconds", "Time to receive and store a single-request upload"
+)
+job_phase_seconds = metrics.histogram(
+    "job_phase_duration_seconds",
+    "Transcription job time by phase: queue wait, mkdir, inference, publish/catalogue and cleanup",
+    ("phase",),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+jobs_finished = metrics.counter("jobs_finished_total", "Transcription jobs finished", ("status",))
+cache_hits = metrics.gauge("cache_hits", "Cache hits since startup", ("cache",))
+cache_misses = metrics.gauge("cache_misses", "Cache misses since startup", ("cache",))
+cache_hit_ratio = metrics.gauge("cache_hit_ratio", "Cache hits over lookups", ("cache",))
+cache_bytes = metrics.gauge("cache_bytes", "Estimated bytes held by each cache", ("cache",))
+job_queue_depth = metrics.gauge("job_queue_depth", "Transcription jobs waiting to start")
+jobs_running = metrics.gauge("jobs_running", "Transcription jobs being processed")
+event_subscribers = metrics.gauge("event_stream_clients", "Open /api/events streams")
+storage_bytes = metrics.gauge("storage_bytes", "Bytes held on disk, by area", ("area",))
+storage_swept = metrics.gauge(
+    "storage_swept_files", "Files and directories removed by storage sweeps", ("kind",)
+)
+
+
+@metrics.collector
+def collect_runtime_metrics():
+    """Copy cache and queue counters into gauges at scrape time."""
+    for name, cache in (
+        ("midi", midi_cache),
+        ("note_index", note_index_cache),
+        ("lod", lod_cache),
+        ("responses", response_cache),
+    ):
+        stats = cache.stats()
+        cache_hits.set(stats["hits"], name)
+        cache_misses.set(stats["misses"], name)
+        cache_hit_ratio.set(stats["hit_ratio"], name)
+        cache_bytes.set(stats["bytes"], name)
+    queue_stats = job_queue.stats()
+    job_queue_depth.set(queue_stats["queue_depth"])
+    jobs_running.set(queue_stats["running"])
+    event_subscribers.set(event_bus.subscribers)
+    storage_stats = storage.stats()
+    storage_bytes.set(storage_stats["upload_bytes"], "uploads")
+    storage_bytes.set(storage_stats["scratch_bytes"], "scratch")
+    for kind, count in storage_stats["swept"].items():
+        storage_swept.set(count, kind)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the latency of every routed request; streamed bodies count until the first byte."""
+    started = getattr(g, "request_started", None)
+    if started is not None and request.url_rule is not None:
+        request_seconds.observe(
+            time.perf_counter() - started,
+            request.method,
+            request.url_rule.rule,
+            response.status_code,
+        )
+    return response
+
+
+def publish_event(event_type, data):
+    """Push an event to connected clients of every server process."""
+    if event_relay is not None:
+        event_relay.publish(event_type, data)
+    else:
+        event_bus.publish(event_type, data)
+
+
+def mark_midi_update():
+    """Record that the MIDI list changed and tell connected clients to refresh it."""
+    timestamp = datetime.now().isoformat()
+    job_store.set_meta("last_midi_update", timestamp)
+    publish_event("library", {"last_update": timestamp, "version": midi_catalogue.version})
+
+
+def publish_job(job):
+    """Push a job's current state to connected clients."""
+    publish_event("job", job)
+
+
+def on_shared_event(event_type, data):
+    """Bring this process's catalogue up to date when any process changes the library."""
+    if event_type == "library":
+        midi_catalogue.scan()
+
+
+def report_progress(job_info, phase, **details):
+    """
+    Record the phase a running job is in and push it to clients.
+
+    Args:
+        job_info: Job dictionary being processed
+        phase: Short phase name, such as "transcribing" or "storing"
+        **details: Extra progress fields stored on the job, such as
+            segments_done and segments_total
+    """
+    with job_progress_lock:
+        job_info["phase"] = phase
+        job_info.update(details)
+        job_store.save(job_info)
+        publish_job(dict(job_info))
+
+
+# Serialises progress updates, which arrive from every segment of a job at once
+job_progress_lock = threading.RLock()
+
+# Supervision handles of the jobs transcribing in this process, by job ID
+job_tasks = {}
+job_tasks_lock = threading.Lock()
+
+
+def report_output(job_info, task):
+    """
+    Copy a running job's latest engine output and progress into its record.
+
+    Args:
+        job_info: Job dictionary being processed
+        task: process_runner.Task the job's subprocesses run under
+    """
+    with job_progress_lock:
+        job_info["log_tail"] = task.tail(app.config["JOB_LOG_TAIL_LINES"])
+        if task.progress is not None:
+            job_info["progress"] = round(task.progress, 3)
+        report_progress(job_info, job_info.get("phase", "transcribing"))
+
+
+def cancel_running_job(job_id):
+    """Kill the subprocesses of a job transcribing in this process, if any."""
+    with job_tasks_lock:
+        task = job_tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+
+
+@contextmanager
+def timed_phase(job_info, phase):
+    """
+    Time one phase of a job into its "phase_seconds" and the phase histogram.
+
+    Args:
+        job_info: Job dictionary being processed
+        phase: Phase name, such as "mkdir", "inference", "publish" or "cleanup"
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        job_info.setdefault("phase_seconds", {})[phase] = round(elapsed, 6)
+        job_phase_seconds.observe(elapsed, phase)
+
+
+def profiling_allowed():
+    """
+    Check whether the current request may capture or download profiles.
+
+    Profiling must be enabled with PROFILING_ENABLED, and if PROFILING_TOKEN
+    is set the request must send it in the X-Profile-Token header or the
+    token query parameter.
+    """
+    if not app.config["PROFILING_ENABLED"]:
+        return False
+    expected = app.config["PROFILING_TOKEN"]
+    if not expected:
+        return True
+    supplied = request.headers.get("X-Profile-Token") or request.args.get("token") or ""
+    return hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8"))
+
+
+def profile_requested():
+    """Check whether the current request asked to be profiled and may be."""
+    return request.args.get("profile") in ("1", "true") and profiling_allowed()
+
+
+def last_midi_update():
+    """Return the ISO timestamp of the last MIDI list change, or None."""
+    return job_store.get_meta("last_midi_update")
+
+
+# Catalogue of the MIDI folder. Names are listed right away; metadata, and
+# sidecars for files added without going through an upload, are filled in
+# by the background scan, which also picks up later out-of-band changes.
+midi_catalogue = MidiCatalogue(app.config["MIDI_FOLDER"])
+midi_catalogue.scan(with_metadata=False)
+if SERVER_PROCESS:
+    threading.Thread(
+        target=midi_catalogue.scan_forever,
+        args=(app.config["MIDI_SCAN_INTERVAL"], mark_midi_update),
+        daemon=True,
+    ).start()
+
+# Shared mode: events from every process arrive through the job store
+event_relay = None
+if app.config["SHARED_STATE"] and SERVER_PROCESS:
+    event_relay = SharedEventRelay(
+        job_store,
+        event_bus,
+        interval=app.config["EVENT_RELAY_SECONDS"],
+        history=app.config["EVENT_HISTORY"],
+        on_event=on_shared_event,
+    )
+    event_relay.start()
 
 
 def allowed_file(filename):
@@ -49,131 +435,349 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def process_audio_async(audio_file_path, original_filename):
+def process_audio_async(job_info):
     """
-    Process audio file asynchronously using conda environment.
+    Process a queued audio file with the configured transcription backend.
+
+    Runs on a job queue worker thread and records progress in the job
+    dictionary.
 
     Args:
-        audio_file_path: Path to the uploaded audio file
-        original_filename: Original filename for naming the output MIDI
+        job_info: Job dictionary with "audio_file" (path to the uploaded
+            audio file) and "original_filename" (for naming the output MIDI)
     """
-    job_info = None
+    audio_file_path = job_info["audio_file"]
+    original_filename = job_info["original_filename"]
     try:
-        # Generate unique output directory name (relative to PiCoGen directory)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_dir = f"output_{timestamp}"
-
-        # Create output directory inside PiCoGen
-        picogen_dir = os.path.join(os.getcwd(), "PiCoGen")
-        full_output_dir = os.path.join(picogen_dir, output_dir)
-        os.makedirs(full_output_dir, exist_ok=True)
+        # Work in a scratch directory of this job's own, on the MIDI folder's filesystem
+        with timed_phase(job_info, "mkdir"):
+            full_output_dir = storage.create_scratch(job_info["job_id"])
 
         # Update job status
-        job_info = {
-            "status": "running",
-            "start_time": datetime.now().isoformat(),
-            "audio_file": audio_file_path,
-            "output_dir": full_output_dir,
-            "original_filename": original_filename,
-        }
-        processing_jobs["current_job"] = job_info
-
-        # Convert audio file path to be relative to PiCoGen directory
-        relative_audio_path = os.path.relpath(audio_file_path, picogen_dir)
-
-        # Run conda command from PiCoGen directory
-        cmd = [
-            "conda",
-            "run",
-            "-n",
-            "picogen2",
-            "./infer.sh",
-            "--input_audio",
-            relative_audio_path,
-            "--output_dir",
-            output_dir,
-        ]
-
-        # Execute the command and wait for completion (run from PiCoGen directory)
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=picogen_dir)
-
-        if result.returncode == 0:
-            # Success - copy piano.mid to midi_files
-            piano_mid_path = os.path.join(full_output_dir, "piano.mid")
-            if os.path.exists(piano_mid_path):
-                # Generate unique MIDI filename
-                name, _ = os.path.splitext(original_filename)
-                midi_filename = f"{name}_{timestamp}.mid"
-                midi_dest_path = os.path.join(app.config["MIDI_FOLDER"], midi_filename)
-
-                # Copy the file
-                shutil.copy2(piano_mid_path, midi_dest_path)
-
-                # Update job status
-                job_info["status"] = "completed"
-                job_info["midi_filename"] = midi_filename
-                job_info["completion_time"] = datetime.now().isoformat()
-
-                # Update MIDI list timestamp for UI refresh
-                processing_jobs["last_midi_update"] = datetime.now().isoformat()
-
-                print(
-                    f"Audio processing completed successfully. MIDI saved as: {midi_filename}"
+        job_info["output_dir"] = full_output_dir
+
+        job_phase_seconds.observe(
+            (
+                datetime.fromisoformat(job_info["start_time"])
+                - datetime.fromisoformat(job_info["queued_time"])
+            ).total_seconds(),
+            "wait",
+        )
+
+        # Transcribe with the configured backend (per-job conda run, warm workers or dummy),
+        # killed on timeout or cancellation, with its output streamed into a bounded log
+        task = Task(
+            job_info["job_id"],
+            timeout=app.config["TRANSCRIPTION_TIMEOUT_SECONDS"] or None,
+            log_lines=app.config["JOB_LOG_LINES"],
+            parse_progress=parse_progress,
+            on_update=lambda task: report_output(job_info, task),
+        )
+        with job_tasks_lock:
+            job_tasks[job_info["job_id"]] = task
+        if job_info.get("cancel_requested"):
+            task.cancel()
+
+        report_progress(job_info, "transcribing")
+        with timed_phase(job_info, "inference"):
+            piano_mid_path = transcriber.transcribe(
+                audio_file_path,
+                full_output_dir,
+                progress=lambda done, total: report_progress(
+                    job_info, "transcribing", segments_done=done, segments_total=total
+                ),
+                task=task,
+            )
+
+        # Success - move piano.mid into midi_files
+        if os.path.exists(piano_mid_path):
+            # Generate unique MIDI filename
+            name, _ = os.path.splitext(original_filename)
+            midi_filename = unique_filename(name, ".mid")
+            midi_dest_path = os.path.join(app.config["MIDI_FOLDER"], midi_filename)
+
+            # Publish with an atomic rename, so the MIDI appears complete or not at all
+            report_progress(job_info, "storing")
+            with timed_phase(job_info, "publish"):
+                storage.publish(piano_mid_path, midi_dest_path)
+                precompute_midi(midi_dest_path)
+
+            # Update job status
+            job_info["status"] = "completed"
+            job_info["midi_filename"] = midi_filename
+            job_info["completion_time"] = datetime.now().isoformat()
+            if job_info.get("content_hash"):
+                job_store.record_transcription(
+                    job_info["content_hash"], midi_filename, job_info["job_id"]
                 )
-            else:
-                raise Exception("piano.mid not found in output directory")
+
+            # Update MIDI list timestamp for UI refresh
+            mark_midi_update()
+
+            print(f"Audio processing completed successfully. MIDI saved as: {midi_filename}")
         else:
-            # Command failed
-            raise Exception(
-                f"Processing failed with return code {result.returncode}: {result.stderr}"
-            )
+            raise Exception("piano.mid not found in output directory")
 
     except Exception as e:
         # Update job status to failed
-        if job_info is not None:
-            job_info["status"] = "failed"
-            job_info["error"] = str(e)
-            job_info["completion_time"] = datetime.now().isoformat()
-            print(f"Audio processing failed: {e}")
-        else:
-            print(f"Audio processing failed before job setup: {e}")
+        job_info["status"] = "failed"
+        job_info["error"] = str(e)
+        job_info["completion_time"] = datetime.now().isoformat()
+        if "task" in locals():
+            job_info["log_tail"] = task.tail(app.config["JOB_LOG_TAIL_LINES"])
+            if isinstance(e, ProcessCancelled):
+                job_info["cancelled"] = True
+        print(f"Audio processing failed: {e}")
 
     finally:
-        # Move job to history and clear current job
-        if job_info is not None:
-            processing_jobs["job_history"].append(job_info)
-        processing_jobs["current_job"] = None
+        jobs_finished.inc(job_info["status"])
+        with job_tasks_lock:
+            job_tasks.pop(job_info["job_id"], None)
 
-        # Clean up output directory
-        if "full_output_dir" in locals() and os.path.exists(full_output_dir):
+        # Clean up the scratch directory; the storage sweep retries on failure
+        if "full_output_dir" in locals():
             try:
-                shutil.rmtree(full_output_dir)
+                with timed_phase(job_info, "cleanup"):
+                    storage.release_scratch(full_output_dir)
             except Exception as e:
                 print(f"Failed to clean up output directory {full_output_dir}: {e}")
 
 
-def start_audio_processing(audio_file_path, original_filename):
+def process_job(job_info):
+    """
+    Run a job on a queue worker, under cProfile if it was flagged for profiling.
+
+    Args:
+        job_info: Job dictionary; a true "profile" field requests a profile,
+            whose ID is stored as "profile_id" (or "profile_error" if the
+            profiler was busy)
+    """
+    if not job_info.get("profile"):
+        process_audio_async(job_info)
+        return
+
+    with profiles.capture("job", job_info["job_id"]) as profile:
+        process_audio_async(job_info)
+    if profile["profile_id"] is not None:
+        job_info["profile_id"] = profile["profile_id"]
+    else:
+        job_info["profile_error"] = profile["error"]
+
+
+def precompute_midi(midi_path):
+    """
+    Write the precomputed sidecar for a newly stored MIDI file and catalogue it.
+
+    Failures are logged rather than raised so a MIDI that cannot be parsed
+    does not fail the upload or job that stored it.
+
+    Args:
+        midi_path: Path to the MIDI file in the MIDI folder
     """
-    Start audio processing in a background thread if no job is currently running.
+    midi_cache.invalidate(midi_path)
+    note_index_cache.invalidate(midi_path)
+    lod_cache.invalidate(midi_path)
+    midi_columns = None
+    try:
+        midi_columns = write_sidecar(midi_path)
+    except Exception as e:
+        print(f"Failed to precompute MIDI data for {midi_path}: {e}")
+    midi_catalogue.update(os.path.basename(midi_path), midi_columns)
+
+
+def load_midi(midi_path):
+    """Get parsed columns for a MIDI file through the parse cache."""
+    return midi_cache.get(midi_path, timed_load_midi_columns)
+
+
+def timed_load_midi_columns(midi_path):
+    """Load parsed columns for a cache miss, recording load time and note count."""
+    started = time.perf_counter()
+    midi_columns = load_midi_columns(midi_path)
+    midi_load_seconds.observe(time.perf_counter() - started)
+    midi_load_notes.observe(sum(len(track) for track in midi_columns["tracks"]))
+    return midi_columns
+
+
+def load_note_index(midi_path):
+    """Get the per-track interval index for a MIDI file through its cache."""
+    return note_index_cache.get(
+        midi_path, lambda path: build_note_index(load_midi(path))
+    )
+
+
+def load_level_of_detail(midi_path, level):
+    """
+    Get a reduced level of detail of a MIDI file through its cache.
+
+    All levels are built together the first time any of them is requested.
+
+    Args:
+        midi_path: Path to the MIDI file
+        level: Level from 1 to len(LOD_LEVELS)
+    """
+    variants = lod_cache.get(
+        midi_path, lambda path: level_of_detail_variants(load_midi(path))
+    )
+    return variants[level - 1]
+
+
+def midi_response(midi_path, build_columns, *variant):
+    """
+    Serve parsed MIDI columns in the format the client asked for.
+
+    Clients that send "Accept: application/vnd.midi-columns" get the packed
+    columnar format from midi_parser.pack_columns instead of JSON. The
+    response carries an ETag derived from the file identity, answers a
+    matching If-None-Match with 304 and is compressed per Accept-Encoding.
+
+    Args:
+        midi_path: Path to the MIDI file the data comes from
+        build_columns: Function returning the columns to serialize
+        *variant: Extra values that distinguish this view of the file
+
+    Returns:
+        Flask response with JSON or packed binary MIDI data
+    """
+    mimetype = request.accept_mimetypes.best_match(
+        ["application/json", COLUMNS_MIMETYPE], default="application/json"
+    )
+
+    def build_body():
+        midi_columns = build_columns()
+        if mimetype == COLUMNS_MIMETYPE:
+            return pack_columns(midi_columns)
+        return app.json.dumps(columns_to_json(midi_columns)).encode("utf-8")
+
+    return cached_response(
+        response_cache,
+        (file_identity(midi_path), mimetype, *variant),
+        mimetype,
+        build_body,
+        vary=("Accept",),
+    )
+
+
+def start_audio_processing(audio_file_path, original_filename, content_hash=None, profile=False):
+    """
+    Queue an audio file for processing by the transcription workers.
+
+    If a job for the same content is already queued or running, the upload
+    joins that job instead of starting a new one.
 
     Args:
         audio_file_path: Path to the uploaded audio file
         original_filename: Original filename for naming the output MIDI
+        content_hash: SHA-256 hex digest of the audio bytes
+        profile: Capture a cProfile profile of the job
+
+    Returns:
+        dict: The job with its ID, queue position and estimated wait
+
+    Raises:
+        QueueFull: If the queue is at JOB_QUEUE_MAX_DEPTH
+    """
+    job = {
+        "audio_file": audio_file_path,
+        "original_filename": original_filename,
+        "content_hash": content_hash,
+    }
+    if profile:
+        job["profile"] = True
+    job_id = job_queue.submit(job)
+    return job_queue.get(job_id)
+
+
+def find_transcription(content_hash):
+    """
+    Look up the MIDI previously transcribed from identical audio.
+
+    Records whose MIDI file has since been removed are dropped so the audio
+    is transcribed again.
+
+    Args:
+        content_hash: SHA-256 hex digest of the audio bytes
 
     Returns:
-        bool: True if processing was started, False if already running
+        dict: Transcription record with "midi_filename" and "job_id", or None
     """
-    if processing_jobs["current_job"] is not None:
-        return False  # Already processing
+    record = job_store.find_transcription(content_hash)
+    if record is None:
+        return None
+    midi_path = os.path.join(app.config["MIDI_FOLDER"], record["midi_filename"])
+    if not os.path.exists(midi_path):
+        job_store.forget_transcription(content_hash)
+        return None
+    return record
+
+
+# Web processes of a shared deployment only queue jobs, so they start no
+# transcription backend (and no warm worker pool)
+transcriber = (
+    create_transcriber(app.config) if app.config["RUN_JOB_WORKERS"] and SERVER_PROCESS else None
+)
+
+if app.config["SHARED_STATE"]:
+    # Jobs wait in the job store and each is claimed by exactly one worker
+    # process; jobs of a process that dies fail once their lease runs out
+    job_queue = SharedJobQueue(
+        process_job,
+        job_store,
+        workers=app.config["TRANSCRIPTION_WORKERS"],
+        max_depth=app.config["JOB_QUEUE_MAX_DEPTH"],
+        on_update=publish_job,
+        on_cancel=cancel_running_job,
+        poll_interval=app.config["JOB_POLL_SECONDS"],
+        lease_seconds=app.config["JOB_LEASE_SECONDS"],
+    )
+else:
+    job_queue = JobQueue(
+        process_job,
+        job_store,
+        workers=app.config["TRANSCRIPTION_WORKERS"],
+        max_depth=app.config["JOB_QUEUE_MAX_DEPTH"],
+        on_update=publish_job,
+        on_cancel=cancel_running_job,
+    )
 
-    # Start processing in background thread
-    thread = threading.Thread(
-        target=process_audio_async,
-        args=(audio_file_path, original_filename),
+    # Jobs interrupted by a restart: running ones are marked failed, queued
+    # ones are queued again if their audio is still there
+    recovered_jobs = job_store.recover() if SERVER_PROCESS else []
+    for recovered_job in recovered_jobs:
+        if os.path.exists(recovered_job["audio_file"]):
+            job_queue.resubmit(recovered_job)
+        else:
+            recovered_job["status"] = "failed"
+            recovered_job["error"] = "Uploaded audio file is missing"
+            recovered_job["completion_time"] = datetime.now().isoformat()
+            job_store.save(recovered_job)
+
+if app.config["RUN_JOB_WORKERS"] and SERVER_PROCESS:
+    job_queue.start()
+
+    # Sweeps abandoned scratch data and old uploads on startup and then periodically
+    threading.Thread(
+        target=storage.sweep_forever,
+        args=(app.config["STORAGE_SWEEP_INTERVAL"],),
+        name="storage-sweep",
         daemon=True,
+    ).start()
+
+
+def queue_full_response(depth):
+    """Build the 429 response returned when the job queue is full."""
+    return (
+        jsonify(
+            {
+                "error": "Processing queue is full",
+                "message": "Too many files are waiting to be processed. Try again later.",
+                "queue_depth": depth,
+                "max_queue_depth": job_queue.max_depth,
+            }
+        ),
+        429,
+        {"Retry-After": str(max(job_queue.stats()["average_job_seconds"], 1))},
     )
-    thread.start()
-    return True
 
 
 @app.route("/")
@@ -184,47 +788,75 @@ def home():
 @app.route("/api/midis", methods=["GET"])
 def get_available_midis():
     """
-    Get list of available MIDI files (without extensions).
+    Get list of available MIDI files (without extensions) with metadata.
+
+    Query Parameters:
+        offset: Number of files to skip (default 0)
+        limit: Maximum number of files to return (default all)
+        sort: name, duration, note_count, bpm, track_count or modified (default name)
+        order: asc or desc (default asc)
+        prefix: Only list names starting with this (case-insensitive)
 
     Returns:
-        JSON array of MIDI file names without extensions
+        JSON with the page of MIDI file names without extensions, their
+        catalogue entries and the total number of matching files
     """
     try:
-        midi_dir = "midi_files"
-
-        # Check if directory exists
-        if not os.path.exists(midi_dir):
-            return (
-                jsonify(
-                    {
-                        "midi_files": [],
-                        "last_update": processing_jobs["last_midi_update"],
-                        "count": 0,
-                    }
-                ),
-                200,
-            )
-
-        # Get all files from the directory
-        files = os.listdir(midi_dir)
-
-        # Filter for .mid and .midi files and remove extensions
-        midi_files = []
-        for file in files:
-            if file.lower().endswith((".mid", ".midi")):
-                # Remove the extension
-                name_without_ext = os.path.splitext(file)[0]
-                midi_files.append(name_without_ext)
-
+        offset = int(request.args.get("offset", 0))
+        limit = request.args.get("limit")
+        limit = int(limit) if limit is not None else None
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError("offset and limit must not be negative")
+    except ValueError as e:
+        return jsonify({"error": "Invalid pagination", "message": str(e)}), 400
+
+    sort = request.args.get("sort", "name")
+    order = request.args.get("order", "asc")
+    prefix = request.args.get("prefix") or None
+    if sort not in SORT_KEYS or order not in ("asc", "desc"):
         return (
             jsonify(
                 {
-                    "midi_files": midi_files,
-                    "last_update": processing_jobs["last_midi_update"],
-                    "count": len(midi_files),
+                    "error": "Invalid sort",
+                    "message": f'sort must be one of {", ".join(SORT_KEYS)} and order asc or desc',
                 }
             ),
-            200,
+            400,
+        )
+
+    try:
+        last_update = last_midi_update()
+
+        def build_body():
+            entries, total = midi_catalogue.query(
+                offset, limit, sort, order == "desc", prefix
+            )
+            return app.json.dumps(
+                {
+                    "midi_files": [entry["name"] for entry in entries],
+                    "entries": entries,
+                    "last_update": last_update,
+                    "count": len(entries),
+                    "total": total,
+                    "offset": offset,
+                    "limit": limit,
+                }
+            ).encode("utf-8")
+
+        return cached_response(
+            response_cache,
+            (
+                "midi-list",
+                midi_catalogue.fingerprint,
+                last_update,
+                offset,
+                limit,
+                sort,
+                order,
+                prefix,
+            ),
+            "application/json",
+            build_body,
         )
 
     except Exception as e:
@@ -235,14 +867,34 @@ def get_available_midis():
 @app.route("/api/midi/<filename>", methods=["GET"])
 def get_midi(filename="one dir.mid"):
     """
-    Get MIDI file data as JSON.
+    Get MIDI file data as JSON, or as packed typed arrays on request.
+
+    Query Parameters:
+        lod: Level of detail, from 0 (every note, the default) to
+            len(LOD_LEVELS) (fewest notes). Reduced levels carry an "lod"
+            entry reporting the notes dropped at this and every other level.
+        profile: 1 to capture a cProfile profile of this request when
+            profiling is allowed; its ID is returned in X-Profile-Id
 
     Args:
         filename: Name of the MIDI file (optional, defaults to one dir.mid)
 
     Returns:
-        JSON representation of the MIDI file
+        JSON or packed binary representation of the MIDI file
     """
+    level = request.args.get("lod", "0")
+    if not level.isdigit() or int(level) > len(LOD_LEVELS):
+        return (
+            jsonify(
+                {
+                    "error": "Invalid level of detail",
+                    "message": f"lod must be an integer from 0 to {len(LOD_LEVELS)}",
+                }
+            ),
+            400,
+        )
+    level = int(level)
+
     try:
         # Construct the file path
         midi_path = os.path.join("midi_files", filename)
@@ -251,15 +903,374 @@ def get_midi(filename="one dir.mid"):
         if not os.path.exists(midi_path):
             return jsonify({"error": "MIDI file not found", "filename": filename}), 404
 
-        # Parse MIDI file to JSON
-        midi_data = midi_to_json(midi_path)
+        if level:
+            build_columns = partial(load_level_of_detail, midi_path, level)
+            variant = ("lod", level)
+        else:
+            build_columns = partial(load_midi, midi_path)
+            variant = ()
+
+        if profile_requested():
+            with profiles.capture("request", request.path) as profile:
+                response = midi_response(midi_path, build_columns, *variant)
+            if profile["profile_id"] is not None:
+                response.headers["X-Profile-Id"] = profile["profile_id"]
+            else:
+                response.headers["X-Profile-Error"] = profile["error"]
+            return response
 
-        return jsonify(midi_data), 200
+        # Parse MIDI file, reusing the cached result if unchanged
+        return midi_response(midi_path, build_columns, *variant)
 
     except Exception as e:
         return jsonify({"error": "Error processing MIDI file", "message": str(e)}), 500
 
 
+@app.route("/api/midi/batch", methods=["POST"])
+def get_midi_batch():
+    """
+    Get the data of several MIDI files in one request.
+
+    Files are parsed in a process pool and streamed back as newline-delimited
+    JSON, one line per file as soon as it is ready: cached files first, then
+    the rest in the order they finish. A file that is missing or fails to
+    parse gets an error line and the batch carries on. The last line
+    summarises the batch.
+
+    Expects:
+        JSON body with "filenames": list of MIDI filenames
+
+    Returns:
+        application/x-ndjson stream of {"filename", "data"} or
+        {"filename", "error"} lines followed by {"done", "count", "errors"}
+    """
+    data = request.get_json(silent=True) or {}
+    filenames = data.get("filenames")
+    if not isinstance(filenames, list) or not all(isinstance(name, str) for name in filenames):
+        return (
+            jsonify(
+                {
+                    "error": "Invalid batch",
+                    "message": 'Provide a JSON body with a "filenames" list',
+                }
+            ),
+            400,
+        )
+    if len(filenames) > app.config["BATCH_MAX_FILES"]:
+        return (
+            jsonify(
+                {
+                    "error": "Batch too large",
+                    "message": f"At most {app.config['BATCH_MAX_FILES']} files per batch",
+                }
+            ),
+            413,
+        )
+
+    midi_folder = app.config["MIDI_FOLDER"]
+    names_by_path = {}
+    missing = []
+    for filename in dict.fromkeys(filenames):
+        midi_path = os.path.join(midi_folder, filename)
+        if os.path.basename(filename) != filename or not os.path.isfile(midi_path):
+            missing.append(filename)
+        else:
+            names_by_path[midi_path] = filename
+
+    def generate():
+        errors = 0
+        for filename in missing:
+            errors += 1
+            yield app.json.dumps({"filename": filename, "error": "MIDI file not found"}) + "\n"
+        for midi_path, midi_columns, error in batch_parser.parse(list(names_by_path)):
+            filename = names_by_path[midi_path]
+            if error is not None:
+                errors += 1
+                line = {"filename": filename, "error": f"Error processing MIDI file: {error}"}
+            else:
+                line = {"filename": filename, "data": columns_to_json(midi_columns)}
+            yield app.json.dumps(line) + "\n"
+        yield app.json.dumps(
+            {"done": True, "count": len(missing) + len(names_by_path), "errors": errors}
+        ) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/midi/<filename>/window", methods=["GET"])
+def get_midi_window(filename):
+    """
+    Get the notes of a MIDI file that overlap a time window.
+
+    Query Parameters:
+        start: Window start in seconds (default 0)
+        end: Window end in seconds (required)
+
+    Args:
+        filename: Name of the MIDI file
+
+    Returns:
+        MIDI data in the same format as /api/midi/<filename>, with every
+        track reduced to the notes sounding inside the window
+    """
+    try:
+        start = float(request.args.get("start", 0))
+        end = float(request.args["end"])
+    except (KeyError, ValueError):
+        return (
+            jsonify(
+                {
+                    "error": "Invalid window",
+                    "message": "Provide numeric start and end query parameters in seconds",
+                }
+            ),
+            400,
+        )
+
+    if end < start:
+        return (
+            jsonify(
+                {"error": "Invalid window", "message": "end must not be before start"}
+            ),
+            400,
+        )
+
+    try:
+        midi_path = os.path.join("midi_files", filename)
+
+        if not os.path.exists(midi_path):
+            return jsonify({"error": "MIDI file not found", "filename": filename}), 404
+
+        def build_window():
+            midi_columns = load_midi(midi_path)
+            note_index = load_note_index(midi_path)
+
+            window_columns = dict(midi_columns)
+            window_columns["window"] = {"start": start, "end": end}
+            window_columns["tracks"] = [
+                track.take(track_index.query(start, end))
+                for track, track_index in zip(midi_columns["tracks"], note_index)
+            ]
+            return window_columns
+
+        return midi_response(midi_path, build_window, "window", start, end)
+
+    except Exception as e:
+        return jsonify({"error": "Error processing MIDI file", "message": str(e)}), 500
+
+
+@app.route("/api/midi/<filename>/overview", methods=["GET"])
+def get_midi_overview(filename):
+    """
+    Get a piano-roll density overview of a MIDI file for previews.
+
+    The overview is computed when the file is stored and read from the
+    header of its sidecar, so serving it never parses the file.
+
+    Args:
+        filename: Name of the MIDI file
+
+    Returns:
+        JSON with the overview grid: note activity per time bucket (columns)
+        and pitch band (rows, lowest first), scaled to 0..255
+    """
+    try:
+        midi_path = os.path.join(app.config["MIDI_FOLDER"], filename)
+
+        if os.path.basename(filename) != filename or not os.path.exists(midi_path):
+            return jsonify({"error": "MIDI file not found", "filename": filename}), 404
+
+        def build_body():
+            overview = dict(load_overview(midi_path), filename=filename)
+            return app.json.dumps(overview).encode("utf-8")
+
+        return cached_response(
+            response_cache,
+            (file_identity(midi_path), "overview"),
+            "application/json",
+            build_body,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Error processing MIDI file", "message": str(e)}), 500
+
+
+@app.route("/api/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """
+    Get hit/miss counters and memory use of the parse, index, level-of-detail
+    and response caches.
+
+    Returns:
+        JSON response with cache statistics
+    """
+    return (
+        jsonify(
+            {
+                "midi": midi_cache.stats(),
+                "note_index": note_index_cache.stats(),
+                "lod": lod_cache.stats(),
+                "responses": response_cache.stats(),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/api/storage/stats", methods=["GET"])
+def get_storage_stats():
+    """
+    Get disk use of uploads and job scratch data, the upload limits and
+    how much the storage sweeps have removed.
+
+    Returns:
+        JSON response with storage statistics
+    """
+    return jsonify(storage.stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Expose request, parse, cache, upload and job metrics for Prometheus.
+
+    Returns:
+        Metrics in the Prometheus text exposition format
+    """
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def upload_destination(original_filename):
+    """
+    Choose where an upload is stored.
+
+    MIDI files keep their name in the MIDI folder; audio files get a
+    timestamped name with a random suffix in the upload folder so they do
+    not overwrite earlier uploads, even ones made the same second.
+
+    Args:
+        original_filename: Sanitised filename sent by the client
+
+    Returns:
+        tuple: (destination path, whether the file is a MIDI file)
+    """
+    # Check if it's a MIDI file
+    file_ext = (
+        original_filename.rsplit(".", 1)[1].lower()
+        if "." in original_filename
+        else ""
+    )
+    is_midi = file_ext in {"mid", "midi"}
+
+    # For MIDI files, use simple filename without timestamp
+    if is_midi:
+        return os.path.join(app.config["MIDI_FOLDER"], original_filename), is_midi
+
+    # For audio files, generate unique filename to prevent overwrites
+    return storage.upload_path(original_filename), is_midi
+
+
+def ingest_upload(filepath, original_filename, is_midi, size, content_hash, profile=False):
+    """
+    Catalogue a stored MIDI upload, or queue a stored audio upload for transcription.
+
+    Audio identical to an earlier upload returns the existing MIDI, or joins
+    the job still transcribing it, and the new copy is removed.
+
+    Args:
+        filepath: Path the upload was stored at
+        original_filename: Sanitised filename sent by the client
+        is_midi: Whether the upload is a MIDI file
+        size: Size of the upload in bytes
+        content_hash: SHA-256 hex digest of the upload
+        profile: Capture a cProfile profile of the transcription job
+
+    Returns:
+        Flask response tuple for the upload request
+    """
+    unique_filename = os.path.basename(filepath)
+    kind = "midi" if is_midi else "audio"
+    uploads.inc(kind)
+    upload_bytes.inc(kind, amount=size)
+
+    if is_midi:
+        # A MIDI with the same name may have been overwritten
+        precompute_midi(filepath)
+
+    if not is_midi:
+        # Identical audio was transcribed before: return its MIDI right away
+        transcription = find_transcription(content_hash)
+        if transcription is not None:
+            os.remove(filepath)
+            return (
+                jsonify(
+                    {
+                        "success": True,
+                        "message": "This audio was already transcribed.",
+                        "original_filename": original_filename,
+                        "size": size,
+                        "content_hash": content_hash,
+                        "processing": {
+                            "status": "completed",
+                            "job_id": transcription["job_id"],
+                            "midi_filename": transcription["midi_filename"],
+                            "deduplicated": True,
+                        },
+                    }
+                ),
+                200,
+            )
+
+        # It's an audio file, so we need to convert it to a MIDI file
+        try:
+            job = start_audio_processing(filepath, original_filename, content_hash, profile)
+        except QueueFull as e:
+            os.remove(filepath)
+            return queue_full_response(e.depth)
+
+        # Identical audio is already queued or running: share that job
+        deduplicated = job["audio_file"] != filepath
+        if deduplicated:
+            os.remove(filepath)
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "message": "Audio file uploaded successfully. Queued for processing.",
+                    "filename": os.path.basename(job["audio_file"]),
+                    "original_filename": original_filename,
+                    "path": job["audio_file"],
+                    "size": size,
+                    "content_hash": content_hash,
+                    "processing": {
+                        "status": job["status"],
+                        "job_id": job["job_id"],
+                        "queue_position": job.get("queue_position"),
+                        "estimated_wait_seconds": job.get("estimated_wait_seconds"),
+                        "deduplicated": deduplicated,
+                        "message": f"Check /api/processing/{job['job_id']} for updates.",
+                    },
+                }
+            ),
+            201,
+        )
+
+    return (
+        jsonify(
+            {
+                "success": True,
+                "message": "File uploaded successfully",
+                "filename": unique_filename,
+                "original_filename": original_filename,
+                "path": filepath,
+                "size": size,
+            }
+        ),
+        201,
+    )
+
+
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
     """
@@ -272,6 +1283,20 @@ def upload_file():
         JSON response with success status and file information
     """
     try:
+        # Room for the upload is reserved from its declared length, so a
+        # chunked-transfer request without one could bypass the quota
+        if request.content_length is None:
+            return (
+                jsonify(
+                    {
+                        "error": "Length required",
+                        "message": "Send a Content-Length header, or use /api/uploads "
+                        "to upload in chunks",
+                    }
+                ),
+                411,
+            )
+
         # Check if file is present in request
         if "theFile" not in request.files:
             return (
@@ -311,88 +1336,171 @@ def upload_file():
         # Secure the filename
         original_filename = secure_filename(file.filename)
 
-        # Check if it's a MIDI file
-        file_ext = (
-            original_filename.rsplit(".", 1)[1].lower()
-            if "." in original_filename
-            else ""
+        # Save the file, hashing it as it is received
+        filepath, is_midi = upload_destination(original_filename)
+        # Hold room for audio until it has landed in the upload folder
+        room = nullcontext() if is_midi else storage.reserve(request.content_length)
+        try:
+            with room:
+                started = time.perf_counter()
+                size, content_hash = save_and_hash(file.stream, filepath)
+                upload_receive_seconds.observe(time.perf_counter() - started)
+        except StorageFull as e:
+            return storage_full_response(e)
+
+        return ingest_upload(
+            filepath, original_filename, is_midi, size, content_hash, profile_requested()
         )
-        is_midi = file_ext in {"mid", "midi"}
 
-        # For MIDI files, use simple filename without timestamp
-        if is_midi:
-            upload_folder = app.config["MIDI_FOLDER"]
-            unique_filename = original_filename
-        else:
-            # For audio files, generate unique filename to prevent overwrites
-            upload_folder = app.config["UPLOAD_FOLDER"]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            name, ext = os.path.splitext(original_filename)
-            unique_filename = f"{name}_{timestamp}{ext}"
-
-        # Save the file
-        filepath = os.path.join(upload_folder, unique_filename)
-        file.save(filepath)
-
-        if not is_midi:
-            # It's an audio file, so we need to convert it to a MIDI file
-            processing_started = start_audio_processing(filepath, original_filename)
-
-            if processing_started:
-                return (
-                    jsonify(
-                        {
-                            "success": True,
-                            "message": "Audio file uploaded successfully. Processing started in background.",
-                            "filename": unique_filename,
-                            "original_filename": original_filename,
-                            "path": filepath,
-                            "size": os.path.getsize(filepath),
-                            "processing": {
-                                "status": "started",
-                                "message": "Audio processing has begun. Check /api/processing/status for updates.",
-                            },
-                        }
-                    ),
-                    201,
-                )
-            else:
-                return (
-                    jsonify(
-                        {
-                            "success": True,
-                            "message": "Audio file uploaded successfully, but processing is already in progress.",
-                            "filename": unique_filename,
-                            "original_filename": original_filename,
-                            "path": filepath,
-                            "size": os.path.getsize(filepath),
-                            "processing": {
-                                "status": "queued",
-                                "message": "Another file is currently being processed. Your file will be processed after it completes.",
-                            },
-                        }
-                    ),
-                    201,
-                )
+    except Exception as e:
+        return jsonify({"error": "Error uploading file", "message": str(e)}), 500
+
 
+def storage_full_response(error):
+    """Build the 507 response returned when uploads would exceed the storage quota."""
+    return (
+        jsonify(
+            {
+                "error": "Upload storage is full",
+                "message": "Uploaded audio has filled the storage quota. Try again later.",
+                "used_bytes": error.used,
+                "quota_bytes": error.quota,
+            }
+        ),
+        507,
+    )
+
+
+def upload_error_response(error):
+    """Build the response for a rejected chunked upload request."""
+    body = {"error": "Upload request rejected", "message": str(error)}
+    if error.offset is not None:
+        body["offset"] = error.offset
+    return jsonify(body), error.status
+
+
+@app.route("/api/uploads", methods=["POST"])
+def create_chunked_upload():
+    """
+    Start a resumable chunked upload.
+
+    Expects:
+        JSON body with "filename" and "size" (total bytes)
+
+    Returns:
+        JSON response with the upload ID, the offset to send from (0) and
+        the suggested chunk size
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get("filename") or ""
+    size = data.get("size")
+    if not isinstance(size, int) or not allowed_file(filename):
         return (
             jsonify(
                 {
-                    "success": True,
-                    "message": "File uploaded successfully",
-                    "filename": unique_filename,
-                    "original_filename": original_filename,
-                    "path": filepath,
-                    "size": os.path.getsize(filepath),
+                    "error": "Invalid upload",
+                    "message": "Provide a filename with an allowed extension and an integer size",
+                    "allowed_extensions": sorted(ALLOWED_EXTENSIONS),
                 }
             ),
-            201,
+            400,
         )
 
+    try:
+        # Once created the session holds its room until it is finalized
+        is_midi = upload_destination(secure_filename(filename))[1]
+        with nullcontext() if is_midi else storage.reserve(size):
+            upload = chunked_uploads.create(secure_filename(filename), size)
+    except UploadError as e:
+        return upload_error_response(e)
+    except StorageFull as e:
+        return storage_full_response(e)
+    upload["chunk_size"] = app.config["MAX_CONTENT_LENGTH"] // 2
+    return jsonify(upload), 201
+
+
+@app.route("/api/uploads/<upload_id>", methods=["GET"])
+def get_chunked_upload(upload_id):
+    """
+    Get the state of a chunked upload, so an interrupted client can resume.
+
+    Returns:
+        JSON response with the filename, total size and acknowledged offset
+    """
+    try:
+        return jsonify(chunked_uploads.status(upload_id)), 200
+    except UploadError as e:
+        return upload_error_response(e)
+
+
+@app.route("/api/uploads/<upload_id>", methods=["PUT", "PATCH"])
+def append_chunked_upload(upload_id):
+    """
+    Append a chunk to an upload.
+
+    The request body is the raw chunk and is streamed straight to disk.
+
+    Query Parameters:
+        offset: Byte offset the chunk starts at; must equal the offset last
+            acknowledged by the server
+
+    Returns:
+        JSON response with the new acknowledged offset, or 409 with the
+        expected offset if the chunk does not start there
+    """
+    offset = request.args.get("offset", type=int)
+    if offset is None:
+        return (
+            jsonify({"error": "Missing offset", "message": "Provide an integer offset"}),
+            400,
+        )
+    try:
+        return jsonify(chunked_uploads.append(upload_id, offset, request.stream)), 200
+    except UploadError as e:
+        return upload_error_response(e)
+
+
+@app.route("/api/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_chunked_upload(upload_id):
+    """
+    Complete a chunked upload and process it like a regular upload.
+
+    Audio is queued for transcription (or matched to an earlier
+    transcription) straight away; MIDI files are catalogued.
+
+    Expects:
+        Optional JSON body with "sha256" to verify the received content
+
+    Returns:
+        The same JSON response as /api/upload
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = chunked_uploads.status(upload_id)
+        # Room for the file was held when the upload was created
+        filepath, is_midi = upload_destination(upload["filename"])
+        size, content_hash = chunked_uploads.finalize(upload_id, filepath, data.get("sha256"))
+    except UploadError as e:
+        return upload_error_response(e)
+
+    try:
+        return ingest_upload(
+            filepath, upload["filename"], is_midi, size, content_hash, profile_requested()
+        )
     except Exception as e:
         return jsonify({"error": "Error uploading file", "message": str(e)}), 500
 
 
+@app.route("/api/uploads/<upload_id>", methods=["DELETE"])
+def abort_chunked_upload(upload_id):
+    """Discard a chunked upload and its partial data."""
+    try:
+        chunked_uploads.abort(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify({"success": True, "upload_id": upload_id}), 200
+
+
 @app.route("/api/processing/status", methods=["GET"])
 def get_processing_status():
     """
@@ -401,21 +1509,241 @@ def get_processing_status():
     Returns:
         JSON response with processing status and job information
     """
-    current_job = processing_jobs["current_job"]
+    running_jobs = job_store.by_status("running")
+    queue_depth = job_store.count_by_status("queued")
 
-    if current_job is None:
+    if not running_jobs:
         return (
-            jsonify({"status": "idle", "message": "No processing currently running"}),
+            jsonify(
+                {
+                    "status": "idle",
+                    "message": "No processing currently running",
+                    "queue_depth": queue_depth,
+                }
+            ),
             200,
         )
 
+    # Report the most recently started job, as with a single worker
+    current_job = running_jobs[-1]
     return (
         jsonify(
             {
                 "status": current_job["status"],
-                "start_time": current_job["start_time"],
+                "job_id": current_job["job_id"],
+                "start_time": current_job.get("start_time"),
                 "original_filename": current_job["original_filename"],
                 "audio_file": current_job["audio_file"],
+                "running_jobs": len(running_jobs),
+                "queue_depth": queue_depth,
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/api/processing/<job_id>", methods=["GET"])
+def get_job_status(job_id):
+    """
+    Get the status of one processing job.
+
+    Args:
+        job_id: ID returned in the upload response
+
+    Returns:
+        JSON response with the job record; queued jobs include their
+        queue position and estimated wait in seconds
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "job_id": job_id}), 404
+
+    return jsonify(job), 200
+
+
+@app.route("/api/processing/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """
+    Cancel a processing job.
+
+    A queued job is cancelled immediately. A running job's transcription
+    process group is killed and the job is marked failed with "cancelled"
+    once it stops.
+
+    Args:
+        job_id: ID returned in the upload response
+
+    Returns:
+        JSON response with the job: 200 if it was cancelled, 202 if a
+        running job was asked to stop, 404 if the job is unknown, or 409
+        if it has already finished
+    """
+    job = job_queue.cancel(job_id)
+    if job is None:
+        existing = job_queue.get(job_id)
+        if existing is None:
+            return jsonify({"error": "Job not found", "job_id": job_id}), 404
+        return (
+            jsonify(
+                {
+                    "error": "Job already finished",
+                    "message": "Only queued or running jobs can be cancelled",
+                    "status": existing["status"],
+                }
+            ),
+            409,
+        )
+    return jsonify(job), 202 if job["status"] == "running" else 200
+
+
+@app.route("/api/processing/<job_id>/profile", methods=["POST"])
+def profile_job(job_id):
+    """
+    Flag a queued job to be profiled when it runs.
+
+    Args:
+        job_id: ID of a queued job
+
+    Returns:
+        JSON response with the job, 404 if profiling is not allowed or the
+        job is unknown, or 409 if the job has already started
+    """
+    if not profiling_allowed():
+        return jsonify({"error": "Not found"}), 404
+
+    job = job_queue.update_queued(job_id, profile=True)
+    if job is None:
+        existing = job_queue.get(job_id)
+        if existing is None:
+            return jsonify({"error": "Job not found", "job_id": job_id}), 404
+        return (
+            jsonify(
+                {
+                    "error": "Job already started",
+                    "message": "Only queued jobs can be profiled",
+                    "status": existing["status"],
+                }
+            ),
+            409,
+        )
+    return jsonify(job), 200
+
+
+@app.route("/api/profiles", methods=["GET"])
+def list_profiles():
+    """
+    List captured profiles, newest first.
+
+    Returns:
+        JSON response with each profile's ID, kind, target, start time and
+        wall time, or 404 if profiling is not allowed
+    """
+    if not profiling_allowed():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": profiles.list()}), 200
+
+
+@app.route("/api/profiles/<profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    """
+    Download a captured profile.
+
+    Query Parameters:
+        format: pstats for the binary profile (default) or txt for a summary
+            sorted by cumulative time
+
+    Args:
+        profile_id: ID from X-Profile-Id, the job record or /api/profiles
+
+    Returns:
+        The profile file, or 404 if profiling is not allowed or the profile
+        does not exist
+    """
+    if not profiling_allowed():
+        return jsonify({"error": "Not found"}), 404
+
+    fmt = request.args.get("format", "pstats")
+    path = profiles.path(profile_id, fmt)
+    if path is None:
+        return jsonify({"error": "Profile not found", "profile_id": profile_id}), 404
+    if fmt == "txt":
+        return send_file(os.path.abspath(path), mimetype="text/plain")
+    return send_file(
+        os.path.abspath(path),
+        mimetype="application/octet-stream",
+        as_attachment=True,
+        download_name=f"{profile_id}.pstats",
+    )
+
+
+@app.route("/api/events", methods=["GET"])
+def stream_events():
+    """
+    Stream job and MIDI library events as Server-Sent Events.
+
+    Events are "job" (a job record whenever it is queued, changes phase,
+    completes or fails), "library" (the MIDI list changed) and "resync"
+    (events were missed; refetch status and the MIDI list). Idle streams
+    get a heartbeat comment every EVENT_HEARTBEAT_SECONDS.
+
+    Query Parameters:
+        last_event_id: Resume after this event, for clients that cannot
+            send the Last-Event-ID header (optional)
+
+    Returns:
+        text/event-stream response, or 503 when EVENT_STREAM_MAX_CLIENTS
+        streams are open and the client should long-poll instead
+    """
+    if event_bus.subscribers >= app.config["EVENT_STREAM_MAX_CLIENTS"]:
+        return (
+            jsonify(
+                {
+                    "error": "Too many event streams",
+                    "message": "Use /api/events/poll instead.",
+                }
+            ),
+            503,
+            {"Retry-After": "30"},
+        )
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+        "last_event_id"
+    )
+    return Response(
+        event_bus.stream(last_event_id, app.config["EVENT_HEARTBEAT_SECONDS"]),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/events/poll", methods=["GET"])
+def poll_events():
+    """
+    Long-poll for job and MIDI library events.
+
+    Query Parameters:
+        last_event_id: ID of the last event received; omit to start from now
+        timeout: Seconds to wait for an event (default and maximum
+            EVENT_POLL_MAX_SECONDS)
+
+    Returns:
+        JSON response with the new events, the ID to send next time and
+        whether the client must resynchronise
+    """
+    max_timeout = app.config["EVENT_POLL_MAX_SECONDS"]
+    timeout = min(request.args.get("timeout", max_timeout, type=float), max_timeout)
+    cursor, resync = event_bus.resolve(request.args.get("last_event_id"))
+
+    events = [] if resync else event_bus.wait(cursor, max(timeout, 0))
+    return (
+        jsonify(
+            {
+                "events": [
+                    {"id": event_id, "event": event_type, "data": data}
+                    for event_id, event_type, data in events
+                ],
+                "last_event_id": events[-1][0] if events else event_bus.last_event_id,
+                "resync": resync,
             }
         ),
         200,
@@ -430,11 +1758,11 @@ def get_processing_result():
     Returns:
         JSON response with the result of the last completed job
     """
-    if not processing_jobs["job_history"]:
-        return jsonify({"error": "No processing history available"}), 404
-
     # Get the most recent job
-    latest_job = processing_jobs["job_history"][-1]
+    latest_job = job_store.latest_finished()
+
+    if latest_job is None:
+        return jsonify({"error": "No processing history available"}), 404
 
     if latest_job["status"] == "completed":
         return (
@@ -484,7 +1812,7 @@ def check_midi_updates():
         JSON response indicating if MIDI list has been updated
     """
     last_check = request.args.get("last_check")
-    current_update = processing_jobs["last_midi_update"]
+    current_update = last_midi_update()
 
     if last_check and current_update:
         try:
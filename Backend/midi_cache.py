@@ -0,0 +1,153 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Rough per-object costs used to estimate the memory held by parsed MIDI data
+_BASE_BYTES = 1024
+_TRACK_BYTES = 512
+
+
+def estimate_size(midi_columns):
+    """
+    Estimate how many bytes parsed MIDI columns keep alive.
+
+    Args:
+        midi_columns: Dictionary returned by midi_to_columns
+
+    Returns:
+        Approximate size in bytes
+    """
+    size = _BASE_BYTES
+    for track in midi_columns.get("tracks", []):
+        size += _TRACK_BYTES + track.nbytes
+    return size
+
+
+def file_identity(path):
+    """Return the (path, mtime, size) key identifying the current file contents."""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+class MidiCache:
+    """
+    Thread-safe LRU cache of parsed MIDI files.
+
+    Entries are keyed on (path, mtime, size) so a file that changes on disk
+    is parsed again, and are evicted least-recently-used first once the
+    estimated size of all entries exceeds the memory budget.
+    """
+
+    def __init__(self, max_bytes, sizeof=estimate_size):
+        """
+        Args:
+            max_bytes: Memory budget for all cached entries
+            sizeof: Function estimating the size of a cached value in bytes
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # abspath -> (identity, value, size)
+        self._lock = threading.Lock()
+
+    def get(self, path, loader):
+        """
+        Return the cached value for a file, loading it on a miss.
+
+        Args:
+            path: Path to the file
+            loader: Function called with the path to produce the value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        identity, value = self.peek(path)
+        if value is not None:
+            return value
+
+        value = loader(path)
+        self.put(path, value, identity)
+        return value
+
+    def peek(self, path):
+        """
+        Look up a file without loading it on a miss.
+
+        Args:
+            path: Path to the file
+
+        Returns:
+            tuple: (file identity, cached value or None)
+        """
+        identity = file_identity(path)
+        key = identity[0]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return identity, entry[1]
+            self.misses += 1
+        return identity, None
+
+    def put(self, path, value, identity=None):
+        """
+        Store a value for a file, evicting older entries if over budget.
+
+        Args:
+            path: Path to the file
+            value: Value to cache
+            identity: File identity the value was computed from (stat'ed if omitted)
+        """
+        if identity is None:
+            identity = file_identity(path)
+        key = identity[0]
+        size = self.sizeof(value)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+
+            # Values larger than the whole budget are served but never kept
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (identity, value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, path):
+        """Drop any cached value for a file."""
+        with self._lock:
+            old = self._entries.pop(os.path.abspath(path), None)
+            if old is not None:
+                self.current_bytes -= old[2]
+
+    def clear(self):
+        """Drop every cached value."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
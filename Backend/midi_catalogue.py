@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from midi_sidecar import (
+    SIDECAR_SUFFIX,
+    is_midi_filename,
+    load_sidecar_header,
+    write_sidecar,
+)
+
+# Sort keys accepted by MidiCatalogue.query
+SORT_KEYS = ("name", "duration", "note_count", "bpm", "track_count", "modified")
+
+
+def midi_summary(midi_info):
+    """
+    Summarize parsed MIDI data for the catalogue.
+
+    Args:
+        midi_info: Dictionary returned by midi_to_columns, or a sidecar
+            header whose tracks hold note counts
+
+    Returns:
+        Dictionary with duration, note_count, bpm, track_count and time_signature
+    """
+    tracks = midi_info["tracks"]
+    return {
+        "duration": midi_info["duration"],
+        "note_count": sum(
+            track["count"] if isinstance(track, dict) else len(track)
+            for track in tracks
+        ),
+        "bpm": midi_info["tempo"],
+        "track_count": len(tracks),
+        "time_signature": midi_info["time_signature"],
+    }
+
+
+def load_summary(midi_path):
+    """
+    Summarize a MIDI file from its sidecar header, precomputing it if needed.
+
+    Args:
+        midi_path: Path to the MIDI file
+
+    Returns:
+        Summary dictionary, or None if the file cannot be parsed
+    """
+    header = load_sidecar_header(midi_path)
+    if header is not None:
+        return midi_summary(header)
+    try:
+        return midi_summary(write_sidecar(midi_path))
+    except Exception as e:
+        print(f"Failed to summarize {midi_path}: {e}")
+        return None
+
+
+def _entry_hash(entry):
+    # Stable across processes, unlike hash()
+    digest = hashlib.blake2b(json.dumps(entry, sort_keys=True).encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def _sort_value(entry, key):
+    if key == "name":
+        return entry["name"].lower()
+    if key == "modified":
+        return entry["mtime_ns"]
+    value = entry.get(key)
+    return -1 if value is None else value
+
+
+class MidiCatalogue:
+    """
+    In-memory catalogue of the MIDI folder with per-file metadata.
+
+    The catalogue is updated incrementally (on upload, on job completion and
+    by a cheap stat-only change scan) and keeps one sorted order per sort
+    key, so listing a page is a slice rather than a directory walk and a sort.
+    Its fingerprint depends only on the entries, so every process with the
+    same view of the folder reports the same one.
+    """
+
+    def __init__(self, midi_folder):
+        """
+        Args:
+            midi_folder: Directory containing MIDI files
+        """
+        self.midi_folder = midi_folder
+        self.version = 0
+        self._fingerprint = 0  # XOR of the hashes of all entries
+        self._entries = {}  # filename -> entry
+        self._orders = {key: [] for key in SORT_KEYS}  # key -> sorted (value, name, filename)
+        self._pending = set()  # Files listed without metadata yet
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def fingerprint(self):
+        """Hex digest of the entries: name, size, modification time and metadata."""
+        return f"{self._fingerprint:016x}"
+
+    def _insert(self, entry):
+        for key, order in self._orders.items():
+            insort(order, (_sort_value(entry, key), entry["name"], entry["filename"]))
+        self._entries[entry["filename"]] = entry
+        self._fingerprint ^= _entry_hash(entry)
+
+    def _remove(self, filename):
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return
+        self._fingerprint ^= _entry_hash(entry)
+        for key, order in self._orders.items():
+            item = (_sort_value(entry, key), entry["name"], entry["filename"])
+            index = bisect_left(order, item)
+            if index < len(order) and order[index] == item:
+                del order[index]
+
+    def _stat_entry(self, filename, stat, summary=None):
+        entry = {
+            "name": os.path.splitext(filename)[0],
+            "filename": filename,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "duration": None,
+            "note_count": None,
+            "bpm": None,
+            "track_count": None,
+            "time_signature": None,
+        }
+        if summary is not None:
+            entry.update(summary)
+        return entry
+
+    def update(self, filename, midi_info=None):
+        """
+        Add or refresh one file.
+
+        Args:
+            filename: Name of the file inside the MIDI folder
+            midi_info: Already parsed columns for the file (loaded from its
+                sidecar or parsed if omitted)
+        """
+        midi_path = os.path.join(self.midi_folder, filename)
+        try:
+            stat = os.stat(midi_path)
+        except FileNotFoundError:
+            self.remove(filename)
+            return
+
+        summary = midi_summary(midi_info) if midi_info is not None else load_summary(midi_path)
+        entry = self._stat_entry(filename, stat, summary)
+        with self._lock:
+            self._pending.discard(filename)
+            self._remove(filename)
+            self._insert(entry)
+            self.version += 1
+
+    def remove(self, filename):
+        """Drop one file from the catalogue."""
+        with self._lock:
+            self._pending.discard(filename)
+            if filename in self._entries:
+                self._remove(filename)
+                self.version += 1
+
+    def scan(self, with_metadata=True):
+        """
+        Reconcile the catalogue with the MIDI folder.
+
+        Only files whose size or modification time changed are touched, so a
+        scan of an unchanged library costs one stat per file.
+
+        Args:
+            with_metadata: Also fill in metadata for new or changed files.
+                When False, they are listed immediately with empty metadata
+                and filled in by a later scan.
+
+        Returns:
+            Number of files added, changed or removed (filling in metadata
+            for an already listed file does not count)
+        """
+        seen = {}
+        sidecars = []
+        with os.scandir(self.midi_folder) as entries:
+            for dir_entry in entries:
+                if is_midi_filename(dir_entry.name) and dir_entry.is_file():
+                    seen[dir_entry.name] = dir_entry.stat()
+                elif dir_entry.name.endswith(SIDECAR_SUFFIX):
+                    sidecars.append(dir_entry.name)
+
+        # Sidecars whose MIDI was deleted out-of-band
+        for sidecar in sidecars:
+            midi_filename = sidecar[: -len(SIDECAR_SUFFIX)]
+            if midi_filename in seen:
+                continue
+            if os.path.exists(os.path.join(self.midi_folder, midi_filename)):
+                continue  # Stored after the directory listing was taken
+            try:
+                os.remove(os.path.join(self.midi_folder, sidecar))
+            except OSError:
+                pass
+
+        with self._lock:
+            removed = [filename for filename in self._entries if filename not in seen]
+            for filename in removed:
+                self._remove(filename)
+                self._pending.discard(filename)
+            changed = [
+                filename
+                for filename, stat in seen.items()
+                if filename not in self._entries
+                or self._entries[filename]["mtime_ns"] != stat.st_mtime_ns
+                or self._entries[filename]["size"] != stat.st_size
+            ]
+            stale = changed
+            if with_metadata:
+                stale = changed + [
+                    filename for filename in self._pending if filename not in changed
+                ]
+            if not with_metadata:
+                for filename in stale:
+                    self._remove(filename)
+                    self._insert(self._stat_entry(filename, seen[filename]))
+                    self._pending.add(filename)
+            if removed or (stale and not with_metadata):
+                self.version += 1
+
+        if with_metadata:
+            for filename in stale:
+                self.update(filename)
+
+        return len(removed) + len(changed)
+
+    def query(self, offset=0, limit=None, sort="name", descending=False, prefix=None):
+        """
+        Return one page of catalogue entries.
+
+        Args:
+            offset: Number of entries to skip
+            limit: Maximum number of entries to return (all if None)
+            sort: One of SORT_KEYS
+            descending: Reverse the sort order
+            prefix: Only include names starting with this (case-insensitive)
+
+        Returns:
+            Tuple of (list of entries, total number of matching entries)
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+
+        with self._lock:
+            if prefix:
+                # Names are contiguous in the name order, so find the range by bisection
+                prefix = prefix.lower()
+                names = self._orders["name"]
+                start = bisect_left(names, (prefix,))
+                end = bisect_left(names, (prefix + "\U0010ffff",))
+                matches = names[start:end]
+                if sort != "name":
+                    matches = sorted(
+                        (_sort_value(self._entries[filename], sort), name, filename)
+                        for _, name, filename in matches
+                    )
+            else:
+                matches = self._orders[sort]
+
+            total = len(matches)
+            if descending:
+                first = max(total - offset, 0)
+                last = first - limit if limit is not None else 0
+                page = matches[max(last, 0):first][::-1]
+            else:
+                page = matches[offset:offset + limit if limit is not None else None]
+
+            return [dict(self._entries[filename]) for _, _, filename in page], total
+
+    def scan_forever(self, interval, on_change=None):
+        """
+        Rescan the MIDI folder every `interval` seconds.
+
+        Args:
+            interval: Seconds to wait between scans
+            on_change: Optional function called after a scan that found
+                added, changed or removed files
+        """
+        while True:
+            try:
+                if self.scan() and on_change is not None:
+                    on_change()
+            except Exception as e:
+                print(f"MIDI library scan failed: {e}")
+            time.sleep(interval)
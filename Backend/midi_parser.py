@@ -1,6 +1,166 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
 import mido
 from mido import MidiFile
 
+DEFAULT_TEMPO = 500000  # Microseconds per beat (120 BPM)
+
+# Meta event types mido decodes, and the shortest payload it accepts for
+# those that read fixed fields
+_KNOWN_META_TYPES = frozenset(
+    (0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x09, 0x20, 0x21, 0x2F, 0x51, 0x54, 0x58,
+     0x59, 0x7F)
+)
+_META_MIN_LENGTHS = {0x20: 1, 0x51: 3, 0x54: 5, 0x58: 4, 0x59: 2}
+_MAX_MESSAGE_LENGTH = 1000000  # Longest event mido reads
+
+# Errors the fast decoder raises for input it cannot decode: its own checks,
+# reads past the end of the data and ticks too large for its arrays
+_DECODE_ERRORS = (ValueError, IndexError, OverflowError, struct.error)
+
+# Reduced levels of detail served for ?lod=1, 2, ...; see level_of_detail_variants
+LOD_LEVELS = (
+    dict(quantum=0.05, merge_under=0.25, merge_gap=0.0, min_velocity=0.25),
+    dict(quantum=0.1, merge_under=0.4, merge_gap=0.12, min_velocity=0.4),
+    dict(quantum=0.15, merge_under=0.6, merge_gap=0.2, min_velocity=0.5),
+)
+
+# Packed columnar format: magic, version, float width, header length, then a
+# JSON header describing where each track's arrays start in the buffer
+COLUMNS_MIMETYPE = "application/vnd.midi-columns"
+COLUMNS_MAGIC = b"MIDC"
+COLUMNS_VERSION = 1
+_COLUMNS_PREFIX = struct.Struct("<4sHHI")
+COLUMNS_PREFIX_SIZE = _COLUMNS_PREFIX.size
+_COLUMNS_ALIGN = 8
+
+
+class TempoMap:
+    """
+    Tick-to-seconds conversion for a whole MIDI file.
+
+    Tempo changes are stored as breakpoints with the cumulative number of
+    seconds elapsed at each one, so any tick converts with a binary search
+    instead of replaying every tempo change before it.
+    """
+
+    def __init__(self, ticks_per_beat, tempo_changes=()):
+        """
+        Args:
+            ticks_per_beat: Resolution of the MIDI file
+            tempo_changes: Iterable of (absolute tick, tempo) pairs in the
+                order they appear; later changes at the same tick win
+        """
+        self.ticks_per_beat = ticks_per_beat
+        self.ticks = [0]
+        self.tempos = [DEFAULT_TEMPO]
+        self.seconds = [0.0]
+
+        for tick, tempo in sorted(tempo_changes, key=lambda change: change[0]):
+            if tick == self.ticks[-1]:
+                self.tempos[-1] = tempo
+                continue
+            self.seconds.append(self.seconds[-1] + (tick - self.ticks[-1]) * self._seconds_per_tick(-1))
+            self.ticks.append(tick)
+            self.tempos.append(tempo)
+
+    def _seconds_per_tick(self, index):
+        return (self.tempos[index] / 1000000) / self.ticks_per_beat
+
+    def spans_to_seconds(self, spans):
+        """
+        Convert (start tick, end tick) pairs to (start seconds, duration seconds).
+
+        Spans that lie within a single tempo segment are converted with that
+        segment's rate directly, so files without tempo changes give exactly
+        the same values as a plain ticks * seconds_per_tick conversion.
+
+        Args:
+            spans: Iterable of (start tick, end tick) pairs
+
+        Returns:
+            List of (start seconds, duration seconds) pairs
+        """
+        ticks = self.ticks
+        seconds = self.seconds
+        rates = [self._seconds_per_tick(i) for i in range(len(ticks))]
+        converted = []
+
+        for start, end in spans:
+            index = bisect_right(ticks, start) - 1
+            start_seconds = seconds[index] + (start - ticks[index]) * rates[index]
+            if index + 1 == len(ticks) or end <= ticks[index + 1]:
+                duration = (end - start) * rates[index]
+            else:
+                end_index = bisect_right(ticks, end) - 1
+                duration = seconds[end_index] + (end - ticks[end_index]) * rates[end_index] - start_seconds
+            converted.append((start_seconds, duration))
+
+        return converted
+
+
+class TrackColumns:
+    """
+    Notes of one track stored as parallel arrays (struct of arrays).
+
+    Index i across pitches, starts, durations and velocities describes one
+    note. Times are in seconds, rounded like the JSON output.
+    """
+
+    __slots__ = ("track_name", "pitches", "starts", "durations", "velocities")
+
+    def __init__(self, track_name, pitches=None, starts=None, durations=None, velocities=None):
+        self.track_name = track_name
+        self.pitches = pitches if pitches is not None else array('B')
+        self.starts = starts if starts is not None else array('d')
+        self.durations = durations if durations is not None else array('d')
+        self.velocities = velocities if velocities is not None else array('B')
+
+    def __len__(self):
+        return len(self.pitches)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the note arrays."""
+        return sum(
+            len(column) * column.itemsize
+            for column in (self.pitches, self.starts, self.durations, self.velocities)
+        )
+
+    def take(self, indices):
+        """
+        Return a new TrackColumns holding only the notes at the given indices.
+
+        Args:
+            indices: Note indices in the order they should appear
+
+        Returns:
+            TrackColumns with the selected notes
+        """
+        return TrackColumns(
+            self.track_name,
+            pitches=array('B', [self.pitches[i] for i in indices]),
+            starts=array('d', [self.starts[i] for i in indices]),
+            durations=array('d', [self.durations[i] for i in indices]),
+            velocities=array('B', [self.velocities[i] for i in indices]),
+        )
+
+    def to_json(self):
+        """Return the track in the midi_to_json track format."""
+        return {
+            "track_name": self.track_name,
+            "notes": [
+                {"note": pitch, "time": start, "duration": duration, "velocity": velocity}
+                for pitch, start, duration, velocity
+                in zip(self.pitches, self.starts, self.durations, self.velocities)
+            ]
+        }
+
 
 def midi_to_json(midi_file_path):
     """
@@ -12,75 +172,68 @@ def midi_to_json(midi_file_path):
     Returns:
         Dictionary containing MIDI data
     """
+    return columns_to_json(midi_to_columns(midi_file_path))
+
+
+def columns_to_json(midi_columns):
+    """
+    Convert columnar MIDI data to the JSON-serializable midi_to_json format.
+
+    Args:
+        midi_columns: Dictionary returned by midi_to_columns
+
+    Returns:
+        Dictionary containing MIDI data
+    """
+    midi_data = dict(midi_columns)
+    midi_data["tracks"] = [track.to_json() for track in midi_columns["tracks"]]
+    return midi_data
+
+
+def midi_to_columns(midi_file_path, fast=True):
+    """
+    Parse a MIDI file into columnar note data.
+
+    Args:
+        midi_file_path: Path to the MIDI file
+        fast: Decode the file bytes directly, falling back to mido for
+            files the fast decoder does not handle
+
+    Returns:
+        Dictionary with the same metadata as midi_to_json, where "tracks"
+        is a list of TrackColumns
+    """
     try:
-        mid = MidiFile(midi_file_path)
+        scanned = None
+        if fast:
+            try:
+                scanned = _scan_smf(midi_file_path)
+            except _DECODE_ERRORS:
+                # Unusual or malformed file: let mido read it (or report why not)
+                scanned = None
+        if scanned is None:
+            scanned = _scan_mido(MidiFile(midi_file_path))
+        midi_type, ticks_per_beat, tempo, time_signature, tracks = scanned
 
-        # Extract tempo and time signature
-        tempo = 500000  # Default tempo (120 BPM)
-        time_signature = "4/4"  # Default time signature
-        ticks_per_beat = mid.ticks_per_beat
+        # Tracks of a type 2 file are independent sequences with their own
+        # tempo; otherwise tempo changes anywhere apply to every track
+        shared_tempo_map = None
+        if midi_type != 2:
+            shared_tempo_map = TempoMap(
+                ticks_per_beat, [change for track in tracks for change in track.tempo_changes]
+            )
 
-        # Parse tracks
         tracks_data = []
-
-        for i, track in enumerate(mid.tracks):
-            track_name = f"Track {i + 1}"
-            notes = []
-            current_time = 0
-
-            for msg in track:
-                current_time += msg.time
-
-                # Extract tempo
-                if msg.type == 'set_tempo':
-                    tempo = msg.tempo
-
-                # Extract time signature
-                if msg.type == 'time_signature':
-                    time_signature = f"{msg.numerator}/{msg.denominator}"
-
-                # Extract track name
-                if msg.type == 'track_name':
-                    track_name = msg.name
-
-                # Extract note_on events
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    # Find corresponding note_off
-                    temp_time = current_time
-                    duration_ticks = 0
-
-                    for future_msg in track[track.index(msg) + 1:]:
-                        temp_time += future_msg.time
-                        if (future_msg.type == 'note_off' and future_msg.note == msg.note) or \
-                           (future_msg.type == 'note_on' and future_msg.note == msg.note and future_msg.velocity == 0):
-                            duration_ticks = temp_time - current_time
-                            break
-
-                    # Convert ticks to seconds
-                    seconds_per_tick = (tempo / 1000000) / ticks_per_beat
-                    time_seconds = current_time * seconds_per_tick
-                    duration_seconds = duration_ticks * seconds_per_tick
-
-                    notes.append({
-                        "note": msg.note,
-                        "time": round(time_seconds, 3),
-                        "duration": round(duration_seconds, 3),
-                        "velocity": msg.velocity
-                    })
-
-            if notes:  # Only add tracks with notes
-                tracks_data.append({
-                    "track_name": track_name,
-                    "notes": notes
-                })
+        for track in tracks:
+            if track.pitches:  # Only add tracks with notes
+                tempo_map = shared_tempo_map or TempoMap(ticks_per_beat, track.tempo_changes)
+                tracks_data.append(_notes_to_columns(track, tempo_map))
 
         # Calculate total duration
         total_duration = 0
         for track_data in tracks_data:
-            if track_data["notes"]:
-                last_note = track_data["notes"][-1]
-                track_end = last_note["time"] + last_note["duration"]
-                total_duration = max(total_duration, track_end)
+            track_end = track_data.starts[-1] + track_data.durations[-1]
+            total_duration = max(total_duration, track_end)
 
         # Calculate BPM from tempo
         bpm = round(60000000 / tempo, 2)
@@ -98,3 +251,558 @@ def midi_to_json(midi_file_path):
         raise FileNotFoundError(f"MIDI file not found: {midi_file_path}")
     except Exception as e:
         raise Exception(f"Error parsing MIDI file: {str(e)}")
+
+
+class _TrackEvents:
+    """
+    Notes and tempo changes of one track, in ticks.
+
+    Index i across pitches, start_ticks, end_ticks and velocities describes
+    one note; an end tick of -1 means the note was never released.
+    """
+
+    __slots__ = (
+        "track_name", "pitches", "start_ticks", "end_ticks", "velocities",
+        "track_end", "tempo_changes",
+    )
+
+    def __init__(self, track_name):
+        self.track_name = track_name
+        self.pitches = array('B')
+        self.start_ticks = array('q')
+        self.end_ticks = array('q')
+        self.velocities = array('B')
+        self.track_end = 0  # Tick of the last event
+        self.tempo_changes = []  # (absolute tick, tempo) pairs
+
+
+def _scan_mido(mid):
+    """
+    Collect notes, tempo and time signature from a mido MidiFile.
+
+    Returns:
+        Tuple of (file type, ticks per beat, last tempo, last time
+        signature, list of _TrackEvents)
+    """
+    tempo = DEFAULT_TEMPO  # Reported tempo is the last one in the file
+    time_signature = "4/4"  # Default time signature
+    tracks = []
+
+    for i, track in enumerate(mid.tracks):
+        events = _TrackEvents(f"Track {i + 1}")
+        # Open notes per (channel, pitch), oldest first, so overlapping
+        # re-strikes of the same key are closed in the order they began
+        open_notes = {}
+        current_time = 0
+
+        for msg in track:
+            current_time += msg.time
+
+            # Extract tempo
+            if msg.type == 'set_tempo':
+                tempo = msg.tempo
+                events.tempo_changes.append((current_time, msg.tempo))
+
+            # Extract time signature
+            if msg.type == 'time_signature':
+                time_signature = f"{msg.numerator}/{msg.denominator}"
+
+            # Extract track name
+            if msg.type == 'track_name':
+                events.track_name = msg.name
+
+            # Extract note_on events
+            if msg.type == 'note_on' and msg.velocity > 0:
+                open_notes.setdefault((msg.channel, msg.note), []).append(len(events.pitches))
+                events.pitches.append(msg.note)
+                events.start_ticks.append(current_time)
+                events.end_ticks.append(-1)
+                events.velocities.append(msg.velocity)
+
+            # Close the oldest open note for this key
+            elif msg.type == 'note_off' or msg.type == 'note_on':
+                pending = open_notes.get((msg.channel, msg.note))
+                if pending:
+                    events.end_ticks[pending.pop(0)] = current_time
+
+        events.track_end = current_time
+        tracks.append(events)
+
+    return mid.type, mid.ticks_per_beat, tempo, time_signature, tracks
+
+
+def _scan_smf(midi_file_path):
+    """
+    Collect the same data as _scan_mido straight from the file bytes.
+
+    The file is memory-mapped and decoded without building a message object
+    per event. Anything the decoder does not handle exactly like mido, such
+    as SMPTE timing, system common messages or malformed events, raises so
+    the caller can fall back to mido.
+
+    Args:
+        midi_file_path: Path to the MIDI file
+
+    Returns:
+        The same tuple as _scan_mido
+    """
+    with open(midi_file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] != b'MThd':
+                raise ValueError("MThd not found")
+            header_size = int.from_bytes(data[4:8], 'big')
+            if header_size < 6:
+                raise ValueError("Short MThd chunk")
+            midi_type, track_count, ticks_per_beat = struct.unpack_from('>hhh', data, 8)
+            if ticks_per_beat <= 0:
+                raise ValueError("SMPTE time division")
+
+            tempo = DEFAULT_TEMPO
+            time_signature = "4/4"
+            tracks = []
+            position = 8 + header_size
+            for i in range(track_count):
+                if data[position:position + 4] != b'MTrk':
+                    raise ValueError("MTrk not found")
+                start = position + 8
+                end = start + int.from_bytes(data[position + 4:start], 'big')
+                if end > len(data):
+                    raise ValueError("Truncated track")
+                # One copy per track; indexing bytes is faster than the mmap
+                events, track_tempo, track_signature = _decode_track(
+                    data[start:end], f"Track {i + 1}"
+                )
+                if track_tempo is not None:
+                    tempo = track_tempo
+                if track_signature is not None:
+                    time_signature = track_signature
+                tracks.append(events)
+                position = end
+
+    return midi_type, ticks_per_beat, tempo, time_signature, tracks
+
+
+def _decode_track(data, default_name):
+    """
+    Decode the events of one MTrk chunk.
+
+    Args:
+        data: Bytes of the chunk body
+        default_name: Track name used if the track does not name itself
+
+    Returns:
+        Tuple of (_TrackEvents, last tempo or None, last time signature or None)
+    """
+    events = _TrackEvents(default_name)
+    pitches = events.pitches
+    start_ticks = events.start_ticks
+    end_ticks = events.end_ticks
+    velocities = events.velocities
+    open_notes = {}
+    tempo = None
+    time_signature = None
+    tick = 0
+    status = 0
+    position = 0
+    size = len(data)
+
+    while position < size:
+        byte = data[position]
+        position += 1
+        delta = byte & 0x7F
+        while byte & 0x80:
+            byte = data[position]
+            position += 1
+            delta = (delta << 7) | (byte & 0x7F)
+
+        byte = data[position]
+        if byte & 0x80:
+            position += 1
+            if byte == 0xFF:
+                position, delta, tempo, time_signature = _decode_meta(
+                    data, position, delta, tick, events, tempo, time_signature
+                )
+                tick += delta
+                continue
+            status = byte
+        elif status == 0:
+            raise ValueError("Running status without a previous status")
+        elif status >= 0xF0:
+            raise ValueError("Running status after a system message")
+
+        kind = status & 0xF0
+        if kind == 0x90 or kind == 0x80:
+            note = data[position]
+            velocity = data[position + 1]
+            position += 2
+            if (note | velocity) & 0x80:
+                raise ValueError("Data byte out of range")
+            tick += delta
+            key = (status & 0x0F) << 7 | note
+            if kind == 0x90 and velocity:
+                open_notes.setdefault(key, []).append(len(pitches))
+                pitches.append(note)
+                start_ticks.append(tick)
+                end_ticks.append(-1)
+                velocities.append(velocity)
+            else:
+                pending = open_notes.get(key)
+                if pending:
+                    end_ticks[pending.pop(0)] = tick
+        elif kind == 0xA0 or kind == 0xB0 or kind == 0xE0:
+            if (data[position] | data[position + 1]) & 0x80:
+                raise ValueError("Data byte out of range")
+            position += 2
+            tick += delta
+        elif kind == 0xC0 or kind == 0xD0:
+            if data[position] & 0x80:
+                raise ValueError("Data byte out of range")
+            position += 1
+            tick += delta
+        elif status == 0xF0 or status == 0xF7:
+            length, position = _read_variable_int(data, position)
+            if length > _MAX_MESSAGE_LENGTH or position + length > size:
+                raise ValueError("Bad sysex length")
+            position += length
+            tick += delta
+        else:
+            raise ValueError("System common or real-time message")
+
+    if position != size:
+        raise ValueError("Event runs past the end of the track")
+    events.track_end = tick
+    return events, tempo, time_signature
+
+
+def _decode_meta(data, position, delta, tick, events, tempo, time_signature):
+    """
+    Decode one meta event, validating it the way mido does.
+
+    Returns:
+        Tuple of (position after the event, delta to apply, tempo, time signature)
+    """
+    meta_type = data[position]
+    length, position = _read_variable_int(data, position + 1)
+    if length > _MAX_MESSAGE_LENGTH or position + length > len(data):
+        raise ValueError("Bad meta event length")
+    payload = data[position:position + length]
+    position += length
+
+    if meta_type not in _KNOWN_META_TYPES:
+        # mido drops the delta time of meta events it does not know
+        return position, 0, tempo, time_signature
+    minimum = _META_MIN_LENGTHS.get(meta_type, 0)
+    if length < minimum or (meta_type == 0x00 and length == 1):
+        raise ValueError("Short meta event")
+
+    if meta_type == 0x51:
+        tempo = int.from_bytes(payload[:3], 'big')
+        events.tempo_changes.append((tick + delta, tempo))
+    elif meta_type == 0x58:
+        time_signature = f"{payload[0]}/{2 ** payload[1]}"
+    elif meta_type == 0x03:
+        events.track_name = payload.decode('latin1')
+    elif meta_type == 0x54 and payload[0] >> 5 > 3:
+        raise ValueError("Bad SMPTE frame rate")
+    elif meta_type == 0x59:
+        key = payload[0] - 256 if payload[0] > 127 else payload[0]
+        if not -7 <= key <= 7 or payload[1] > 1:
+            raise ValueError("Bad key signature")
+    return position, delta, tempo, time_signature
+
+
+def _read_variable_int(data, position):
+    value = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, position
+
+
+def _notes_to_columns(track, tempo_map):
+    """
+    Convert a track's paired notes to columnar form.
+
+    Notes that were never released end at the track's last event.
+
+    Args:
+        track: _TrackEvents for the track
+        tempo_map: TempoMap used to convert ticks to seconds
+
+    Returns:
+        TrackColumns for the track
+    """
+    track_end = track.track_end
+    spans = [
+        (start, track_end if end < 0 else end)
+        for start, end in zip(track.start_ticks, track.end_ticks)
+    ]
+    times = tempo_map.spans_to_seconds(spans)
+    return TrackColumns(
+        track.track_name,
+        pitches=track.pitches,
+        starts=array('d', [round(start, 3) for start, _ in times]),
+        durations=array('d', [round(duration, 3) for _, duration in times]),
+        velocities=track.velocities,
+    )
+
+
+def level_of_detail_variants(midi_columns):
+    """
+    Build every reduced level of detail of a parsed MIDI file.
+
+    Level N applies LOD_LEVELS[N - 1] to the full data: note times are
+    snapped to a grid (notes of the same pitch that land on the same grid
+    start collapse into one), runs of short repeated notes of the same
+    pitch are merged into one held note, and notes much quieter than the
+    loudest note of their track are dropped. Every track keeps at least its
+    loudest note.
+
+    Args:
+        midi_columns: Dictionary returned by midi_to_columns
+
+    Returns:
+        List of columns dictionaries for levels 1 to len(LOD_LEVELS). Each
+        has an "lod" entry with its level, note counts and the notes dropped
+        by each step, plus a summary of all levels.
+    """
+    source_notes = sum(len(track) for track in midi_columns["tracks"])
+    variants = []
+    for level, settings in enumerate(LOD_LEVELS, start=1):
+        dropped = {"quantize": 0, "merge": 0, "velocity": 0}
+        tracks = [_reduce_track(track, dropped, **settings) for track in midi_columns["tracks"]]
+        variant = dict(midi_columns)
+        variant["tracks"] = tracks
+        variant["lod"] = {
+            "level": level,
+            "source_notes": source_notes,
+            "notes": sum(len(track) for track in tracks),
+            "dropped": dict(dropped, total=sum(dropped.values())),
+            **settings,
+        }
+        variants.append(variant)
+
+    levels = [{"level": 0, "notes": source_notes, "dropped": 0}] + [
+        {
+            "level": variant["lod"]["level"],
+            "notes": variant["lod"]["notes"],
+            "dropped": variant["lod"]["dropped"]["total"],
+        }
+        for variant in variants
+    ]
+    for variant in variants:
+        variant["lod"]["levels"] = levels
+    return variants
+
+
+def _reduce_track(track, dropped, quantum, merge_under, merge_gap, min_velocity):
+    """
+    Reduce one track for a level of detail.
+
+    Args:
+        track: TrackColumns to reduce
+        dropped: Dictionary of per-step drop counts, updated in place
+        quantum: Grid size in seconds that note starts and ends snap to
+        merge_under: Notes at most this long (seconds) may be merged
+        merge_gap: Largest silence (seconds) bridged when merging
+        min_velocity: Fraction of the track's loudest velocity below which
+            notes are dropped
+
+    Returns:
+        TrackColumns with the remaining notes in start order
+    """
+    # Quantize to grid steps; the same pitch on the same step is one note
+    notes = []  # [pitch, start step, end step, velocity, mergeable]
+    by_step = {}
+    for pitch, start, duration, velocity in zip(
+        track.pitches, track.starts, track.durations, track.velocities
+    ):
+        start_step = round(start / quantum)
+        end_step = max(round((start + duration) / quantum), start_step + 1)
+        existing = by_step.get((pitch, start_step))
+        if existing is not None:
+            existing[2] = max(existing[2], end_step)
+            existing[3] = max(existing[3], velocity)
+            dropped["quantize"] += 1
+            continue
+        note = [pitch, start_step, end_step, velocity, None]
+        by_step[(pitch, start_step)] = note
+        notes.append(note)
+
+    # Merge runs of short notes of the same pitch into one held note
+    merge_steps = merge_under / quantum
+    gap_steps = merge_gap / quantum
+    merged = []
+    last_by_pitch = {}
+    for note in notes:
+        pitch, start_step, end_step, velocity, _ = note
+        note[4] = end_step - start_step <= merge_steps
+        previous = last_by_pitch.get(pitch)
+        if (
+            note[4]
+            and previous is not None
+            and previous[4]
+            and start_step - previous[2] <= gap_steps
+        ):
+            previous[2] = max(previous[2], end_step)
+            previous[3] = max(previous[3], velocity)
+            dropped["merge"] += 1
+            continue
+        last_by_pitch[pitch] = note
+        merged.append(note)
+
+    # Drop notes much quieter than the loudest one
+    threshold = max((note[3] for note in merged), default=0) * min_velocity
+    kept = [note for note in merged if note[3] >= threshold]
+    dropped["velocity"] += len(merged) - len(kept)
+
+    return TrackColumns(
+        track.track_name,
+        pitches=array('B', [note[0] for note in kept]),
+        starts=array('d', [round(note[1] * quantum, 3) for note in kept]),
+        durations=array('d', [round((note[2] - note[1]) * quantum, 3) for note in kept]),
+        velocities=array('B', [note[3] for note in kept]),
+    )
+
+
+def pack_columns(midi_columns, float_type='f', extra=None):
+    """
+    Pack columnar MIDI data into a single binary buffer.
+
+    The buffer starts with a fixed prefix (magic, version, float width in
+    bytes, header length) followed by a UTF-8 JSON header holding the file
+    metadata and, per track, the note count and byte offsets of its starts,
+    durations, pitches and velocities arrays. Arrays are little-endian and
+    8-byte aligned so clients can view them as typed arrays without copying.
+
+    Args:
+        midi_columns: Dictionary returned by midi_to_columns
+        float_type: 'f' for float32 or 'd' for float64 times
+        extra: Optional dictionary stored in the header under "extra"
+
+    Returns:
+        Packed bytes
+    """
+    header = {key: value for key, value in midi_columns.items() if key != "tracks"}
+    if extra is not None:
+        header["extra"] = extra
+
+    # Lay out the arrays first, then place them after the header
+    layout = []
+    body_size = 0
+    for track in midi_columns["tracks"]:
+        offsets = {}
+        columns = (
+            ("starts", array(float_type, track.starts)),
+            ("durations", array(float_type, track.durations)),
+            ("pitches", track.pitches),
+            ("velocities", track.velocities),
+        )
+        for name, column in columns:
+            offsets[name] = body_size
+            body_size = _align(body_size + len(column) * column.itemsize)
+        layout.append((track, offsets, columns))
+
+    # The header length depends on the offsets it contains, so shift them
+    # until the encoded header fits in front of the body
+    body_start = 0
+    while True:
+        header["tracks"] = [
+            {
+                "track_name": track.track_name,
+                "count": len(track),
+                **{name: body_start + offset for name, offset in offsets.items()},
+            }
+            for track, offsets, _ in layout
+        ]
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        needed = _align(_COLUMNS_PREFIX.size + len(header_bytes))
+        if needed == body_start:
+            break
+        body_start = needed
+
+    buffer = bytearray(body_start + body_size)
+    _COLUMNS_PREFIX.pack_into(
+        buffer, 0, COLUMNS_MAGIC, COLUMNS_VERSION, array(float_type).itemsize, len(header_bytes)
+    )
+    buffer[_COLUMNS_PREFIX.size:_COLUMNS_PREFIX.size + len(header_bytes)] = header_bytes
+
+    for _, offsets, columns in layout:
+        for name, column in columns:
+            if sys.byteorder == "big" and column.itemsize > 1:
+                column = array(column.typecode, column)
+                column.byteswap()
+            start = body_start + offsets[name]
+            buffer[start:start + len(column) * column.itemsize] = column.tobytes()
+
+    return bytes(buffer)
+
+
+def columns_header_size(prefix):
+    """
+    Return how many leading bytes of a packed buffer hold its prefix and header.
+
+    Args:
+        prefix: At least the first COLUMNS_PREFIX_SIZE bytes of the buffer
+    """
+    return _COLUMNS_PREFIX.size + _COLUMNS_PREFIX.unpack_from(prefix, 0)[3]
+
+
+def read_columns_header(buffer):
+    """
+    Read the JSON header of a packed buffer without touching the note arrays.
+
+    Args:
+        buffer: Packed bytes, or at least the first columns_header_size bytes
+
+    Returns:
+        Tuple of (header dictionary, float width in bytes). Each entry of
+        header["tracks"] holds the track name, note count and array offsets.
+    """
+    magic, version, float_size, header_length = _COLUMNS_PREFIX.unpack_from(buffer, 0)
+    if magic != COLUMNS_MAGIC or version != COLUMNS_VERSION:
+        raise ValueError("Not a packed MIDI columns buffer")
+
+    header_start = _COLUMNS_PREFIX.size
+    header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+    return header, float_size
+
+
+def unpack_columns(buffer):
+    """
+    Read columnar MIDI data produced by pack_columns.
+
+    Args:
+        buffer: Packed bytes
+
+    Returns:
+        Tuple of (midi_columns dictionary, extra dictionary or None)
+    """
+    header, float_size = read_columns_header(buffer)
+    float_type = 'd' if float_size == 8 else 'f'
+    extra = header.pop("extra", None)
+
+    tracks = []
+    for track_header in header["tracks"]:
+        count = track_header["count"]
+        columns = {}
+        for name, typecode in (("starts", float_type), ("durations", float_type),
+                               ("pitches", 'B'), ("velocities", 'B')):
+            column = array(typecode)
+            start = track_header[name]
+            column.frombytes(buffer[start:start + count * column.itemsize])
+            if sys.byteorder == "big" and column.itemsize > 1:
+                column.byteswap()
+            if typecode != 'd' and name in ("starts", "durations"):
+                column = array('d', (round(value, 3) for value in column))
+            columns[name] = column
+        tracks.append(TrackColumns(track_header["track_name"], **columns))
+
+    header["tracks"] = tracks
+    return header, extra
+
+
+def _align(offset):
+    return (offset + _COLUMNS_ALIGN - 1) // _COLUMNS_ALIGN * _COLUMNS_ALIGN
@@ -0,0 +1,178 @@
+import os
+import struct
+import tempfile
+
+from midi_parser import (
+    COLUMNS_PREFIX_SIZE,
+    columns_header_size,
+    midi_to_columns,
+    pack_columns,
+    read_columns_header,
+    unpack_columns,
+)
+from overview import build_overview
+
+SIDECAR_SUFFIX = ".notes.bin"
+SIDECAR_VERSION = 4
+
+
+def sidecar_path(midi_path):
+    """Return the path of the precomputed sidecar for a MIDI file."""
+    return midi_path + SIDECAR_SUFFIX
+
+
+def is_midi_filename(filename):
+    """Check if a filename looks like a MIDI file."""
+    return filename.lower().endswith((".mid", ".midi"))
+
+
+def _source_identity(midi_path):
+    stat = os.stat(midi_path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def write_sidecar(midi_path, midi_columns=None):
+    """
+    Write the parsed form of a MIDI file next to it.
+
+    The sidecar is the packed columnar format with float64 times, so it
+    round-trips exactly. It records the size and modification time of the
+    MIDI it was built from, so a file that is replaced later is not served
+    stale data, and carries the density overview from overview.py in its
+    header.
+
+    Args:
+        midi_path: Path to the MIDI file
+        midi_columns: Already parsed columns for the file (parsed here if omitted)
+
+    Returns:
+        The parsed MIDI columns
+    """
+    source = _source_identity(midi_path)
+    if midi_columns is None:
+        midi_columns = midi_to_columns(midi_path)
+
+    extra = {
+        "version": SIDECAR_VERSION,
+        "source": source,
+        "overview": build_overview(midi_columns),
+    }
+    packed = pack_columns(midi_columns, 'd', extra=extra)
+    path = sidecar_path(midi_path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=".sidecar-", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(packed)
+        # Readers only ever see a complete sidecar
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return midi_columns
+
+
+def load_sidecar(midi_path):
+    """
+    Read the precomputed columns for a MIDI file.
+
+    Args:
+        midi_path: Path to the MIDI file
+
+    Returns:
+        The parsed MIDI columns, or None if the sidecar is missing, stale or unreadable
+    """
+    try:
+        with open(sidecar_path(midi_path), "rb") as f:
+            midi_columns, extra = unpack_columns(f.read())
+        if not extra or extra.get("version") != SIDECAR_VERSION:
+            return None
+        if extra.get("source") != _source_identity(midi_path):
+            return None
+        return midi_columns
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+
+
+def load_sidecar_header(midi_path):
+    """
+    Read only the metadata header of a MIDI file's sidecar.
+
+    Much cheaper than load_sidecar for large files since the note arrays
+    are never read.
+
+    Args:
+        midi_path: Path to the MIDI file
+
+    Returns:
+        Header dictionary whose "tracks" entries hold note counts, or None
+        if the sidecar is missing, stale or unreadable
+    """
+    header = _read_header(midi_path)
+    if header is not None:
+        header.pop("extra")
+    return header
+
+
+def _read_header(midi_path):
+    try:
+        with open(sidecar_path(midi_path), "rb") as f:
+            prefix = f.read(COLUMNS_PREFIX_SIZE)
+            header_bytes = prefix + f.read(columns_header_size(prefix) - len(prefix))
+        header, _ = read_columns_header(header_bytes)
+        extra = header.get("extra")
+        if not extra or extra.get("version") != SIDECAR_VERSION:
+            return None
+        if extra.get("source") != _source_identity(midi_path):
+            return None
+        return header
+    except (OSError, ValueError, KeyError, TypeError, AttributeError, struct.error):
+        return None
+
+
+def load_overview(midi_path):
+    """
+    Get the density overview of a MIDI file from its sidecar header.
+
+    The note arrays are never read. A missing or stale sidecar is rebuilt,
+    which parses the file once.
+
+    Args:
+        midi_path: Path to the MIDI file
+
+    Returns:
+        Overview dictionary returned by overview.build_overview
+    """
+    header = _read_header(midi_path)
+    if header is not None:
+        return header["extra"]["overview"]
+    return build_overview(load_midi_columns(midi_path))
+
+
+def load_midi_columns(midi_path):
+    """
+    Get parsed columns for a MIDI file, preferring its sidecar.
+
+    Falls back to parsing the file and writes a fresh sidecar so the next
+    cold load can skip the parse.
+
+    Args:
+        midi_path: Path to the MIDI file
+
+    Returns:
+        Dictionary returned by midi_to_columns
+    """
+    midi_columns = load_sidecar(midi_path)
+    if midi_columns is not None:
+        return midi_columns
+
+    midi_columns = midi_to_columns(midi_path)
+    try:
+        write_sidecar(midi_path, midi_columns)
+    except OSError as e:
+        print(f"Failed to write sidecar for {midi_path}: {e}")
+    return midi_columns
+
@@ -0,0 +1,109 @@
+from array import array
+from bisect import bisect_left
+
+_NEGATIVE_INFINITY = float("-inf")
+
+
+class NoteIntervalIndex:
+    """
+    Interval index over the notes of one track.
+
+    Notes are sorted by start time and a max-end segment tree is built over
+    that order. A window query only descends into subtrees that can contain
+    a note still sounding at the window start, so it costs O(log n + k) for
+    k matching notes instead of a scan over the whole track.
+    """
+
+    def __init__(self, starts, durations):
+        """
+        Args:
+            starts: Note start times in seconds
+            durations: Note durations in seconds, parallel to starts
+        """
+        count = len(starts)
+        order = sorted(range(count), key=starts.__getitem__)
+        self.order = array('L', order)
+        self.starts = array('d', (starts[i] for i in order))
+        ends = [starts[i] + durations[i] for i in order]
+
+        size = 1
+        while size < count:
+            size *= 2
+        tree = array('d', [_NEGATIVE_INFINITY]) * (2 * size)
+        tree[size:size + count] = array('d', ends)
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._size = size
+        self._tree = tree
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the index arrays."""
+        return sum(len(column) * column.itemsize for column in (self.order, self.starts, self._tree))
+
+    def query(self, start, end):
+        """
+        Find the notes that overlap the window [start, end).
+
+        A note overlaps when it starts before the window ends and either ends
+        after the window starts or starts inside the window (so zero-length
+        notes are not lost).
+
+        Args:
+            start: Window start in seconds
+            end: Window end in seconds
+
+        Returns:
+            Indices of the matching notes in the track's original order,
+            sorted by start time
+        """
+        first_inside = bisect_left(self.starts, start)
+        first_after = bisect_left(self.starts, end)
+        if first_after < first_inside:
+            first_after = first_inside
+
+        # Notes starting before the window that are still sounding at its start
+        matches = []
+        if first_inside:
+            tree = self._tree
+            size = self._size
+            stack = [(1, 0, size)]
+            while stack:
+                node, low, high = stack.pop()
+                if low >= first_inside or tree[node] <= start:
+                    continue
+                if node >= size:
+                    matches.append(low)
+                    continue
+                middle = (low + high) // 2
+                # Right child first so positions come off the stack in order
+                stack.append((2 * node + 1, middle, high))
+                stack.append((2 * node, low, middle))
+
+        matches.extend(range(first_inside, first_after))
+        order = self.order
+        return [order[position] for position in matches]
+
+
+def build_note_index(midi_columns):
+    """
+    Build an interval index for every track of a parsed MIDI file.
+
+    Args:
+        midi_columns: Dictionary returned by midi_to_columns
+
+    Returns:
+        List of NoteIntervalIndex, one per track
+    """
+    return [
+        NoteIntervalIndex(track.starts, track.durations)
+        for track in midi_columns["tracks"]
+    ]
+
+
+def index_size(note_index):
+    """Estimate the bytes held by a list of NoteIntervalIndex."""
+    return 1024 + sum(512 + track_index.nbytes for track_index in note_index)
@@ -0,0 +1,118 @@
+try:
+    import numpy
+except ImportError:  # NumPy is optional; the pure-Python binning gives the same grid
+    numpy = None
+
+# Default overview resolution
+OVERVIEW_TIME_BUCKETS = 128
+OVERVIEW_PITCH_BANDS = 16
+
+# Grid values are scaled to 0..OVERVIEW_LEVELS
+OVERVIEW_LEVELS = 255
+
+
+def build_overview(
+    midi_columns, time_buckets=OVERVIEW_TIME_BUCKETS, pitch_bands=OVERVIEW_PITCH_BANDS
+):
+    """
+    Build a piano-roll density overview of a parsed MIDI file.
+
+    The song is split into time_buckets equal time buckets and the 128 MIDI
+    pitches into pitch_bands equal bands. Each cell counts the notes
+    sounding in that bucket and band, and the grid is scaled so the busiest
+    cell is OVERVIEW_LEVELS.
+
+    Args:
+        midi_columns: Dictionary returned by midi_to_columns
+        time_buckets: Number of time buckets
+        pitch_bands: Number of pitch bands
+
+    Returns:
+        Dictionary with the grid dimensions, "bucket_seconds", "max_notes"
+        (notes sounding in the busiest cell) and "grid": one list of
+        time_buckets values per pitch band, lowest band first
+    """
+    # Notes are in start order, but an earlier long note can outlast the last one
+    end = max(
+        (
+            start + duration
+            for track in midi_columns["tracks"]
+            for start, duration in zip(track.starts, track.durations)
+        ),
+        default=0.0,
+    )
+    bucket_seconds = end / time_buckets if end > 0 else 0.0
+    band_size = -(-128 // pitch_bands)
+
+    if numpy is not None:
+        counts = _bin_numpy(midi_columns, bucket_seconds, time_buckets, pitch_bands, band_size)
+    else:
+        counts = _bin_python(midi_columns, bucket_seconds, time_buckets, pitch_bands, band_size)
+
+    max_notes = max((max(row) for row in counts), default=0)
+    if max_notes:
+        grid = [
+            [(count * OVERVIEW_LEVELS + max_notes - 1) // max_notes for count in row]
+            for row in counts
+        ]
+    else:
+        grid = counts
+
+    return {
+        "time_buckets": time_buckets,
+        "pitch_bands": pitch_bands,
+        "band_size": band_size,
+        "bucket_seconds": round(bucket_seconds, 6),
+        "max_notes": max_notes,
+        "grid": grid,
+    }
+
+
+def _bucket_range(start, duration, bucket_seconds, time_buckets):
+    if not bucket_seconds:
+        return 0, 0
+    first = min(int(start / bucket_seconds), time_buckets - 1)
+    last = min(int((start + duration) / bucket_seconds), time_buckets - 1)
+    return first, max(first, last)
+
+
+def _bin_python(midi_columns, bucket_seconds, time_buckets, pitch_bands, band_size):
+    # Difference array per band: +1 where a note starts sounding, -1 after it stops
+    diffs = [[0] * (time_buckets + 1) for _ in range(pitch_bands)]
+    for track in midi_columns["tracks"]:
+        for pitch, start, duration in zip(track.pitches, track.starts, track.durations):
+            first, last = _bucket_range(start, duration, bucket_seconds, time_buckets)
+            row = diffs[pitch // band_size]
+            row[first] += 1
+            row[last + 1] -= 1
+
+    counts = []
+    for row in diffs:
+        running = 0
+        totals = []
+        for change in row[:time_buckets]:
+            running += change
+            totals.append(running)
+        counts.append(totals)
+    return counts
+
+
+def _bin_numpy(midi_columns, bucket_seconds, time_buckets, pitch_bands, band_size):
+    tracks = [track for track in midi_columns["tracks"] if len(track)]
+    diffs = numpy.zeros((pitch_bands, time_buckets + 1), dtype=numpy.int64)
+    if tracks:
+        pitches = numpy.concatenate([numpy.asarray(track.pitches) for track in tracks])
+        starts = numpy.concatenate([numpy.asarray(track.starts) for track in tracks])
+        durations = numpy.concatenate([numpy.asarray(track.durations) for track in tracks])
+        bands = pitches // band_size
+        if bucket_seconds:
+            first = numpy.minimum((starts / bucket_seconds).astype(numpy.int64), time_buckets - 1)
+            last = numpy.minimum(
+                ((starts + durations) / bucket_seconds).astype(numpy.int64), time_buckets - 1
+            )
+            last = numpy.maximum(first, last)
+        else:
+            first = last = numpy.zeros(len(pitches), dtype=numpy.int64)
+        numpy.add.at(diffs, (bands, first), 1)
+        numpy.add.at(diffs, (bands, last + 1), -1)
+    return numpy.cumsum(diffs[:, :time_buckets], axis=1).tolist()
@@ -0,0 +1,310 @@
+import asyncio
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+# Longest line logged; longer lines, and output that never breaks a line,
+# are cut to this length
+MAX_LINE_CHARS = 2000
+
+# Progress bars redraw with a carriage return, so both end a line
+_LINE_BREAK = re.compile(rb"[\r\n]")
+
+
+def line_splitter():
+    """
+    Generator splitting a process's output into lines as it arrives.
+
+    Prime it with next(), then send each chunk of bytes read from the
+    output, and b"" once the output ends. Each send returns the lines the
+    chunk completed, decoded, cut to MAX_LINE_CHARS and without blank
+    lines; the b"" send returns whatever was left unterminated.
+    """
+    pending = b""
+    lines = []
+    while True:
+        chunk = yield lines
+        if chunk:
+            *complete, pending = _LINE_BREAK.split(pending + chunk)
+            if len(pending) > MAX_LINE_CHARS:
+                complete.append(pending)
+                pending = b""
+        else:
+            complete, pending = [pending], b""
+        lines = [
+            line[:MAX_LINE_CHARS].decode("utf-8", "replace") for line in complete if line.strip()
+        ]
+
+
+class ProcessTimeout(Exception):
+    """Raised when a task runs past its deadline and its processes are killed."""
+
+
+class ProcessCancelled(Exception):
+    """Raised when a task is cancelled and its processes are killed."""
+
+
+class Task:
+    """
+    Deadline, cancellation and output of the subprocesses run for one job.
+
+    Every process run with the task shares its deadline, writes into its
+    bounded log and is killed when the task is cancelled. Lines of output
+    can be turned into a progress value as they arrive.
+    """
+
+    def __init__(self, task_id, timeout=None, log_lines=200, parse_progress=None, on_update=None):
+        """
+        Args:
+            task_id: Identifies the task in messages, such as the job ID
+            timeout: Seconds from now until the task's processes are killed,
+                or None for no limit
+            log_lines: Number of output lines kept
+            parse_progress: Function turning a line of output into a progress
+                value, or None for lines without progress
+            on_update: Function called with the task, on the thread waiting
+                for a process, at most once per update interval while new
+                output arrives
+        """
+        self.task_id = task_id
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.parse_progress = parse_progress
+        self.on_update = on_update
+        self.progress = None
+        self.cancelled = False
+        self._log = deque(maxlen=log_lines)
+        self._lines = 0  # lines received so far
+        self._reported = 0  # lines received at the last on_update call
+        self._kills = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Return the seconds left before the deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def check(self):
+        """
+        Raise if the task may not start another process.
+
+        Raises:
+            ProcessCancelled: If the task was cancelled
+            ProcessTimeout: If the deadline has passed
+        """
+        if self.cancelled:
+            raise ProcessCancelled("Cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise ProcessTimeout(f"Timed out after {self.timeout}s")
+
+    def cancel(self):
+        """Mark the task cancelled and kill its running processes."""
+        with self._lock:
+            self.cancelled = True
+            kills = list(self._kills)
+        for kill in kills:
+            kill()
+
+    @contextmanager
+    def watch(self, kill):
+        """
+        Register how to kill a running process while a with block runs.
+
+        Args:
+            kill: Function that kills the process; called right away if
+                the task is already cancelled
+        """
+        with self._lock:
+            self._kills.append(kill)
+            cancelled = self.cancelled
+        if cancelled:
+            kill()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._kills.remove(kill)
+
+    def add_line(self, stream, line):
+        """
+        Log a line of output and update the progress it reports.
+
+        Args:
+            stream: "stdout" or "stderr"
+            line: Text of the line, without the line break
+        """
+        progress = self.parse_progress(line) if self.parse_progress is not None else None
+        with self._lock:
+            self._log.append(f"[{stream}] {line}")
+            self._lines += 1
+            if progress is not None:
+                self.progress = progress
+
+    def tail(self, lines=None, stream=None):
+        """
+        Return the most recent lines of output, oldest first.
+
+        Args:
+            lines: Number of lines returned (all kept lines if None)
+            stream: Only return lines from "stdout" or "stderr"
+        """
+        with self._lock:
+            log = list(self._log)
+        if stream is not None:
+            prefix = f"[{stream}] "
+            log = [line[len(prefix) :] for line in log if line.startswith(prefix)]
+        return log if lines is None else log[-lines:]
+
+    def report(self):
+        """Call on_update if output arrived since the last call."""
+        with self._lock:
+            if self.on_update is None or self._lines == self._reported:
+                return
+            self._reported = self._lines
+        try:
+            self.on_update(self)
+        except Exception as e:
+            print(f"Progress listener failed for {self.task_id}: {e}")
+
+
+class ProcessRunner:
+    """
+    Supervises subprocesses from an asyncio event loop on a background thread.
+
+    The loop reads stdout and stderr of every process as output arrives,
+    so no output is buffered beyond the task's bounded log, and enforces
+    deadlines and cancellation. Each process is started in its own session;
+    killing it signals the whole process group, so helpers started by a
+    wrapper such as conda run or a shell script die with it. The thread
+    that called run() blocks until the process ends, relaying progress
+    updates as it waits.
+    """
+
+    def __init__(self, kill_grace=5, update_interval=1.0):
+        """
+        Args:
+            kill_grace: Seconds a process group has to exit after SIGTERM
+                before it gets SIGKILL
+            update_interval: Seconds between progress updates to a task
+        """
+        self.kill_grace = kill_grace
+        self.update_interval = update_interval
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="process-runner", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, command, cwd=None, task=None):
+        """
+        Run a command to completion.
+
+        Args:
+            command: Command line as a list of arguments
+            cwd: Working directory for the process
+            task: Task whose deadline, cancellation and log apply; a task
+                without a deadline is used if omitted
+
+        Returns:
+            The process's return code
+
+        Raises:
+            ProcessTimeout: If the task's deadline passed; the process group
+                has been killed
+            ProcessCancelled: If the task was cancelled; the process group
+                has been killed
+        """
+        task = task if task is not None else Task(command[0])
+        task.check()
+        future = asyncio.run_coroutine_threadsafe(
+            self._supervise(command, cwd, task), self._event_loop()
+        )
+        try:
+            while True:
+                try:
+                    return future.result(self.update_interval)
+                except FutureTimeout:
+                    task.report()
+        finally:
+            task.report()
+
+    async def _supervise(self, command, cwd, task):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        loop = asyncio.get_running_loop()
+        readers = [
+            asyncio.create_task(self._read(process.stdout, "stdout", task)),
+            asyncio.create_task(self._read(process.stderr, "stderr", task)),
+        ]
+
+        def kill():
+            asyncio.run_coroutine_threadsafe(self._terminate(process), loop)
+
+        timed_out = False
+        with task.watch(kill):
+            try:
+                await asyncio.wait_for(process.wait(), task.remaining())
+            except asyncio.TimeoutError:
+                timed_out = True
+                await self._terminate(process)
+
+        # Helpers that outlived the process may still hold its pipes open
+        _, unfinished = await asyncio.wait(readers, timeout=self.kill_grace)
+        for reader in unfinished:
+            reader.cancel()
+
+        if task.cancelled:
+            raise ProcessCancelled("Cancelled")
+        if timed_out:
+            raise ProcessTimeout(f"Timed out after {task.timeout}s")
+        return process.returncode
+
+    @staticmethod
+    async def _read(stream, name, task):
+        lines = line_splitter()
+        next(lines)
+        while True:
+            chunk = await stream.read(65536)
+            for line in lines.send(chunk):
+                task.add_line(name, line)
+            if not chunk:
+                break
+
+    async def _terminate(self, process):
+        if process.returncode is not None:
+            return
+        self._signal_group(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), self.kill_grace)
+        except asyncio.TimeoutError:
+            pass
+        # Also reaches helpers that ignored SIGTERM or outlived the leader
+        self._signal_group(process, signal.SIGKILL)
+        await process.wait()
+
+    @staticmethod
+    def _signal_group(process, signum):
+        try:
+            os.killpg(process.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
@@ -0,0 +1,136 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Functions listed in the text summary of a profile
+SUMMARY_LINES = 60
+
+
+class ProfileStore:
+    """
+    Folder of captured cProfile profiles, kept for later download.
+
+    Each profile is stored as a binary .pstats file (for snakeviz, pstats
+    or gprof2dot), a .txt summary sorted by cumulative time and a .json
+    file describing what was profiled. Only the newest max_profiles are
+    kept.
+    """
+
+    def __init__(self, folder, max_profiles=50):
+        """
+        Args:
+            folder: Directory profiles are written to
+            max_profiles: Number of profiles kept before the oldest are deleted
+        """
+        self.folder = folder
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        # cProfile can only be active once per interpreter
+        self._active = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    @contextmanager
+    def capture(self, kind, target):
+        """
+        Profile the calling thread for the duration of a with block.
+
+        cProfile only sees the thread it runs on, so work handed to other
+        threads or subprocesses shows up as time spent waiting for them.
+        Only one capture can run at a time; while another is running the
+        block runs unprofiled and the description gets an "error" instead
+        of a "profile_id".
+
+        Args:
+            kind: What is being profiled, such as "request" or "job"
+            target: Request path or job ID
+
+        Yields:
+            dict: Profile description; "profile_id" is set on entry
+        """
+        info = {
+            "profile_id": uuid.uuid4().hex,
+            "kind": kind,
+            "target": target,
+            "started": datetime.now().isoformat(),
+        }
+        if not self._active.acquire(blocking=False):
+            yield {"profile_id": None, "error": "Another profile is being captured"}
+            return
+
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            try:
+                profiler.enable()
+            except ValueError as e:  # Another profiling tool is active
+                yield {"profile_id": None, "error": str(e)}
+                return
+            try:
+                yield info
+            finally:
+                profiler.disable()
+                info["wall_seconds"] = round(time.perf_counter() - started, 6)
+                try:
+                    self._save(profiler, info)
+                except OSError as e:
+                    print(f"Failed to save profile {info['profile_id']}: {e}")
+        finally:
+            self._active.release()
+
+    def _save(self, profiler, info):
+        base = os.path.join(self.folder, info["profile_id"])
+        profiler.dump_stats(f"{base}.pstats")
+
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(SUMMARY_LINES)
+        with open(f"{base}.txt", "w") as f:
+            f.write(f"{info['kind']} {info['target']} ({info['wall_seconds']}s wall)\n")
+            f.write(summary.getvalue())
+        with open(f"{base}.json", "w") as f:
+            json.dump(info, f)
+
+        with self._lock:
+            self._prune()
+
+    def _prune(self):
+        profiles = self.list()
+        for info in profiles[self.max_profiles :]:
+            for suffix in (".pstats", ".txt", ".json"):
+                path = os.path.join(self.folder, info["profile_id"] + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def list(self):
+        """Return the descriptions of stored profiles, newest first."""
+        profiles = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.folder, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda info: info["started"], reverse=True)
+        return profiles
+
+    def path(self, profile_id, fmt="pstats"):
+        """
+        Return the path of a stored profile, or None.
+
+        Args:
+            profile_id: ID of the profile
+            fmt: "pstats" for the binary profile or "txt" for the summary
+        """
+        if fmt not in ("pstats", "txt") or len(profile_id) != 32 or not profile_id.isalnum():
+            return None
+        path = os.path.join(self.folder, f"{profile_id}.{fmt}")
+        return path if os.path.exists(path) else None
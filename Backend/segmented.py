@@ -0,0 +1,315 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+import wave
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import mido
+
+from midi_parser import midi_to_columns
+
+# Notes of the same pitch starting this close together in neighbouring
+# segments are treated as one note heard by both
+DUPLICATE_ONSET_SECONDS = 0.05
+
+# Ticks per beat and tempo of stitched MIDI files: 120 BPM, 960 ticks a second
+STITCH_TICKS_PER_BEAT = 480
+STITCH_TEMPO = 500000
+
+
+def audio_duration(audio_path):
+    """
+    Return the length of an audio file in seconds, or None if unknown.
+
+    WAV files are read with the wave module; other formats need ffprobe.
+    """
+    try:
+        with wave.open(audio_path, "rb") as audio:
+            return audio.getnframes() / audio.getframerate()
+    except (wave.Error, EOFError):
+        pass
+    except OSError:
+        return None
+
+    if shutil.which("ffprobe") is None:
+        return None
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "json",
+            audio_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    try:
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def plan_segments(duration, segment_seconds, overlap_seconds):
+    """
+    Split a duration into overlapping segments.
+
+    Args:
+        duration: Audio length in seconds
+        segment_seconds: Length of each segment
+        overlap_seconds: Seconds each segment shares with the next
+
+    Returns:
+        List of (start, length) tuples in seconds
+    """
+    step = segment_seconds - overlap_seconds
+    segments = []
+    start = 0.0
+    while True:
+        length = min(segment_seconds, duration - start)
+        segments.append((start, length))
+        if start + length >= duration:
+            return segments
+        start += step
+
+
+def cut_segment(audio_path, start, length, segment_path):
+    """
+    Write one segment of an audio file as WAV.
+
+    WAV sources are cut with the wave module; other formats need ffmpeg.
+
+    Args:
+        audio_path: Source audio file
+        start: Segment start in seconds
+        length: Segment length in seconds
+        segment_path: Destination .wav path
+    """
+    try:
+        with wave.open(audio_path, "rb") as source:
+            rate = source.getframerate()
+            source.setpos(int(start * rate))
+            frames = source.readframes(int(length * rate))
+            with wave.open(segment_path, "wb") as segment:
+                segment.setparams(source.getparams())
+                segment.writeframes(frames)
+        return
+    except wave.Error:
+        pass
+
+    result = subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-ss",
+            f"{start:.3f}",
+            "-t",
+            f"{length:.3f}",
+            "-i",
+            audio_path,
+            segment_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to cut segment at {start:.1f}s: {result.stderr}")
+
+
+def segment_notes(midi_path, offset):
+    """
+    Read the notes of a segment's MIDI as (pitch, start, end, velocity) in song time.
+
+    Args:
+        midi_path: MIDI transcribed from one segment
+        offset: Start of the segment in the full recording, in seconds
+
+    Returns:
+        List of note tuples
+    """
+    notes = []
+    for track in midi_to_columns(midi_path)["tracks"]:
+        for pitch, start, duration, velocity in zip(
+            track.pitches, track.starts, track.durations, track.velocities
+        ):
+            notes.append((pitch, offset + start, offset + start + duration, velocity))
+    return notes
+
+
+def stitch_notes(segments, overlap_seconds):
+    """
+    Merge the notes of overlapping segments into one note list.
+
+    Each overlap is split at its midpoint: notes starting before it come
+    from the earlier segment and notes starting after it from the later
+    one. Notes of the same pitch that still start within
+    DUPLICATE_ONSET_SECONDS of each other are merged, and overlapping
+    notes of the same pitch are trimmed so they do not overlap.
+
+    Args:
+        segments: List of (offset, notes) in segment order, with notes as
+            returned by segment_notes
+        overlap_seconds: Seconds each segment shares with the next
+
+    Returns:
+        List of (pitch, start, end, velocity) sorted by start
+    """
+    kept = []
+    for i, (offset, notes) in enumerate(segments):
+        lower = offset + overlap_seconds / 2 if i > 0 else float("-inf")
+        if i + 1 < len(segments):
+            upper = segments[i + 1][0] + overlap_seconds / 2
+        else:
+            upper = float("inf")
+        kept.extend(note for note in notes if lower <= note[1] < upper)
+
+    kept.sort(key=lambda note: (note[0], note[1]))
+    merged = []
+    for pitch, start, end, velocity in kept:
+        if merged and merged[-1][0] == pitch:
+            previous = merged[-1]
+            if start - previous[1] < DUPLICATE_ONSET_SECONDS:
+                merged[-1] = (pitch, previous[1], max(previous[2], end), max(previous[3], velocity))
+                continue
+            if previous[2] > start:
+                merged[-1] = (pitch, previous[1], start, previous[3])
+        merged.append((pitch, start, end, velocity))
+
+    merged.sort(key=lambda note: (note[1], note[0]))
+    return merged
+
+
+def write_notes(notes, midi_path):
+    """
+    Write notes to a single-track MIDI file.
+
+    Args:
+        notes: List of (pitch, start, end, velocity) with times in seconds
+        midi_path: Destination path
+    """
+    ticks_per_second = STITCH_TICKS_PER_BEAT * 1000000 / STITCH_TEMPO
+    events = []
+    for pitch, start, end, velocity in notes:
+        on = round(start * ticks_per_second)
+        off = max(round(end * ticks_per_second), on + 1)
+        # note_off sorts before note_on at the same tick
+        events.append((on, 1, mido.Message("note_on", note=pitch, velocity=velocity)))
+        events.append((off, 0, mido.Message("note_off", note=pitch, velocity=0)))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage("set_tempo", tempo=STITCH_TEMPO, time=0))
+    track.append(mido.MetaMessage("track_name", name="Piano", time=0))
+    current = 0
+    for tick, _, message in events:
+        track.append(message.copy(time=tick - current))
+        current = tick
+    track.append(mido.MetaMessage("end_of_track", time=0))
+
+    mid = mido.MidiFile(ticks_per_beat=STITCH_TICKS_PER_BEAT)
+    mid.tracks.append(track)
+    mid.save(midi_path)
+
+
+class SegmentedTranscriber:
+    """
+    Transcribe long recordings as overlapping segments in parallel.
+
+    Recordings longer than one segment are cut into segments, each segment
+    is transcribed by the wrapped backend, and the segment MIDI files are
+    stitched into one piano.mid. Segments are dispatched from threads; the
+    work itself runs in the backend's processes (a warm worker pool or one
+    infer.sh per segment), so parallelism is bounded by `parallelism` and,
+    for a warm pool, by its size. Shorter recordings, and formats whose
+    length cannot be read, are passed to the backend whole, as is every
+    recording when segment_seconds is 0.
+    """
+
+    def __init__(self, backend, segment_seconds=120, overlap_seconds=4, parallelism=2):
+        """
+        Args:
+            backend: Backend with transcribe(audio_path, output_dir, task=None)
+            segment_seconds: Length of each segment, or 0 to never split
+            overlap_seconds: Seconds each segment shares with the next
+            parallelism: Segments of one recording transcribed at the same time
+        """
+        if segment_seconds and overlap_seconds >= segment_seconds:
+            raise ValueError("Segment overlap must be shorter than the segment")
+        self.backend = backend
+        self.segment_seconds = segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.parallelism = parallelism
+
+    def transcribe(self, audio_path, output_dir, progress=None, task=None):
+        """
+        Transcribe an audio file to MIDI.
+
+        Args:
+            audio_path: Path to the audio file
+            output_dir: Directory piano.mid is written to
+            progress: Called with (segments done, segment count) as
+                segments finish (optional)
+            task: process_runner.Task shared by every segment, carrying the
+                job's deadline, cancellation and output log (optional)
+
+        Returns:
+            Path to the generated MIDI file
+
+        Raises:
+            Exception: The error of the first segment that failed; the
+                other segments are stopped and the task is cancelled
+        """
+        duration = audio_duration(audio_path) if self.segment_seconds else None
+        if duration is None or duration <= self.segment_seconds:
+            midi_path = self.backend.transcribe(audio_path, output_dir, task=task)
+            if progress is not None:
+                progress(1, 1)
+            return midi_path
+
+        plan = plan_segments(duration, self.segment_seconds, self.overlap_seconds)
+        segment_dir = os.path.join(output_dir, "segments")
+        os.makedirs(segment_dir, exist_ok=True)
+        done = 0
+        lock = threading.Lock()
+
+        def run(index):
+            nonlocal done
+            start, length = plan[index]
+            segment_path = os.path.join(segment_dir, f"segment_{index:03d}.wav")
+            cut_segment(audio_path, start, length, segment_path)
+            midi_path = self.backend.transcribe(
+                segment_path, os.path.join(segment_dir, f"segment_{index:03d}"), task=task
+            )
+            notes = segment_notes(midi_path, start)
+            with lock:
+                done += 1
+                if progress is not None:
+                    progress(done, len(plan))
+            return start, notes
+
+        with ThreadPoolExecutor(self.parallelism, thread_name_prefix="segment") as pool:
+            futures = [pool.submit(run, index) for index in range(len(plan))]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in futures if future.done() and future.exception()]
+            if failed:
+                # The recording cannot be stitched without every segment, so drop
+                # the queued ones and kill the running ones instead of waiting
+                pool.shutdown(wait=False, cancel_futures=True)
+                if task is not None:
+                    task.cancel()
+                raise failed[0].exception()
+            segments = [future.result() for future in futures]
+
+        midi_path = os.path.join(output_dir, "piano.mid")
+        write_notes(stitch_notes(segments, self.overlap_seconds), midi_path)
+        return midi_path
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,44 @@
+"""
+Run the backend with a server suited to long-lived event streams.
+
+With gevent installed (pip install gevent), the standard library is
+monkey patched and each request, including every open /api/events
+stream, runs in a greenlet instead of an OS thread. Without gevent this
+falls back to the threaded Flask development server, where each open
+stream holds a thread and EVENT_STREAM_MAX_CLIENTS bounds how many.
+
+Usage:
+    python serve.py [--host 0.0.0.0] [--port 5000]
+"""
+
+try:
+    from gevent import monkey
+
+    # Must run before anything imports threading, socket or subprocess
+    monkey.patch_all()
+    from gevent.pywsgi import WSGIServer
+except ImportError:
+    WSGIServer = None
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    from main import app
+
+    if WSGIServer is None:
+        print("gevent is not installed; using the threaded development server")
+        app.run(host=args.host, port=args.port, threaded=True)
+        return
+
+    print(f"Serving on http://{args.host}:{args.port} with gevent")
+    WSGIServer((args.host, args.port), app).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
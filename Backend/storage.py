@@ -0,0 +1,374 @@
+import errno
+import glob
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Prefix of per-job scratch directories: job_<job id>_<random>
+SCRATCH_PREFIX = "job_"
+
+# Temporary files left by an interrupted save_and_hash
+_PARTIAL_UPLOAD_PREFIX = ".upload-"
+
+
+class StorageFull(Exception):
+    """Raised when an upload would take the upload folder past its quota."""
+
+    def __init__(self, used, quota):
+        super().__init__(f"Upload storage is full ({used} of {quota} bytes used)")
+        self.used = used
+        self.quota = quota
+
+
+def unique_filename(name, ext):
+    """
+    Build a filename that cannot collide with another one made the same second.
+
+    Args:
+        name: Base name, such as the stem of the uploaded file
+        ext: Extension including the dot, such as ".mid"
+
+    Returns:
+        "<name>_<YYYYmmdd_HHMMSS>_<random>" followed by ext
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{name}_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class StorageManager:
+    """
+    Lifecycle of the files written for uploads and transcription jobs.
+
+    Each job works in its own scratch directory, created next to the MIDI
+    folder so the finished MIDI is published with an atomic rename instead
+    of a copy. Uploaded audio is kept for retention_days and the upload
+    folder is held under quota_bytes, oldest uploads first; audio still
+    needed by a queued or running job is never removed. Uploads still
+    arriving, chunked or in a single request, count towards the quota at
+    their full size until they land. Scratch directories of jobs that are
+    no longer running, left behind by a crash, are swept on startup and
+    then periodically.
+    """
+
+    def __init__(
+        self,
+        upload_folder,
+        scratch_folder,
+        retention_days=7,
+        quota_bytes=5 * 1024 * 1024 * 1024,
+        grace_seconds=60 * 60,
+        job_active=None,
+        uploads_in_use=None,
+        pending_uploads=None,
+        legacy_scratch=(),
+    ):
+        """
+        Args:
+            upload_folder: Directory uploaded audio is stored in
+            scratch_folder: Directory job scratch directories are created in;
+                should be on the same filesystem as the MIDI folder
+            retention_days: Uploads older than this are deleted; 0 keeps them
+            quota_bytes: Most bytes the upload folder may hold; 0 for no quota
+            grace_seconds: Age before a scratch directory or temporary file
+                that cannot be tied to a job is considered abandoned
+            job_active: Function taking a job ID and returning whether the
+                job is queued or running, in any process
+            uploads_in_use: Function returning the set of upload paths still
+                needed by queued or running jobs
+            pending_uploads: Function returning the bytes promised to chunked
+                uploads in progress, in any process
+            legacy_scratch: Glob patterns of scratch directories made by
+                earlier versions, removed once older than grace_seconds
+        """
+        self.upload_folder = upload_folder
+        self.scratch_folder = scratch_folder
+        self.retention_days = retention_days
+        self.quota_bytes = quota_bytes
+        self.grace_seconds = grace_seconds
+        self.job_active = job_active
+        self.uploads_in_use = uploads_in_use
+        self.pending_uploads = pending_uploads
+        self.legacy_scratch = tuple(legacy_scratch)
+        self.swept = {"scratch": 0, "uploads": 0, "partial": 0}
+        self._active = set()  # scratch directories of jobs running in this process
+        self._reserved = 0  # bytes held for uploads being written in this process
+        self._lock = threading.Lock()
+        self._reserve_lock = threading.Lock()  # makes checking and holding room atomic
+        os.makedirs(upload_folder, exist_ok=True)
+        os.makedirs(scratch_folder, exist_ok=True)
+
+    def upload_path(self, original_filename):
+        """Return a collision-free path in the upload folder for an uploaded file."""
+        name, ext = os.path.splitext(original_filename)
+        return os.path.join(self.upload_folder, unique_filename(name, ext))
+
+    def create_scratch(self, job_id):
+        """
+        Create an empty scratch directory for a job.
+
+        Args:
+            job_id: ID of the job, recorded in the directory name so sweeps
+                can tell whether the job is still running
+
+        Returns:
+            Absolute path of the new directory
+        """
+        path = os.path.abspath(
+            tempfile.mkdtemp(prefix=f"{SCRATCH_PREFIX}{job_id}_", dir=self.scratch_folder)
+        )
+        with self._lock:
+            self._active.add(path)
+        return path
+
+    def release_scratch(self, path):
+        """Delete a job's scratch directory and everything left in it."""
+        try:
+            shutil.rmtree(path)
+        except FileNotFoundError:
+            pass
+        finally:
+            with self._lock:
+                self._active.discard(path)
+
+    def publish(self, source_path, dest_path):
+        """
+        Move a finished file into place atomically.
+
+        Readers see either no file or the complete file at dest_path. The
+        move is a rename when source and destination share a filesystem;
+        otherwise the file is copied next to the destination first and
+        renamed from there.
+
+        Args:
+            source_path: Finished file, usually inside a scratch directory
+            dest_path: Final path
+        """
+        try:
+            os.replace(source_path, dest_path)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(dest_path) or ".", prefix=".publish-", suffix=".part"
+        )
+        os.close(fd)
+        try:
+            shutil.copy2(source_path, temp_path)
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.remove(source_path)
+
+    def _uploads(self):
+        # Uploaded files, oldest first, as (mtime, size, path)
+        uploads = []
+        with os.scandir(self.upload_folder) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                uploads.append((stat.st_mtime, stat.st_size, entry.path))
+        uploads.sort()
+        return uploads
+
+    def _in_use(self):
+        if self.uploads_in_use is None:
+            return set()
+        return {os.path.abspath(path) for path in self.uploads_in_use()}
+
+    def upload_bytes(self):
+        """Return the bytes held by uploaded files."""
+        return sum(size for _, size, _ in self._uploads())
+
+    def pending_bytes(self):
+        """Return the bytes held for uploads that have not landed yet."""
+        with self._lock:
+            reserved = self._reserved
+        if self.pending_uploads is not None:
+            reserved += self.pending_uploads()
+        return reserved
+
+    @contextmanager
+    def reserve(self, size):
+        """
+        Hold room for an upload while it is written.
+
+        Deletes the oldest uploads no job needs until the upload fits under
+        the quota next to the uploads already stored and those still
+        arriving. The room stays held until the with block exits, by which
+        time the upload has landed in the upload folder or failed.
+
+        Args:
+            size: Size of the incoming upload in bytes
+
+        Raises:
+            StorageFull: On entry, if the upload does not fit even then
+        """
+        held = 0
+        if self.quota_bytes:
+            with self._reserve_lock:
+                used = self._enforce_quota(self.quota_bytes - size)
+                if used + size > self.quota_bytes:
+                    raise StorageFull(used, self.quota_bytes)
+                with self._lock:
+                    self._reserved += size
+                held = size
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= held
+
+    def _enforce_quota(self, limit):
+        # Delete the oldest unneeded uploads until at most limit bytes are
+        # stored or held for uploads still arriving
+        uploads = self._uploads()
+        used = sum(size for _, size, _ in uploads) + self.pending_bytes()
+        if used <= limit:
+            return used
+        in_use = self._in_use()
+        for _, size, path in uploads:
+            if used <= limit:
+                break
+            if os.path.abspath(path) in in_use:
+                continue
+            if self._remove_file(path, "uploads"):
+                used -= size
+        return used
+
+    def _remove_file(self, path, kind):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Failed to remove {path}: {e}")
+            return False
+        with self._lock:
+            self.swept[kind] += 1
+        return True
+
+    def _remove_tree(self, path):
+        try:
+            shutil.rmtree(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Failed to remove {path}: {e}")
+            return
+        with self._lock:
+            self.swept["scratch"] += 1
+
+    def _scratch_abandoned(self, path, name, now):
+        with self._lock:
+            if os.path.abspath(path) in self._active:
+                return False
+        if name.startswith(SCRATCH_PREFIX) and self.job_active is not None:
+            # Job IDs have no underscore, the random suffix may
+            job_id = name[len(SCRATCH_PREFIX) :].partition("_")[0]
+            return not self.job_active(job_id)
+        try:
+            return now - os.path.getmtime(path) > self.grace_seconds
+        except OSError:
+            return False
+
+    def sweep(self):
+        """
+        Remove abandoned scratch data and apply upload retention and quota.
+
+        Returns:
+            dict: Number of scratch directories, uploads and temporary
+            upload files removed by this sweep
+        """
+        before = dict(self.swept)
+        now = time.time()
+
+        with os.scandir(self.scratch_folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and self._scratch_abandoned(
+                    entry.path, entry.name, now
+                ):
+                    self._remove_tree(entry.path)
+        for pattern in self.legacy_scratch:
+            for path in glob.glob(pattern):
+                try:
+                    if now - os.path.getmtime(path) > self.grace_seconds:
+                        self._remove_tree(path)
+                except OSError:
+                    pass
+
+        in_use = self._in_use()
+        cutoff = now - self.retention_days * 24 * 60 * 60
+        with os.scandir(self.upload_folder) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    continue
+                if entry.name.startswith(_PARTIAL_UPLOAD_PREFIX):
+                    if now - mtime > self.grace_seconds:
+                        self._remove_file(entry.path, "partial")
+                elif (
+                    self.retention_days
+                    and not entry.name.startswith(".")
+                    and mtime < cutoff
+                    and os.path.abspath(entry.path) not in in_use
+                ):
+                    self._remove_file(entry.path, "uploads")
+        if self.quota_bytes:
+            self._enforce_quota(self.quota_bytes)
+
+        with self._lock:
+            return {kind: self.swept[kind] - before[kind] for kind in self.swept}
+
+    def sweep_forever(self, interval):
+        """
+        Sweep now and then every interval seconds; meant for a daemon thread.
+
+        Args:
+            interval: Seconds between sweeps
+        """
+        while True:
+            try:
+                removed = self.sweep()
+                if any(removed.values()):
+                    print(f"Storage sweep removed {removed}")
+            except Exception as e:
+                print(f"Storage sweep failed: {e}")
+            time.sleep(interval)
+
+    def stats(self):
+        """Return bytes used by uploads and scratch data, limits and sweep counters."""
+        with self._lock:
+            swept = dict(self.swept)
+            active = len(self._active)
+        return {
+            "upload_bytes": self.upload_bytes(),
+            "pending_upload_bytes": self.pending_bytes(),
+            "upload_quota_bytes": self.quota_bytes,
+            "upload_retention_days": self.retention_days,
+            "scratch_bytes": _tree_size(self.scratch_folder),
+            "active_scratch_dirs": active,
+            "swept": swept,
+        }
@@ -0,0 +1,44 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from batch_parse import BatchParser
+from midi_cache import MidiCache
+from midi_parser import columns_to_json, midi_to_columns
+
+MIDI_FOLDER = Path(__file__).parent.parent / "midi_files"
+
+
+@pytest.fixture
+def midi_paths(tmp_path):
+    # Copies, so the sidecars the workers write stay out of the repo
+    paths = []
+    for name in ("sample.mid", "one dir.mid"):
+        shutil.copy(MIDI_FOLDER / name, tmp_path / name)
+        paths.append(str(tmp_path / name))
+    return paths
+
+
+def test_pool_starts_on_first_batch_and_results_are_cached(midi_paths, tmp_path):
+    cache = MidiCache(64 * 1024 * 1024)
+    parser = BatchParser(cache, workers=2)
+    try:
+        assert parser._pool is None  # Creating the parser starts no processes
+
+        results = {path: (columns, error) for path, columns, error in parser.parse(midi_paths)}
+
+        assert parser._pool is not None
+        for path in midi_paths:
+            columns, error = results[path]
+            assert error is None
+            assert columns_to_json(columns) == columns_to_json(midi_to_columns(path))
+            assert cache.peek(path)[1] is columns
+
+        missing = str(tmp_path / "missing.mid")
+        [(path, columns, error)] = parser.parse([missing])
+        assert (path, columns) == (missing, None)
+        assert isinstance(error, OSError)
+    finally:
+        parser.close()
+    assert parser._pool is None
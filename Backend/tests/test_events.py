@@ -0,0 +1,72 @@
+import pytest
+
+from events import EventBus, SharedEventRelay
+from job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def shared_bus(store):
+    # How each server process sets up its bus in shared mode
+    epoch = store.setdefault_meta("event_epoch", "e1")
+    return EventBus(epoch=epoch, start=store.last_event_id())
+
+
+def test_bus_numbers_events_and_resolves_cursors():
+    bus = EventBus(epoch="abc")
+    first = bus.publish("job", {"n": 1})
+    bus.publish("job", {"n": 2})
+
+    assert first == "abc-1"
+    assert bus.last_event_id == "abc-2"
+    assert bus.resolve("abc-1") == (1, False)
+    assert bus.resolve("other-1") == (2, True)
+    assert bus.resolve("abc-9") == (2, True)
+    assert [data for _, _, data in bus.wait(1, timeout=0)] == [{"n": 2}]
+
+
+def test_bus_asks_for_resync_when_history_is_gone():
+    bus = EventBus(history=2, epoch="abc")
+    for n in range(5):
+        bus.publish("job", {"n": n})
+
+    assert bus.resolve("abc-1") == (5, True)
+    assert bus.resolve("abc-3") == (3, False)
+
+
+def test_relays_number_events_by_log_id_in_every_process(store):
+    store.append_event("job", {"before": True})
+    seen = []
+    buses = [shared_bus(store), shared_bus(store)]
+    relays = [
+        SharedEventRelay(store, bus, interval=0.01, on_event=lambda *event: seen.append(event))
+        for bus in buses
+    ]
+    for relay in relays:
+        relay.start()
+
+    log_ids = [relays[0].publish("job", {"n": 1}), relays[1].publish("library", {"n": 2})]
+
+    expected = [(f"e1-{log_ids[0]}", "job", {"n": 1}), (f"e1-{log_ids[1]}", "library", {"n": 2})]
+    for bus in buses:
+        cursor = log_ids[0] - 1
+        events = []
+        while len(events) < 2:
+            batch = bus.wait(cursor, timeout=5)
+            assert batch, "relay did not deliver the logged events"
+            events += batch
+            cursor = int(batch[-1][0].rpartition("-")[2])
+        assert events == expected
+    assert len(seen) == 4
+
+
+def test_reconnect_id_from_one_process_resolves_in_another(store):
+    first, second = shared_bus(store), shared_bus(store)
+    number = store.append_event("job", {"n": 1})
+    first.publish("job", {"n": 1}, number=number)
+    second.publish("job", {"n": 1}, number=number)
+
+    assert second.resolve(first.last_event_id) == (number, False)
@@ -0,0 +1,156 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+from job_store import JobStore
+
+
+def queued_job(content_hash=None):
+    return {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "queued_time": datetime.now().isoformat(),
+        "content_hash": content_hash,
+    }
+
+
+def claim_all(path, worker_id, results):
+    # Runs in another process: claim jobs until the queue is empty
+    store = JobStore(path)
+    while True:
+        job = store.claim(worker_id)
+        if job is None:
+            break
+        results.put(job["job_id"])
+    results.put(None)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_enqueue_respects_depth_and_joins_duplicate_content(store):
+    first = queued_job("abc")
+    assert store.enqueue(first, max_depth=2) == (first["job_id"], 0)
+    # Same content joins the queued job instead of queueing again
+    assert store.enqueue(queued_job("abc"), max_depth=2) == (first["job_id"], None)
+
+    second = queued_job()
+    assert store.enqueue(second, max_depth=2) == (second["job_id"], 1)
+    assert store.enqueue(queued_job(), max_depth=2) == (None, 2)
+    assert store.count_by_status("queued") == 2
+
+
+def test_claim_takes_oldest_job_and_records_worker(store):
+    jobs = [queued_job() for _ in range(3)]
+    for job in jobs:
+        store.enqueue(job, max_depth=10)
+
+    claimed = store.claim("worker-a")
+
+    assert claimed["job_id"] == jobs[0]["job_id"]
+    assert claimed["status"] == "running"
+    assert claimed["claimed_by"] == "worker-a"
+    assert store.get(jobs[0]["job_id"])["status"] == "running"
+    assert store.queue_position(jobs[2]) == 1
+
+
+def test_concurrent_threads_claim_each_job_once(store):
+    jobs = [queued_job() for _ in range(40)]
+    for job in jobs:
+        store.enqueue(job, max_depth=100)
+    claimed = []
+    lock = threading.Lock()
+
+    def work(worker_id):
+        # Each thread has its own SQLite connection
+        while True:
+            job = store.claim(worker_id)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job["job_id"] for job in jobs)
+
+
+def test_concurrent_processes_claim_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    jobs = [queued_job() for _ in range(40)]
+    for job in jobs:
+        store.enqueue(job, max_depth=100)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=claim_all, args=(path, f"worker-{i}", results)) for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    claimed = []
+    finished = 0
+    while finished < len(processes):
+        job_id = results.get(timeout=30)
+        if job_id is None:
+            finished += 1
+        else:
+            claimed.append(job_id)
+    for process in processes:
+        process.join()
+
+    assert sorted(claimed) == sorted(job["job_id"] for job in jobs)
+    assert store.count_by_status("running") == len(jobs)
+
+
+def test_expire_claims_fails_only_jobs_without_a_fresh_heartbeat(store):
+    for _ in range(2):
+        store.enqueue(queued_job(), max_depth=10)
+    stale = store.claim("worker-gone")
+    live = store.claim("worker-alive")
+
+    time.sleep(0.2)
+    store.touch_claims("worker-alive")
+    expired = store.expire_claims(lease_seconds=0.1)
+
+    assert [job["job_id"] for job in expired] == [stale["job_id"]]
+    assert store.get(stale["job_id"])["status"] == "failed"
+    assert "stopped responding" in store.get(stale["job_id"])["error"]
+    assert store.get(live["job_id"])["status"] == "running"
+
+
+def test_cancel_fails_queued_job_and_flags_running_job(store):
+    running = queued_job()
+    queued = queued_job()
+    store.enqueue(running, max_depth=10)
+    store.enqueue(queued, max_depth=10)
+    store.claim("worker-a")
+
+    cancelled = store.cancel(queued["job_id"])
+    assert cancelled["status"] == "failed"
+    assert cancelled["cancelled"] is True
+
+    flagged = store.cancel(running["job_id"])
+    assert flagged["status"] == "running"
+    assert flagged["cancel_requested"] is True
+    assert store.cancel_requests("worker-a") == [running["job_id"]]
+    assert store.cancel_requests("worker-b") == []
+
+    # The worker's own saves of the running job keep the flag
+    job = store.get(running["job_id"])
+    job["phase"] = "transcribing"
+    store.save(job)
+    assert store.cancel_requests("worker-a") == [running["job_id"]]
+
+    assert store.cancel(queued["job_id"]) is None
@@ -0,0 +1,54 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from midi_catalogue import MidiCatalogue
+
+MIDI_FOLDER = Path(__file__).parent.parent / "midi_files"
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for name in ("sample.mid", "one dir.mid"):
+        shutil.copy(MIDI_FOLDER / name, tmp_path / name)
+    return tmp_path
+
+
+def test_catalogues_of_the_same_folder_share_a_fingerprint(folder):
+    # Two server processes, each building its catalogue its own way
+    first = MidiCatalogue(str(folder))
+    first.scan()
+    second = MidiCatalogue(str(folder))
+    second.scan(with_metadata=False)
+    second.scan()
+
+    assert first.fingerprint == second.fingerprint
+    assert first.version != second.version
+
+
+def test_fingerprint_follows_the_folder_contents(folder):
+    catalogue = MidiCatalogue(str(folder))
+    catalogue.scan(with_metadata=False)
+    listed = catalogue.fingerprint
+
+    catalogue.scan()
+    filled = catalogue.fingerprint
+    assert filled != listed  # Metadata changes the listing
+
+    os.utime(folder / "sample.mid", ns=(0, 10**18))
+    catalogue.scan()
+    assert catalogue.fingerprint not in (listed, filled)
+
+    shutil.copy(folder / "sample.mid", folder / "copy.mid")
+    catalogue.scan()
+    added = catalogue.fingerprint
+    (folder / "copy.mid").unlink()
+    catalogue.scan()
+    assert catalogue.fingerprint != added
+
+    (folder / "sample.mid").unlink()
+    (folder / "one dir.mid").unlink()
+    catalogue.scan()
+    assert catalogue.fingerprint == MidiCatalogue(str(folder)).fingerprint
@@ -0,0 +1,206 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+import midi_parser
+from midi_parser import (
+    LOD_LEVELS,
+    TempoMap,
+    columns_to_json,
+    level_of_detail_variants,
+    midi_to_columns,
+    midi_to_json,
+)
+
+MIDI_FOLDER = Path(__file__).parent.parent / "midi_files"
+MIDI_FILES = sorted(MIDI_FOLDER.glob("*.mid"))
+
+
+def smf(*tracks, midi_type=1, ticks_per_beat=480):
+    # Standard MIDI file from raw MTrk chunk bodies
+    data = b"MThd" + struct.pack(">IhhH", 6, midi_type, len(tracks), ticks_per_beat)
+    for track in tracks:
+        data += b"MTrk" + struct.pack(">I", len(track)) + track
+    return data
+
+
+def write_midi(tmp_path, data, name="test.mid"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def set_tempo(tempo, delta=b"\x00"):
+    return delta + bytes([0xFF, 0x51, 0x03]) + tempo.to_bytes(3, "big")
+
+
+END_OF_TRACK = bytes([0x00, 0xFF, 0x2F, 0x00])
+
+
+def parse_both(path):
+    # Output of the fast decoder and of mido for the same file
+    return (
+        columns_to_json(midi_to_columns(path)),
+        columns_to_json(midi_to_columns(path, fast=False)),
+    )
+
+
+@pytest.fixture
+def mido_calls(monkeypatch):
+    # Records every file handed to mido
+    calls = []
+    midi_file = midi_parser.MidiFile
+
+    def spy(path):
+        calls.append(path)
+        return midi_file(path)
+
+    monkeypatch.setattr(midi_parser, "MidiFile", spy)
+    return calls
+
+
+def test_tempo_map_without_tempo_changes_uses_120_bpm():
+    tempo_map = TempoMap(480)
+
+    assert tempo_map.spans_to_seconds([(0, 480), (960, 1200)]) == [(0.0, 0.5), (1.0, 0.25)]
+
+
+def test_tempo_map_converts_across_several_tempo_changes():
+    # 0.5s per beat until tick 480, then 1s per beat, then 0.25s from tick 960
+    tempo_map = TempoMap(480, [(960, 250000), (480, 1000000)])
+
+    [(start, duration)] = tempo_map.spans_to_seconds([(240, 1200)])
+
+    assert start == pytest.approx(0.25)
+    assert duration == pytest.approx(0.25 + 1.0 + 0.125)
+
+
+def test_tempo_map_ticks_on_a_boundary_use_the_new_tempo():
+    tempo_map = TempoMap(480, [(480, 1000000)])
+
+    assert tempo_map.spans_to_seconds([(0, 480), (480, 960)]) == [(0.0, 0.5), (0.5, 1.0)]
+
+
+def test_tempo_map_later_change_at_the_same_tick_wins():
+    tempo_map = TempoMap(480, [(0, 1000000), (0, 250000), (480, 500000), (480, 1000000)])
+
+    assert tempo_map.spans_to_seconds([(0, 480), (480, 960)]) == [(0.0, 0.25), (0.25, 1.0)]
+
+
+def test_file_without_tempo_event_is_read_at_120_bpm(tmp_path):
+    track = bytes([0x00, 0x90, 60, 100, 0x83, 0x60, 0x80, 60, 0]) + END_OF_TRACK
+    midi = midi_to_json(write_midi(tmp_path, smf(track)))
+
+    assert midi["tempo"] == 120.0
+    assert midi["tracks"][0]["notes"] == [
+        {"note": 60, "time": 0.0, "duration": 0.5, "velocity": 100}
+    ]
+
+
+def test_tempo_change_in_one_track_applies_to_every_track(tmp_path):
+    conductor = set_tempo(500000) + set_tempo(1000000, delta=b"\x83\x60") + END_OF_TRACK
+    notes = bytes([0x87, 0x40, 0x90, 60, 100, 0x83, 0x60, 0x80, 60, 0]) + END_OF_TRACK
+    midi = midi_to_json(write_midi(tmp_path, smf(conductor, notes)))
+
+    # The note starts at tick 960: 480 ticks at 0.5s per beat, then 480 at 1s
+    assert midi["tempo"] == 60.0
+    assert midi["tracks"][0]["notes"] == [
+        {"note": 60, "time": 1.5, "duration": 1.0, "velocity": 100}
+    ]
+
+
+@pytest.mark.parametrize("path", MIDI_FILES, ids=lambda path: path.name)
+def test_fast_decoder_matches_mido_on_repo_files(path, mido_calls):
+    fast, slow = parse_both(str(path))
+
+    assert fast == slow
+    assert mido_calls == [str(path)]  # Only the explicit fast=False parse
+
+
+def test_fast_decoder_matches_mido_with_running_status(tmp_path, mido_calls):
+    # The second note and both releases reuse the first note_on status byte
+    track = bytes([0x00, 0x90, 60, 100, 0x00, 64, 90, 0x83, 0x60, 60, 0, 0x00, 64, 0])
+    path = write_midi(tmp_path, smf(track + END_OF_TRACK))
+    fast, slow = parse_both(path)
+
+    assert fast == slow
+    assert [note["note"] for note in fast["tracks"][0]["notes"]] == [60, 64]
+    assert len(mido_calls) == 1
+
+
+def test_fast_decoder_drops_delta_of_unknown_meta_events_like_mido(tmp_path, mido_calls):
+    # Meta type 0x7E is unknown to mido, which discards its delta time
+    track = (
+        bytes([0x60, 0xFF, 0x7E, 0x02, 1, 2, 0x00, 0x90, 60, 100, 0x60, 0x80, 60, 0])
+        + END_OF_TRACK
+    )
+    path = write_midi(tmp_path, smf(track))
+    fast, slow = parse_both(path)
+
+    assert fast == slow
+    assert fast["tracks"][0]["notes"][0]["time"] == 0.0
+    assert len(mido_calls) == 1
+
+
+def test_fast_decoder_closes_unreleased_notes_at_track_end_like_mido(tmp_path):
+    # No note_off and no end_of_track: the note lasts until the last event
+    track = bytes([0x00, 0x90, 60, 100, 0x83, 0x60, 0xB0, 7, 100])
+    fast, slow = parse_both(write_midi(tmp_path, smf(track)))
+
+    assert fast == slow
+    assert fast["tracks"][0]["notes"][0]["duration"] == 0.5
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        # Chunk length claims more bytes than the file holds
+        smf(bytes([0x00, 0x90, 60, 100]))[:-2],
+        # Last event cut off inside the chunk
+        smf(bytes([0x00, 0x90, 60, 100, 0x60, 0x90, 64])),
+    ],
+    ids=["short chunk", "cut event"],
+)
+def test_truncated_track_falls_back_to_mido(tmp_path, mido_calls, data):
+    path = write_midi(tmp_path, data)
+
+    with pytest.raises(Exception, match="Error parsing MIDI file"):
+        midi_to_columns(path)
+    assert mido_calls == [path]
+
+
+def test_malformed_file_falls_back_to_mido(tmp_path, mido_calls):
+    # Song select is a system common message the fast decoder does not handle
+    track = bytes([0x00, 0xF3, 0x01, 0x00, 0x90, 60, 100, 0x60, 0x80, 60, 0]) + END_OF_TRACK
+    path = write_midi(tmp_path, smf(track))
+    with pytest.raises(ValueError):
+        midi_parser._scan_smf(path)
+
+    midi = columns_to_json(midi_to_columns(path))
+
+    assert mido_calls == [path]
+    assert midi["tracks"][0]["notes"] == [
+        {"note": 60, "time": 0.0, "duration": 0.1, "velocity": 100}
+    ]
+
+
+@pytest.mark.parametrize(
+    "name, notes",
+    [
+        ("Stardew_Valley_Overture.mid", [1980, 1573, 1462, 1269]),
+        ("Pirates_of_the_Caribbean_-_Hes_a_Pirate_3.mid", [1255, 900, 465, 421]),
+        ("one dir.mid", [2016, 1436, 1376, 1107]),
+    ],
+)
+def test_every_level_of_detail_drops_notes(name, notes):
+    variants = level_of_detail_variants(midi_to_columns(str(MIDI_FOLDER / name)))
+
+    assert len(variants) == len(LOD_LEVELS)
+    assert [level["notes"] for level in variants[0]["lod"]["levels"]] == notes
+    for variant, level_notes in zip(variants, notes[1:]):
+        lod = variant["lod"]
+        assert lod["notes"] == level_notes == sum(len(track) for track in variant["tracks"])
+        assert lod["dropped"]["total"] == notes[0] - level_notes
+        # Even the first level removes a tenth of the notes
+        assert lod["dropped"]["total"] >= notes[0] // 10
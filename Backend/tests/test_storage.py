@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+import pytest
+
+from storage import StorageFull, StorageManager
+from uploads import ChunkedUploads
+
+
+def write(path, size, age=0):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+    return str(path)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    upload_folder = tmp_path / "uploads"
+    scratch_folder = tmp_path / "scratch"
+    upload_folder.mkdir()
+    scratch_folder.mkdir()
+    return upload_folder, scratch_folder
+
+
+def test_sweep_keeps_scratch_of_unfinished_jobs(folders):
+    upload_folder, scratch_folder = folders
+    running = "a" * 32
+    # mkdtemp suffixes may contain underscores
+    (scratch_folder / f"job_{running}_x_y").mkdir()
+    (scratch_folder / f"job_{'b' * 32}_x_y").mkdir()
+    storage = StorageManager(
+        str(upload_folder), str(scratch_folder), job_active=lambda job_id: job_id == running
+    )
+
+    assert storage.sweep()["scratch"] == 1
+    assert os.listdir(scratch_folder) == [f"job_{running}_x_y"]
+
+
+def test_sweep_keeps_scratch_created_in_this_process(folders):
+    upload_folder, scratch_folder = folders
+    storage = StorageManager(str(upload_folder), str(scratch_folder), job_active=lambda _: False)
+    path = storage.create_scratch("c" * 32)
+
+    storage.sweep()
+    assert os.path.isdir(path)
+
+    storage.release_scratch(path)
+    assert not os.path.exists(path)
+
+
+def test_sweep_removes_expired_uploads_and_stale_partial_files(folders):
+    upload_folder, scratch_folder = folders
+    day = 24 * 60 * 60
+    expired = write(upload_folder / "old.wav", 10, age=8 * day)
+    needed = write(upload_folder / "queued.wav", 10, age=8 * day)
+    fresh = write(upload_folder / "new.wav", 10)
+    stale_partial = write(upload_folder / ".upload-stale", 10, age=2 * 60 * 60)
+    live_partial = write(upload_folder / ".upload-live", 10)
+    storage = StorageManager(
+        str(upload_folder),
+        str(scratch_folder),
+        retention_days=7,
+        uploads_in_use=lambda: {needed},
+    )
+
+    assert storage.sweep() == {"scratch": 0, "uploads": 1, "partial": 1}
+    for path in (expired, stale_partial):
+        assert not os.path.exists(path)
+    for path in (needed, fresh, live_partial):
+        assert os.path.exists(path)
+
+
+def test_reserve_deletes_oldest_unneeded_uploads(folders):
+    upload_folder, scratch_folder = folders
+    oldest = write(upload_folder / "1.wav", 40, age=300)
+    needed = write(upload_folder / "2.wav", 40, age=200)
+    newest = write(upload_folder / "3.wav", 40, age=100)
+    storage = StorageManager(
+        str(upload_folder), str(scratch_folder), quota_bytes=100, uploads_in_use=lambda: {needed}
+    )
+
+    with storage.reserve(20):
+        pass
+    assert not os.path.exists(oldest)
+    assert os.path.exists(needed) and os.path.exists(newest)
+
+    # Uploads a job still needs are never deleted to make room
+    with pytest.raises(StorageFull):
+        with storage.reserve(61):
+            pass
+    assert os.path.exists(needed)
+
+
+def test_reserve_holds_room_until_the_upload_lands(folders):
+    upload_folder, scratch_folder = folders
+    storage = StorageManager(str(upload_folder), str(scratch_folder), quota_bytes=100)
+    admitted = []
+    landed = threading.Event()
+
+    def upload(n):
+        try:
+            with storage.reserve(60):
+                admitted.append(n)
+                landed.wait(5)
+                write(upload_folder / f"{n}.wav", 60)
+        except StorageFull:
+            pass
+
+    threads = [threading.Thread(target=upload, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    assert storage.pending_bytes() == 60
+    landed.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(admitted) == 1
+    assert storage.pending_bytes() == 0
+    assert storage.upload_bytes() == 60
+
+
+def test_reserve_counts_chunked_uploads_in_progress(folders, tmp_path):
+    upload_folder, scratch_folder = folders
+    chunked = ChunkedUploads(str(tmp_path / "partial"), max_size=1000)
+    storage = StorageManager(
+        str(upload_folder),
+        str(scratch_folder),
+        quota_bytes=100,
+        pending_uploads=chunked.reserved_bytes,
+    )
+
+    with storage.reserve(70):
+        upload = chunked.create("song.wav", 70)
+    assert storage.pending_bytes() == 70
+    with pytest.raises(StorageFull):
+        with storage.reserve(40):
+            pass
+
+    chunked.abort(upload["upload_id"])
+    with storage.reserve(40):
+        pass
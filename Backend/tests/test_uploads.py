@@ -0,0 +1,128 @@
+import hashlib
+import io
+
+import pytest
+
+from uploads import ChunkedUploads, UploadError, save_and_hash
+
+DATA = bytes(range(256)) * 40
+
+
+class BrokenStream:
+    # Request body that breaks off after some bytes
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read(self, size):
+        chunk = self.data.read(size)
+        if not chunk:
+            raise OSError("Client disconnected")
+        return chunk
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return ChunkedUploads(str(tmp_path / "partial"), max_size=len(DATA))
+
+
+def test_save_and_hash_writes_the_file_in_one_step(tmp_path):
+    path = tmp_path / "song.wav"
+
+    assert save_and_hash(io.BytesIO(DATA), str(path), chunk_size=1000) == (
+        len(DATA),
+        hashlib.sha256(DATA).hexdigest(),
+    )
+    assert path.read_bytes() == DATA
+    assert [child.name for child in tmp_path.iterdir()] == ["song.wav"]
+
+
+def test_append_rejects_wrong_offset_with_the_current_one(uploads):
+    upload_id = uploads.create("song.wav", len(DATA))["upload_id"]
+    uploads.append(upload_id, 0, io.BytesIO(DATA[:1000]))
+
+    with pytest.raises(UploadError) as error:
+        uploads.append(upload_id, 500, io.BytesIO(DATA[500:]))
+
+    assert error.value.status == 409
+    assert error.value.offset == 1000
+
+
+def test_append_rejects_bytes_past_the_declared_size(uploads):
+    upload_id = uploads.create("song.wav", 100)["upload_id"]
+
+    with pytest.raises(UploadError) as error:
+        uploads.append(upload_id, 0, io.BytesIO(DATA[:150]), chunk_size=50)
+
+    assert error.value.status == 413
+    assert uploads.status(upload_id)["offset"] == 100
+
+
+def test_interrupted_chunk_resumes_from_the_bytes_received(uploads, tmp_path):
+    upload_id = uploads.create("song.wav", len(DATA))["upload_id"]
+
+    with pytest.raises(OSError):
+        uploads.append(upload_id, 0, BrokenStream(DATA[:3000]), chunk_size=1000)
+    offset = uploads.status(upload_id)["offset"]
+    assert offset == 3000
+
+    uploads.append(upload_id, offset, io.BytesIO(DATA[offset:]))
+    dest = tmp_path / "song.wav"
+    size, content_hash = uploads.finalize(upload_id, str(dest), hashlib.sha256(DATA).hexdigest())
+
+    assert (size, content_hash) == (len(DATA), hashlib.sha256(DATA).hexdigest())
+    assert dest.read_bytes() == DATA
+
+
+def test_upload_resumes_in_a_new_process(uploads, tmp_path):
+    upload_id = uploads.create("song.wav", len(DATA))["upload_id"]
+    uploads.append(upload_id, 0, io.BytesIO(DATA[:4000]))
+
+    # A restarted server only has the files on disk
+    restarted = ChunkedUploads(uploads.folder, max_size=len(DATA))
+    assert restarted.status(upload_id) == {
+        "upload_id": upload_id,
+        "filename": "song.wav",
+        "size": len(DATA),
+        "offset": 4000,
+    }
+    restarted.append(upload_id, 4000, io.BytesIO(DATA[4000:]))
+    _, content_hash = restarted.finalize(upload_id, str(tmp_path / "song.wav"))
+
+    assert content_hash == hashlib.sha256(DATA).hexdigest()
+
+
+def test_finalize_rejects_incomplete_upload(uploads, tmp_path):
+    upload_id = uploads.create("song.wav", len(DATA))["upload_id"]
+    uploads.append(upload_id, 0, io.BytesIO(DATA[:1000]))
+
+    with pytest.raises(UploadError) as error:
+        uploads.finalize(upload_id, str(tmp_path / "song.wav"))
+
+    assert (error.value.status, error.value.offset) == (409, 1000)
+    assert uploads.status(upload_id)["offset"] == 1000
+
+
+def test_finalize_discards_upload_whose_hash_differs(uploads, tmp_path):
+    upload_id = uploads.create("song.wav", len(DATA))["upload_id"]
+    uploads.append(upload_id, 0, io.BytesIO(DATA))
+
+    with pytest.raises(UploadError) as error:
+        uploads.finalize(upload_id, str(tmp_path / "song.wav"), "0" * 64)
+
+    assert error.value.status == 422
+    assert not (tmp_path / "song.wav").exists()
+    with pytest.raises(UploadError) as error:
+        uploads.status(upload_id)
+    assert error.value.status == 404
+
+
+def test_reserved_bytes_counts_declared_size_of_open_uploads(uploads, tmp_path):
+    audio = uploads.create("song.wav", 1000)["upload_id"]
+    uploads.create("song.mid", 500)
+
+    assert uploads.reserved_bytes() == 1500
+    assert uploads.reserved_bytes(lambda filename: filename.endswith(".wav")) == 1000
+
+    uploads.append(audio, 0, io.BytesIO(DATA[:1000]))
+    uploads.finalize(audio, str(tmp_path / "song.wav"))
+    assert uploads.reserved_bytes() == 500
@@ -0,0 +1,484 @@
+import json
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from process_runner import ProcessRunner, Task
+from segmented import SegmentedTranscriber
+from transcription_worker import ERROR_TAIL_LINES, create_engine
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcription_worker.py")
+
+# Progress written by infer.sh and the tqdm bars of the tools it runs:
+# "45%|####", "progress: 0.45" or "12/40"
+_PERCENT = re.compile(r"(\d{1,3}(?:\.\d+)?)%")
+_FRACTION = re.compile(r"progress[:=]\s*(0(?:\.\d+)?|1(?:\.0+)?)\b", re.IGNORECASE)
+_STEPS = re.compile(r"\b(\d+)/(\d+)\b")
+
+
+class TranscriptionError(Exception):
+    """Raised when an audio file could not be transcribed."""
+
+
+class WorkerDied(TranscriptionError):
+    """Raised when a warm worker exits or stops answering mid-request."""
+
+
+def parse_progress(line):
+    """
+    Read a progress fraction from a line of transcription engine output.
+
+    Args:
+        line: One line of stdout or stderr
+
+    Returns:
+        Progress between 0 and 1, or None if the line reports none
+    """
+    match = _FRACTION.search(line)
+    if match:
+        return float(match.group(1))
+    match = _PERCENT.search(line)
+    if match and float(match.group(1)) <= 100:
+        return float(match.group(1)) / 100
+    match = _STEPS.search(line)
+    if match and 0 < int(match.group(2)) and int(match.group(1)) <= int(match.group(2)):
+        return int(match.group(1)) / int(match.group(2))
+    return None
+
+
+class CondaInferBackend:
+    """
+    Transcribe each job with its own `conda run -n picogen2 ./infer.sh`.
+
+    Pays conda activation, interpreter startup and model loading on every
+    job, but needs nothing running in between. The run is supervised by a
+    ProcessRunner, so it honours the job's timeout and cancellation and
+    its output is streamed into the job's bounded log.
+    """
+
+    def __init__(self, picogen_dir, conda_env="picogen2", runner=None):
+        """
+        Args:
+            picogen_dir: Path to the PiCoGen checkout containing infer.sh
+            conda_env: Name of the conda environment PiCoGen is installed in
+            runner: ProcessRunner supervising infer.sh (a new one by default)
+        """
+        self.picogen_dir = os.path.abspath(picogen_dir)
+        self.conda_env = conda_env
+        self.runner = runner if runner is not None else ProcessRunner()
+
+    def transcribe(self, audio_path, output_dir, task=None):
+        """
+        Transcribe an audio file to MIDI.
+
+        Args:
+            audio_path: Path to the audio file
+            output_dir: Directory the engine writes piano.mid to
+            task: process_runner.Task of the job (optional)
+
+        Returns:
+            Path to the generated MIDI file
+
+        Raises:
+            ProcessTimeout: If the job ran past its deadline
+            ProcessCancelled: If the job was cancelled
+        """
+        # infer.sh expects paths relative to the PiCoGen directory; conda run
+        # buffers the tool's output unless told not to
+        cmd = [
+            "conda",
+            "run",
+            "--no-capture-output",
+            "-n",
+            self.conda_env,
+            "./infer.sh",
+            "--input_audio",
+            os.path.relpath(audio_path, self.picogen_dir),
+            "--output_dir",
+            os.path.relpath(output_dir, self.picogen_dir),
+        ]
+        task = task if task is not None else Task(audio_path)
+        returncode = self.runner.run(cmd, cwd=self.picogen_dir, task=task)
+        if returncode != 0:
+            stderr = "\n".join(task.tail(ERROR_TAIL_LINES, stream="stderr"))
+            raise TranscriptionError(f"Processing failed with return code {returncode}: {stderr}")
+        return os.path.join(output_dir, "piano.mid")
+
+    def close(self):
+        pass
+
+
+class InProcessBackend:
+    """Run a transcription engine directly on the calling thread."""
+
+    def __init__(self, engine):
+        """
+        Args:
+            engine: Engine from transcription_worker.create_engine
+        """
+        self.engine = engine
+        self.engine.load()
+
+    def transcribe(self, audio_path, output_dir, task=None):
+        """
+        Transcribe an audio file and return the path to the generated MIDI.
+
+        The engine cannot be interrupted, so a task's deadline and
+        cancellation are only checked before it starts; its output goes
+        into the task's log.
+        """
+        if task is not None:
+            task.check()
+        try:
+            return self.engine.transcribe(
+                audio_path, output_dir, log=task.add_line if task is not None else None
+            )
+        except Exception as e:
+            raise TranscriptionError(str(e)) from e
+
+    def close(self):
+        pass
+
+
+class _WarmWorker:
+    """
+    One long-running transcription_worker.py process.
+
+    The worker runs in its own session, so killing it also kills the
+    infer.sh it is running and everything that started. Its messages are
+    read into a queue by a thread of their own, so waiting for a reply can
+    time out without losing the engine output relayed ahead of it.
+    """
+
+    def __init__(self, command, cwd, ready_timeout):
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=cwd,
+            text=True,
+            bufsize=1,
+            start_new_session=True,
+        )
+        self.jobs_done = 0
+        self._messages = queue.Queue()
+        threading.Thread(
+            target=self._read_messages, name=f"warm-worker-{self.process.pid}", daemon=True
+        ).start()
+        ready = self._read(ready_timeout)
+        if not ready.get("ready"):
+            self.kill()
+            raise WorkerDied(f"Worker did not start: {ready}")
+        self.pid = ready.get("pid", self.process.pid)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def _read_messages(self):
+        for line in self.process.stdout:
+            self._messages.put(line)
+        self._messages.put(None)
+
+    def _next_message(self, timeout):
+        # Raises queue.Empty if nothing arrives within timeout
+        line = self._messages.get(timeout=timeout)
+        if line is None:
+            self._messages.put(None)  # Later reads see the exit too
+            raise WorkerDied(f"Worker {self.process.pid} exited with code {self.process.poll()}")
+        return json.loads(line)
+
+    def _read(self, timeout):
+        try:
+            return self._next_message(timeout)
+        except queue.Empty:
+            raise WorkerDied(
+                f"Worker {self.process.pid} did not answer within {timeout}s"
+            ) from None
+
+    def request(self, message, timeout=None, task=None, update_interval=1.0):
+        """
+        Send a request and wait for its reply.
+
+        Args:
+            message: Request dictionary
+            timeout: Seconds to wait for the reply, or None to wait forever
+            task: process_runner.Task that receives the engine output relayed
+                ahead of the reply (optional)
+            update_interval: Seconds between progress updates to the task
+
+        Returns:
+            The reply dictionary
+
+        Raises:
+            WorkerDied: If the worker exits or does not reply within timeout
+        """
+        try:
+            self.process.stdin.write(json.dumps(message) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerDied(f"Worker {self.process.pid} is gone: {e}") from e
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        reported = time.monotonic()
+        try:
+            while True:
+                wait = update_interval if task is not None else None
+                if deadline is not None:
+                    remaining = max(deadline - time.monotonic(), 0.0)
+                    wait = remaining if wait is None else min(wait, remaining)
+                try:
+                    reply = self._next_message(wait)
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise WorkerDied(
+                            f"Worker {self.process.pid} did not answer within {timeout}s"
+                        ) from None
+                    reply = {}
+                if "log" in reply:
+                    if task is not None:
+                        task.add_line(reply.get("stream", "stderr"), reply["log"])
+                elif reply:
+                    return reply
+                if task is not None and time.monotonic() - reported >= update_interval:
+                    task.report()
+                    reported = time.monotonic()
+        finally:
+            if task is not None:
+                task.report()
+
+    def close(self, timeout=5):
+        try:
+            self.process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+            self.process.stdin.flush()
+            self.process.wait(timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill_group(self):
+        """Send SIGKILL to the worker and every process it started, without waiting."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def kill(self):
+        self.kill_group()
+        self.process.wait()
+
+
+class WarmWorkerPool:
+    """
+    Pool of long-running transcription worker processes.
+
+    Each worker loads its engine once and then receives jobs over a pipe.
+    Workers that crash or fail a health check are replaced, and each worker
+    is recycled after max_jobs jobs to bound memory growth in the engine.
+    """
+
+    def __init__(
+        self,
+        command,
+        size=1,
+        max_jobs=50,
+        health_interval=30,
+        ping_timeout=10,
+        ready_timeout=600,
+        cwd=None,
+        update_interval=1.0,
+    ):
+        """
+        Args:
+            command: Command line that starts transcription_worker.py
+            size: Number of worker processes
+            max_jobs: Jobs a worker handles before it is replaced
+            health_interval: Seconds between health checks of idle workers
+            ping_timeout: Seconds an idle worker has to answer a health check
+            ready_timeout: Seconds a new worker has to load its engine
+            cwd: Working directory for the workers
+            update_interval: Seconds between progress updates to a job's task
+        """
+        self.command = command
+        self.size = size
+        self.max_jobs = max_jobs
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.ready_timeout = ready_timeout
+        self.cwd = cwd
+        self.update_interval = update_interval
+        self.restarts = 0
+        self.recycles = 0
+        self._idle = queue.Queue()
+        self._closed = False
+
+    def start(self):
+        """Start the workers and the health check thread."""
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        threading.Thread(target=self._check_health, name="warm-worker-health", daemon=True).start()
+
+    def _spawn(self):
+        return _WarmWorker(self.command, self.cwd, self.ready_timeout)
+
+    def _replace(self, worker):
+        worker.kill()
+        self.restarts += 1
+        return self._spawn()
+
+    def transcribe(self, audio_path, output_dir, task=None):
+        """
+        Transcribe an audio file on the next free worker.
+
+        The engine's output is relayed into the task's log as it runs. A
+        task's deadline bounds the wait for the worker's answer, and
+        cancelling the task kills the worker with the processes it started;
+        either way the worker is replaced.
+
+        Args:
+            audio_path: Path to the audio file
+            output_dir: Directory the engine writes piano.mid to
+            task: process_runner.Task of the job (optional)
+
+        Returns:
+            Path to the generated MIDI file
+
+        Raises:
+            ProcessTimeout: If the job ran past its deadline
+            ProcessCancelled: If the job was cancelled
+        """
+        task = task if task is not None else Task(audio_path)
+        task.check()
+        worker = self._idle.get()
+        try:
+            with task.watch(worker.kill_group):
+                reply = worker.request(
+                    {
+                        "op": "transcribe",
+                        "audio": os.path.abspath(audio_path),
+                        "output_dir": os.path.abspath(output_dir),
+                    },
+                    task.remaining(),
+                    task,
+                    self.update_interval,
+                )
+            worker.jobs_done += 1
+        except WorkerDied:
+            worker = self._replace(worker)
+            task.check()
+            raise
+        finally:
+            if worker.jobs_done >= self.max_jobs:
+                worker.close()
+                self.recycles += 1
+                worker = self._spawn()
+            self._idle.put(worker)
+
+        if not reply.get("ok"):
+            raise TranscriptionError(reply.get("error", "Transcription failed"))
+        return reply["midi_path"]
+
+    def _check_health(self):
+        while not self._closed:
+            threading.Event().wait(self.health_interval)
+            # Only idle workers are checked; a busy one is proven alive by its job
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not worker.request({"op": "ping"}, self.ping_timeout).get("pong"):
+                        raise WorkerDied("Unexpected health check reply")
+                except (WorkerDied, ValueError) as e:
+                    print(f"Restarting unhealthy transcription worker: {e}")
+                    try:
+                        worker = self._replace(worker)
+                    except Exception as spawn_error:
+                        print(f"Failed to restart transcription worker: {spawn_error}")
+                        continue
+                self._idle.put(worker)
+
+    def stats(self):
+        """Return worker counts and restart/recycle counters."""
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "restarts": self.restarts,
+            "recycles": self.recycles,
+        }
+
+    def close(self):
+        """Shut down all idle workers."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def create_transcriber(config):
+    """
+    Create the transcription backend selected by the app configuration.
+
+    Args:
+        config: Flask config with TRANSCRIPTION_BACKEND ("conda", "warm" or
+            "dummy"), TRANSCRIPTION_ENGINE ("picogen" or "dummy"),
+            PICOGEN_DIR, TRANSCRIPTION_WORKERS, WARM_WORKER_MAX_JOBS,
+            WARM_WORKER_HEALTH_INTERVAL, SEGMENT_SECONDS,
+            SEGMENT_OVERLAP_SECONDS and SEGMENT_PARALLELISM
+
+    Returns:
+        SegmentedTranscriber with transcribe(audio_path, output_dir,
+        progress=None, task=None) and close() methods
+    """
+    return SegmentedTranscriber(
+        _create_backend(config),
+        segment_seconds=config["SEGMENT_SECONDS"],
+        overlap_seconds=config["SEGMENT_OVERLAP_SECONDS"],
+        parallelism=config["SEGMENT_PARALLELISM"],
+    )
+
+
+def _create_backend(config):
+    backend = config["TRANSCRIPTION_BACKEND"]
+    picogen_dir = config["PICOGEN_DIR"]
+
+    if backend == "conda":
+        return CondaInferBackend(picogen_dir)
+    if backend == "dummy":
+        return InProcessBackend(create_engine("dummy"))
+    if backend != "warm":
+        raise ValueError(f"Unknown transcription backend: {backend}")
+
+    engine = config["TRANSCRIPTION_ENGINE"]
+    command = [sys.executable, "-u", WORKER_SCRIPT, "--engine", engine]
+    if engine == "picogen":
+        # Activate the PiCoGen environment once per worker instead of per job
+        command = [
+            "conda",
+            "run",
+            "--no-capture-output",
+            "-n",
+            "picogen2",
+            "python",
+            "-u",
+            WORKER_SCRIPT,
+            "--engine",
+            engine,
+        ]
+    command += ["--picogen-dir", os.path.abspath(picogen_dir)]
+
+    # Every job may be transcribing several segments at once
+    pool = WarmWorkerPool(
+        command,
+        size=config["TRANSCRIPTION_WORKERS"] * config["SEGMENT_PARALLELISM"],
+        max_jobs=config["WARM_WORKER_MAX_JOBS"],
+        health_interval=config["WARM_WORKER_HEALTH_INTERVAL"],
+    )
+    pool.start()
+    return pool
@@ -0,0 +1,244 @@
+"""
+Long-running transcription worker.
+
+Loads a transcription engine once and then serves jobs over stdin/stdout,
+one JSON object per line:
+
+    {"op": "transcribe", "audio": "/abs/in.wav", "output_dir": "/abs/out"}
+    -> {"log": "45%|####", "stream": "stderr"}  (zero or more, as the engine runs)
+    -> {"ok": true, "midi_path": "/abs/out/piano.mid"}
+    {"op": "ping"} -> {"ok": true, "pong": true}
+    {"op": "shutdown"} -> worker exits
+
+A {"ready": true} line is written once the engine has loaded. Started by
+transcription.WarmWorkerPool; this script only needs the standard library
+(plus mido for the dummy engine) and process_runner.py next to it, so it
+can run inside the PiCoGen environment.
+
+Usage:
+    python transcription_worker.py --engine picogen --picogen-dir PiCoGen
+    python transcription_worker.py --engine dummy
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from process_runner import line_splitter
+
+# Lines of engine output quoted in the error of a failed run
+ERROR_TAIL_LINES = 20
+
+
+class DummyEngine:
+    """
+    Stand-in engine that turns any audio file into a short deterministic MIDI.
+
+    Lets the upload, queue and storage pipeline be exercised without PiCoGen.
+    The notes are derived from a hash of the audio bytes, so the same upload
+    always produces the same MIDI.
+    """
+
+    def __init__(self, delay=0.0):
+        """
+        Args:
+            delay: Seconds to sleep per job to mimic inference time
+        """
+        self.delay = delay
+
+    def load(self):
+        pass
+
+    def transcribe(self, audio_path, output_dir, log=None):
+        import mido
+        from mido import Message, MidiFile, MidiTrack
+
+        with open(audio_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).digest()
+
+        mid = MidiFile()
+        track = MidiTrack()
+        mid.tracks.append(track)
+        track.append(mido.MetaMessage("set_tempo", tempo=500000))
+        track.append(mido.MetaMessage("track_name", name="Piano"))
+        for byte in digest:
+            note = 48 + byte % 36
+            track.append(Message("note_on", note=note, velocity=64 + byte % 48, time=0))
+            track.append(Message("note_off", note=note, velocity=0, time=240))
+        track.append(mido.MetaMessage("end_of_track", time=0))
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        os.makedirs(output_dir, exist_ok=True)
+        midi_path = os.path.join(output_dir, "piano.mid")
+        mid.save(midi_path)
+        return midi_path
+
+
+class PiCoGenEngine:
+    """
+    Engine that runs PiCoGen's infer.sh from an already activated environment.
+
+    Running inside a long-lived worker saves the conda activation and
+    environment startup on every job.
+    """
+
+    def __init__(self, picogen_dir):
+        """
+        Args:
+            picogen_dir: Path to the PiCoGen checkout containing infer.sh
+        """
+        self.picogen_dir = os.path.abspath(picogen_dir)
+
+    def load(self):
+        if not os.path.exists(os.path.join(self.picogen_dir, "infer.sh")):
+            raise FileNotFoundError(f"infer.sh not found in {self.picogen_dir}")
+
+    def transcribe(self, audio_path, output_dir, log=None):
+        """
+        Run infer.sh on an audio file.
+
+        Args:
+            audio_path: Path to the audio file
+            output_dir: Directory infer.sh writes piano.mid to
+            log: Function called with (stream name, line) for each line
+                infer.sh writes, as it writes it (optional)
+
+        Returns:
+            Path to the generated MIDI file
+        """
+        cmd = [
+            "./infer.sh",
+            "--input_audio",
+            os.path.relpath(audio_path, self.picogen_dir),
+            "--output_dir",
+            os.path.relpath(output_dir, self.picogen_dir),
+        ]
+        process = subprocess.Popen(
+            cmd,
+            cwd=self.picogen_dir,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        errors = deque(maxlen=ERROR_TAIL_LINES)
+
+        def relay(stream, name):
+            lines = line_splitter()
+            next(lines)
+            while True:
+                chunk = stream.read1(65536)
+                for line in lines.send(chunk):
+                    if name == "stderr":
+                        errors.append(line)
+                    if log is not None:
+                        log(name, line)
+                if not chunk:
+                    break
+
+        readers = [
+            threading.Thread(target=relay, args=(process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=relay, args=(process.stderr, "stderr"), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        returncode = process.wait()
+        for reader in readers:
+            reader.join()
+
+        if returncode != 0:
+            raise RuntimeError(
+                f"Processing failed with return code {returncode}: " + "\n".join(errors)
+            )
+        return os.path.join(output_dir, "piano.mid")
+
+
+def create_engine(name, picogen_dir="PiCoGen", delay=0.0):
+    """
+    Create a transcription engine by name.
+
+    Args:
+        name: "picogen" or "dummy"
+        picogen_dir: PiCoGen checkout used by the picogen engine
+        delay: Per-job delay used by the dummy engine
+
+    Returns:
+        Engine with load() and transcribe(audio_path, output_dir, log=None) methods
+    """
+    if name == "picogen":
+        return PiCoGenEngine(picogen_dir)
+    if name == "dummy":
+        return DummyEngine(delay)
+    raise ValueError(f"Unknown transcription engine: {name}")
+
+
+def serve(engine, requests, replies):
+    """
+    Answer protocol requests until shutdown or end of input.
+
+    Args:
+        engine: Loaded transcription engine
+        requests: Text stream of JSON requests
+        replies: Text stream for JSON replies
+    """
+
+    lock = threading.Lock()  # engine output is relayed from reader threads
+
+    def reply(message):
+        with lock:
+            replies.write(json.dumps(message) + "\n")
+            replies.flush()
+
+    def log(stream, line):
+        reply({"log": line, "stream": stream})
+
+    reply({"ready": True, "pid": os.getpid()})
+
+    for line in requests:
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        op = message.get("op")
+
+        if op == "shutdown":
+            return
+        if op == "ping":
+            reply({"ok": True, "pong": True})
+            continue
+        if op != "transcribe":
+            reply({"ok": False, "error": f"Unknown operation: {op}"})
+            continue
+
+        try:
+            midi_path = engine.transcribe(message["audio"], message["output_dir"], log=log)
+            reply({"ok": True, "midi_path": midi_path})
+        except Exception as e:
+            reply({"ok": False, "error": str(e)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running transcription worker")
+    parser.add_argument("--engine", default="picogen", choices=["picogen", "dummy"])
+    parser.add_argument("--picogen-dir", default="PiCoGen")
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Keep the protocol on the original stdout; anything else printed by the
+    # engine or its subprocesses goes to stderr
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    engine = create_engine(args.engine, args.picogen_dir, args.delay)
+    engine.load()
+    serve(engine, sys.stdin, replies)
+
+
+if __name__ == "__main__":
+    main()
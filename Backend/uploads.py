@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+# Bytes read from the request stream at a time
+CHUNK_SIZE = 1024 * 1024
+
+
+def save_and_hash(stream, path, chunk_size=CHUNK_SIZE):
+    """
+    Write an upload stream to disk, hashing it on the way.
+
+    The file is written under a temporary name and moved into place once
+    complete, so a half-received upload is never seen at path.
+
+    Args:
+        stream: Readable binary stream, such as a Werkzeug FileStorage stream
+        path: Destination path
+        chunk_size: Bytes read at a time
+
+    Returns:
+        tuple: (size in bytes, SHA-256 hex digest of the content)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=".upload-", suffix=".part"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size, digest.hexdigest()
+
+
+class UploadError(Exception):
+    """Raised when a chunked upload request cannot be applied."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class _Session:
+    def __init__(self, upload_id, filename, size, part_path):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.part_path = part_path
+        self.offset = 0
+        self.digest = hashlib.sha256()
+        self.lock = threading.Lock()
+
+    def to_json(self):
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+        }
+
+
+class ChunkedUploads:
+    """
+    Resumable uploads written to disk one chunk at a time.
+
+    A client creates a session, appends chunks at the offset the server
+    last acknowledged and finalizes once every byte has arrived. Chunks are
+    hashed as they are written, so finalizing needs no second pass over the
+    file. Session metadata is kept in a small JSON file beside the partial
+    data, so uploads can be resumed after a server restart; the hash is
+    then rebuilt from the bytes already on disk.
+    """
+
+    def __init__(self, folder, max_size, expire_seconds=24 * 60 * 60):
+        """
+        Args:
+            folder: Directory for partial uploads
+            max_size: Largest upload accepted, in bytes
+            expire_seconds: Sessions idle for longer than this are discarded
+        """
+        self.folder = folder
+        self.max_size = max_size
+        self.expire_seconds = expire_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _paths(self, upload_id):
+        base = os.path.join(self.folder, upload_id)
+        return f"{base}.part", f"{base}.json"
+
+    def create(self, filename, size):
+        """
+        Start an upload.
+
+        Args:
+            filename: Sanitised name of the file being uploaded
+            size: Total size in bytes
+
+        Returns:
+            dict: Session with "upload_id", "filename", "size" and "offset"
+        """
+        if size < 0 or size > self.max_size:
+            raise UploadError(f"Upload size must be between 0 and {self.max_size} bytes", 413)
+        self.expire()
+
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, "wb").close()
+        with open(meta_path, "w") as f:
+            json.dump({"filename": filename, "size": size}, f)
+
+        session = _Session(upload_id, filename, size, part_path)
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session.to_json()
+
+    def _session(self, upload_id):
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None and not session.lock.locked():
+                # Another server process sharing the folder may have written
+                # chunks since; the session is rebuilt from disk if so
+                try:
+                    stale = os.path.getsize(session.part_path) != session.offset
+                except OSError:
+                    stale = True
+                if stale:
+                    del self._sessions[upload_id]
+                    session = None
+            if session is not None:
+                return session
+
+            # Not in memory: resume a session left by an earlier process
+            if len(upload_id) != 32 or not upload_id.isalnum():
+                raise UploadError("Upload not found", 404)
+            part_path, meta_path = self._paths(upload_id)
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                raise UploadError("Upload not found", 404)
+            session = _Session(upload_id, meta["filename"], meta["size"], part_path)
+            with open(part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    session.digest.update(chunk)
+                    session.offset += len(chunk)
+            self._sessions[upload_id] = session
+            return session
+
+    def status(self, upload_id):
+        """Return a session's metadata, including the acknowledged offset."""
+        return self._session(upload_id).to_json()
+
+    def append(self, upload_id, offset, stream, chunk_size=CHUNK_SIZE):
+        """
+        Write a chunk at the given offset.
+
+        Bytes are acknowledged as they reach the file, so if the request is
+        interrupted the session keeps everything received before the break.
+
+        Args:
+            upload_id: ID returned by create
+            offset: Offset the chunk starts at; must equal the current offset
+            stream: Readable binary stream with the chunk
+            chunk_size: Bytes read at a time
+
+        Returns:
+            dict: Session metadata with the new offset
+
+        Raises:
+            UploadError: 409 with the current offset if offset does not match
+                or another chunk is being written; 413 past the declared size
+        """
+        session = self._session(upload_id)
+        if not session.lock.acquire(blocking=False):
+            raise UploadError("Another chunk is being written", 409, session.offset)
+        try:
+            if offset != session.offset:
+                raise UploadError(
+                    f"Expected offset {session.offset}", 409, session.offset
+                )
+            with open(session.part_path, "r+b") as f:
+                f.seek(session.offset)
+                f.truncate()
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if session.offset + len(chunk) > session.size:
+                        raise UploadError(
+                            "Chunk runs past the declared upload size", 413, session.offset
+                        )
+                    f.write(chunk)
+                    f.flush()
+                    session.digest.update(chunk)
+                    session.offset += len(chunk)
+            return session.to_json()
+        finally:
+            session.lock.release()
+
+    def finalize(self, upload_id, dest_path, expected_hash=None):
+        """
+        Move a complete upload to its destination.
+
+        Args:
+            upload_id: ID returned by create
+            dest_path: Final path of the file
+            expected_hash: SHA-256 hex digest the client computed (optional)
+
+        Returns:
+            tuple: (size in bytes, SHA-256 hex digest of the content)
+
+        Raises:
+            UploadError: 409 if bytes are missing, 422 if the hash differs
+        """
+        session = self._session(upload_id)
+        with session.lock:
+            if session.offset != session.size:
+                raise UploadError(
+                    f"Upload incomplete: {session.offset} of {session.size} bytes",
+                    409,
+                    session.offset,
+                )
+            content_hash = session.digest.hexdigest()
+            if expected_hash and expected_hash.lower() != content_hash:
+                self._discard(session)
+                raise UploadError("Uploaded content does not match the given sha256", 422)
+            os.replace(session.part_path, dest_path)
+            self._discard(session)
+        return session.size, content_hash
+
+    def reserved_bytes(self, counts=None):
+        """
+        Return the total size of the uploads in progress, in any process.
+
+        Each upload counts at its full size, so the chunks still to come
+        are covered as well as those already on disk.
+
+        Args:
+            counts: Function taking an upload's filename and returning
+                whether it is included (optional; all uploads by default)
+        """
+        total = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.folder, name)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue  # Finalized or discarded meanwhile, or still being written
+            if counts is None or counts(meta["filename"]):
+                total += meta["size"]
+        return total
+
+    def abort(self, upload_id):
+        """Discard an upload and its partial data."""
+        session = self._session(upload_id)
+        with session.lock:
+            self._discard(session)
+
+    def _discard(self, session):
+        with self._lock:
+            self._sessions.pop(session.upload_id, None)
+        for path in self._paths(session.upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def expire(self):
+        """
+        Discard sessions idle for longer than expire_seconds.
+
+        Returns:
+            Number of sessions discarded
+        """
+        cutoff = time.time() - self.expire_seconds
+        expired = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[: -len(".json")]
+            part_path, meta_path = self._paths(upload_id)
+            try:
+                updated = max(os.path.getmtime(meta_path), os.path.getmtime(part_path))
+            except OSError:
+                updated = 0
+            if updated >= cutoff:
+                continue
+            with self._lock:
+                self._sessions.pop(upload_id, None)
+            for path in (part_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            expired += 1
+        return expired
@@ -0,0 +1,34 @@
+"""
+Run the transcription workers of a multi-process deployment (see wsgi.py).
+
+Claims queued jobs from the shared job store and processes them with the
+configured transcription backend. Several worker processes can run at
+once, on one machine, sharing the same job store and MIDI folder; each job
+is still processed only once.
+
+Usage:
+    python worker.py
+"""
+
+import os
+import threading
+
+
+def main():
+    os.environ.setdefault("BACKEND_SHARED_STATE", "1")
+    os.environ["BACKEND_RUN_JOB_WORKERS"] = "1"
+
+    import main as backend
+
+    print(
+        f"Transcription worker {backend.job_queue.worker_id} running "
+        f"{backend.job_queue.workers} job(s) at a time"
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
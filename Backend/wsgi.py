@@ -0,0 +1,21 @@
+"""
+WSGI entry point for running the backend in several server processes.
+
+Job records, the queue, the last MIDI update and job and library events
+live in the shared job store (JOB_DB_PATH), so any process can answer any
+request. Web processes only queue jobs; transcription runs in a separate
+process started with worker.py, which claims each queued job exactly once.
+
+Usage:
+    gunicorn -w 4 -b 0.0.0.0:5000 wsgi:app
+    python worker.py
+
+Add -k gevent to serve /api/events streams on greenlets (see serve.py).
+"""
+
+import os
+
+os.environ.setdefault("BACKEND_SHARED_STATE", "1")
+os.environ.setdefault("BACKEND_RUN_JOB_WORKERS", "0")
+
+from main import app  # noqa: E402
@@ -26,6 +26,25 @@ export interface BackendMidiTrack {
   notes: BackendMidiNote[];
 }
 
+export interface MidiLevelSummary {
+  level: number;
+  notes: number;
+  dropped: number;
+}
+
+export interface MidiLevelOfDetail {
+  level: number;
+  source_notes: number;
+  notes: number;
+  dropped: {
+    quantize: number;
+    merge: number;
+    velocity: number;
+    total: number;
+  };
+  levels: MidiLevelSummary[];
+}
+
 export interface BackendMidiData {
   filename: string;
   tempo: number;
@@ -33,6 +52,7 @@ export interface BackendMidiData {
   duration: number;
   ticks_per_beat: number;
   tracks: BackendMidiTrack[];
+  lod?: MidiLevelOfDetail;
 }
 
 export const handleFileUpload = (
@@ -234,10 +254,46 @@ const API_BASE_URL = "http://localhost:5000";
 // Types for processing status
 export interface ProcessingStatus {
   status: "idle" | "running" | "completed" | "failed";
+  job_id?: string;
   start_time?: string;
   original_filename?: string;
   audio_file?: string;
   message?: string;
+  running_jobs?: number;
+  queue_depth?: number;
+}
+
+export interface ProcessingJob {
+  job_id: string;
+  status: "queued" | "running" | "completed" | "failed";
+  original_filename: string;
+  audio_file: string;
+  queued_time: string;
+  start_time?: string;
+  completion_time?: string;
+  midi_filename?: string;
+  error?: string;
+  phase?: "transcribing" | "storing";
+  queue_position?: number;
+  estimated_wait_seconds?: number;
+  // Fraction of the transcription done, as reported by the engine
+  progress?: number;
+  // Most recent lines of engine output
+  log_tail?: string[];
+  cancel_requested?: boolean;
+  cancelled?: boolean;
+}
+
+export interface LibraryUpdate {
+  last_update: string;
+  version: number;
+}
+
+export interface BackendEventHandlers {
+  onJob?: (job: ProcessingJob) => void;
+  onLibrary?: (update: LibraryUpdate) => void;
+  // Events were missed; refetch processing status and the MIDI list
+  onResync?: () => void;
 }
 
 export interface ProcessingResult {
@@ -249,10 +305,40 @@ export interface ProcessingResult {
   message?: string;
 }
 
+export interface MidiCatalogueEntry {
+  name: string;
+  filename: string;
+  size: number;
+  modified: string;
+  duration: number | null;
+  note_count: number | null;
+  bpm: number | null;
+  track_count: number | null;
+  time_signature: string | null;
+}
+
 export interface MidiListResponse {
   midi_files: string[];
+  entries?: MidiCatalogueEntry[];
   last_update: string | null;
   count: number;
+  total?: number;
+  offset?: number;
+  limit?: number | null;
+}
+
+export interface MidiListQuery {
+  offset?: number;
+  limit?: number;
+  sort?:
+    | "name"
+    | "duration"
+    | "note_count"
+    | "bpm"
+    | "track_count"
+    | "modified";
+  order?: "asc" | "desc";
+  prefix?: string;
 }
 
 export interface MidiUpdateCheck {
@@ -263,11 +349,23 @@ export interface MidiUpdateCheck {
 
 /**
  * Fetches the list of available MIDI files from the backend
+ * @param query - Optional pagination, sorting and prefix search
  * @returns Promise<MidiListResponse> - MIDI list with metadata
  */
-export async function fetchMidiList(): Promise<MidiListResponse> {
+export async function fetchMidiList(
+  query: MidiListQuery = {},
+): Promise<MidiListResponse> {
   try {
-    const response = await fetch(`${API_BASE_URL}/api/midis`);
+    const params = new URLSearchParams();
+    Object.entries(query).forEach(([key, value]) => {
+      if (value !== undefined) {
+        params.set(key, String(value));
+      }
+    });
+    const search = params.toString();
+    const response = await fetch(
+      `${API_BASE_URL}/api/midis${search ? `?${search}` : ""}`,
+    );
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
@@ -282,16 +380,23 @@ export async function fetchMidiList(): Promise<MidiListResponse> {
 /**
  * Fetches MIDI data from the backend for a specific file
  * @param filename - Name of the MIDI file (without extension)
+ * @param lod - Level of detail, 0 for every note (default) up to 3 for fewest
  * @returns Promise<BackendMidiData> - Parsed MIDI data from backend
  */
 export async function fetchMidiData(
   filename: string,
+  lod = 0,
 ): Promise<BackendMidiData> {
   try {
+    const query = lod ? `?lod=${lod}` : "";
     // Try with .mid extension first, then .midi
-    let response = await fetch(`${API_BASE_URL}/api/midi/${filename}.mid`);
+    let response = await fetch(
+      `${API_BASE_URL}/api/midi/${filename}.mid${query}`,
+    );
     if (!response.ok) {
-      response = await fetch(`${API_BASE_URL}/api/midi/${filename}.midi`);
+      response = await fetch(
+        `${API_BASE_URL}/api/midi/${filename}.midi${query}`,
+      );
     }
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
@@ -304,6 +409,211 @@ export async function fetchMidiData(
   }
 }
 
+// Packed columnar MIDI format (see Backend/midi_parser.py pack_columns)
+const MIDI_COLUMNS_MIMETYPE = "application/vnd.midi-columns";
+const MIDI_COLUMNS_PREFIX_SIZE = 12;
+
+export interface BackendMidiColumnsTrack {
+  track_name: string;
+  starts: Float32Array;
+  durations: Float32Array;
+  pitches: Uint8Array;
+  velocities: Uint8Array;
+}
+
+export interface BackendMidiColumns extends Omit<BackendMidiData, "tracks"> {
+  tracks: BackendMidiColumnsTrack[];
+}
+
+/**
+ * Wraps a packed columnar MIDI buffer as typed arrays without copying
+ * @param buffer - Response body in the packed columnar format
+ * @returns BackendMidiColumns - Metadata plus per-track typed arrays
+ */
+export function decodeMidiColumns(buffer: ArrayBuffer): BackendMidiColumns {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  const floatSize = view.getUint16(6, true);
+  if (magic !== "MIDC" || floatSize !== 4) {
+    throw new Error("Unsupported MIDI columns buffer");
+  }
+
+  const headerLength = view.getUint32(8, true);
+  const header = JSON.parse(
+    new TextDecoder().decode(
+      new Uint8Array(buffer, MIDI_COLUMNS_PREFIX_SIZE, headerLength),
+    ),
+  );
+
+  return {
+    ...header,
+    tracks: header.tracks.map(
+      (track: {
+        track_name: string;
+        count: number;
+        starts: number;
+        durations: number;
+        pitches: number;
+        velocities: number;
+      }) => ({
+        track_name: track.track_name,
+        starts: new Float32Array(buffer, track.starts, track.count),
+        durations: new Float32Array(buffer, track.durations, track.count),
+        pitches: new Uint8Array(buffer, track.pitches, track.count),
+        velocities: new Uint8Array(buffer, track.velocities, track.count),
+      }),
+    ),
+  };
+}
+
+/**
+ * Fetches MIDI data from the backend in the packed columnar format
+ * @param filename - Name of the MIDI file (without extension)
+ * @param lod - Level of detail, 0 for every note (default) up to 3 for fewest
+ * @returns Promise<BackendMidiColumns> - Typed-array MIDI data from backend
+ */
+export async function fetchMidiColumns(
+  filename: string,
+  lod = 0,
+): Promise<BackendMidiColumns> {
+  try {
+    const init = { headers: { Accept: MIDI_COLUMNS_MIMETYPE } };
+    const query = lod ? `?lod=${lod}` : "";
+    let response = await fetch(
+      `${API_BASE_URL}/api/midi/${filename}.mid${query}`,
+      init,
+    );
+    if (!response.ok) {
+      response = await fetch(
+        `${API_BASE_URL}/api/midi/${filename}.midi${query}`,
+        init,
+      );
+    }
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return decodeMidiColumns(await response.arrayBuffer());
+  } catch (error) {
+    console.error(`Error fetching MIDI columns for ${filename}:`, error);
+    throw error;
+  }
+}
+
+export interface MidiOverview {
+  filename: string;
+  time_buckets: number;
+  pitch_bands: number;
+  band_size: number;
+  bucket_seconds: number;
+  max_notes: number;
+  grid: number[][];
+}
+
+/**
+ * Fetches the piano-roll density overview of a MIDI file for previews
+ * @param filename - Name of the MIDI file (with extension)
+ * @returns Promise<MidiOverview> - Note activity per pitch band (rows, lowest
+ * first) and time bucket (columns), scaled to 0..255
+ */
+export async function fetchMidiOverview(
+  filename: string,
+): Promise<MidiOverview> {
+  try {
+    const response = await fetch(
+      `${API_BASE_URL}/api/midi/${encodeURIComponent(filename)}/overview`,
+    );
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error(`Error fetching MIDI overview for ${filename}:`, error);
+    throw error;
+  }
+}
+
+/**
+ * Fetches only the notes that overlap a time window of a MIDI file
+ * @param filename - Name of the MIDI file (with extension)
+ * @param start - Window start in seconds
+ * @param end - Window end in seconds
+ * @returns Promise<BackendMidiData> - MIDI data limited to the window
+ */
+export async function fetchMidiWindow(
+  filename: string,
+  start: number,
+  end: number,
+): Promise<BackendMidiData> {
+  try {
+    const response = await fetch(
+      `${API_BASE_URL}/api/midi/${encodeURIComponent(filename)}/window?start=${start}&end=${end}`,
+    );
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    return data;
+  } catch (error) {
+    console.error(`Error fetching MIDI window for ${filename}:`, error);
+    throw error;
+  }
+}
+
+export interface MidiBatchResult {
+  filename: string;
+  data?: BackendMidiData;
+  error?: string;
+}
+
+/**
+ * Fetches several MIDI files in one request, handing each to onResult as
+ * soon as the backend has it. Files that fail arrive with an error instead
+ * of data and do not stop the rest of the batch.
+ * @param filenames - Names of the MIDI files to load
+ * @param onResult - Called once per file, in the order files finish
+ * @returns Promise<number> - Number of files that failed
+ */
+export async function fetchMidiBatch(
+  filenames: string[],
+  onResult: (result: MidiBatchResult) => void,
+): Promise<number> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/midi/batch`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ filenames }),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+    let errors = 0;
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value, { stream: !done });
+      const lines = buffered.split("\n");
+      buffered = lines.pop() ?? "";
+      for (const line of lines) {
+        if (!line) continue;
+        const result = JSON.parse(line);
+        if (result.done) {
+          errors = result.errors;
+        } else {
+          onResult(result);
+        }
+      }
+      if (done) break;
+    }
+    return errors;
+  } catch (error) {
+    console.error("Error fetching MIDI batch:", error);
+    throw error;
+  }
+}
+
 /**
  * Uploads a file (MIDI or audio) to the backend
  * @param file - File to upload
@@ -331,6 +641,86 @@ export async function uploadFileToBackend(file: File): Promise<any> {
   }
 }
 
+// Largest chunk sent per request by uploadFileInChunks
+const MAX_CHUNK_BYTES = 8 * 1024 * 1024;
+
+interface ChunkedUploadState {
+  upload_id: string;
+  filename: string;
+  size: number;
+  offset: number;
+  chunk_size?: number;
+}
+
+/**
+ * Uploads a file in chunks, resuming from the last acknowledged offset
+ * after a dropped connection. The file is processed as soon as the last
+ * chunk is finalized, exactly as with uploadFileToBackend.
+ * @param file - File to upload
+ * @param onProgress - Called with the bytes acknowledged so far (optional)
+ * @param maxRetries - Failed chunk requests retried before giving up
+ * @returns Promise<any> - Upload response data
+ */
+export async function uploadFileInChunks(
+  file: File,
+  onProgress?: (uploaded: number, total: number) => void,
+  maxRetries = 5,
+): Promise<any> {
+  try {
+    const createResponse = await fetch(`${API_BASE_URL}/api/uploads`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+    });
+    if (!createResponse.ok) {
+      throw new Error(`HTTP error! status: ${createResponse.status}`);
+    }
+    const upload: ChunkedUploadState = await createResponse.json();
+    const uploadUrl = `${API_BASE_URL}/api/uploads/${upload.upload_id}`;
+    const chunkSize = Math.min(
+      upload.chunk_size ?? MAX_CHUNK_BYTES,
+      MAX_CHUNK_BYTES,
+    );
+
+    let offset = upload.offset;
+    let retries = 0;
+    while (offset < file.size) {
+      try {
+        const response = await fetch(`${uploadUrl}?offset=${offset}`, {
+          method: "PUT",
+          body: file.slice(offset, offset + chunkSize),
+        });
+        const state = await response.json();
+        if (!response.ok && response.status !== 409) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        // On 409 the server reports the offset it expects next
+        offset = state.offset;
+        retries = 0;
+      } catch (error) {
+        if (++retries > maxRetries) {
+          throw error;
+        }
+        // Ask the server how much arrived before the connection dropped
+        const response = await fetch(uploadUrl);
+        if (response.ok) {
+          offset = (await response.json()).offset;
+        }
+      }
+      onProgress?.(offset, file.size);
+    }
+
+    const response = await fetch(`${uploadUrl}/finalize`, { method: "POST" });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Error uploading file in chunks:", error);
+    throw error;
+  }
+}
+
 /**
  * Uploads a MIDI file to the backend (legacy function for compatibility)
  * @param file - MIDI file to upload
@@ -361,6 +751,48 @@ export async function getProcessingStatus(): Promise<ProcessingStatus> {
   }
 }
 
+/**
+ * Gets the status of one processing job
+ * @param jobId - Job ID returned in the upload response
+ * @returns Promise<ProcessingJob> - Job record with queue position while queued
+ */
+export async function getJobStatus(jobId: string): Promise<ProcessingJob> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/processing/${jobId}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    return data;
+  } catch (error) {
+    console.error(`Error fetching status for job ${jobId}:`, error);
+    throw error;
+  }
+}
+
+/**
+ * Cancels a processing job. A running job stops shortly after; its final
+ * state arrives as a job event or from getJobStatus.
+ * @param jobId - Job ID returned in the upload response
+ * @returns Promise<ProcessingJob> - Job record after the cancel request
+ */
+export async function cancelJob(jobId: string): Promise<ProcessingJob> {
+  try {
+    const response = await fetch(
+      `${API_BASE_URL}/api/processing/${jobId}/cancel`,
+      { method: "POST" },
+    );
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    return data;
+  } catch (error) {
+    console.error(`Error cancelling job ${jobId}:`, error);
+    throw error;
+  }
+}
+
 /**
  * Gets the result of the most recent processing job
  * @returns Promise<ProcessingResult> - Processing result
@@ -379,6 +811,41 @@ export async function getProcessingResult(): Promise<ProcessingResult> {
   }
 }
 
+/**
+ * Subscribes to job and MIDI library events pushed by the backend.
+ * EventSource reconnects on its own and resumes after the last event ID.
+ * @param handlers - Callbacks for job, library and resync events
+ * @returns () => void - Closes the event stream
+ */
+export function subscribeToBackendEvents(
+  handlers: BackendEventHandlers,
+): () => void {
+  const source = new EventSource(`${API_BASE_URL}/api/events`);
+
+  source.addEventListener("job", (event) => {
+    try {
+      handlers.onJob?.(JSON.parse((event as MessageEvent).data));
+    } catch (error) {
+      console.error("Error handling job event:", error);
+    }
+  });
+  source.addEventListener("library", (event) => {
+    try {
+      handlers.onLibrary?.(JSON.parse((event as MessageEvent).data));
+    } catch (error) {
+      console.error("Error handling library event:", error);
+    }
+  });
+  source.addEventListener("resync", () => handlers.onResync?.());
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      console.error("Backend event stream closed");
+    }
+  };
+
+  return () => source.close();
+}
+
 /**
  * Checks if the MIDI list has been updated
  * @param lastCheck - ISO timestamp of last check (optional)